@@ -0,0 +1,3 @@
+"""
+Benchmarks for the drug_nme hot paths. Run from the repository root with: python -m benchmarks.run
+"""
@@ -0,0 +1,85 @@
+"""
+Synthetic data generators for the benchmarks. The data mimics the shape and text patterns of the real sources, so the
+parsing and cleaning code takes the same branches it does on real data.
+"""
+
+import numpy as np
+import pandas as pd
+
+YEARS = np.arange(1985, 2026)
+STEMS = np.array(['tinib', 'mab', 'cept', 'parin', 'vir', 'olol', 'statin', 'ase', 'afil', 'sartan', 'lib', 'cel'])
+SALTS = np.array(['', '', '', ' hydrochloride', ' sodium', ' mesylate', ' sulfate'])
+SYLLABLES = np.array(['ba', 'ce', 'di', 'lo', 'mu', 'ra', 'si', 'to', 've', 'zo'])
+TYPES = np.array(['Small molecule', 'Antibody', 'Protein', 'Oligonucleotide'])
+GTOP_TYPES = np.array(['Synthetic organic', 'Peptide', 'Antibody', 'Natural product', 'Inorganic'])
+
+
+def drug_names(n: int, seed: int = 0) -> np.ndarray:
+    """Random drug-like names, i.e. 'bacelotinib'"""
+    rng = np.random.default_rng(seed)
+    syllables = SYLLABLES[rng.integers(0, len(SYLLABLES), size=(n, 3))]
+    prefixes = np.char.add(np.char.add(syllables[:, 0], syllables[:, 1]), syllables[:, 2])
+    return np.char.add(prefixes, STEMS[rng.integers(0, len(STEMS), n)])
+
+
+def approval_sources(n: int, seed: int = 0) -> pd.Series:
+    """Guide to Pharmacology 'approvalSource' text with the noise patterns the parser handles"""
+    rng = np.random.default_rng(seed)
+    years = YEARS[rng.integers(0, len(YEARS), n)].astype(str)
+    templates = np.array([
+        'FDA ({y})',
+        'FDA ({y}), EMA ({y2})',
+        'EMA ({y})',
+        'FDA (approved {y} for adults)',
+        'FDA {y}',
+        'Health Canada ({y}); FDA ( {y} )',
+        '',
+    ])
+    choice = rng.integers(0, len(templates), n)
+    later = (years.astype(int) + 1).astype(str)
+    return pd.Series([templates[c].format(y=y, y2=y2) for c, y, y2 in zip(choice, years, later)])
+
+
+def ingredients(n: int, seed: int = 0) -> pd.Series:
+    """FDA active ingredient names with salts and biologic suffixes"""
+    rng = np.random.default_rng(seed)
+    names = np.char.add(drug_names(n, seed), SALTS[rng.integers(0, len(SALTS), n)])
+    suffixed = rng.random(n) < 0.1
+    names = np.where(suffixed, np.char.add(names, '-xxzz'), names)
+    return pd.Series(names)
+
+
+def fda_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    """Table shaped like FDADataFetcher.add_types() output"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Active Ingredient': ingredients(n, seed),
+        'Approval Year': YEARS[rng.integers(0, len(YEARS), n)],
+        'NME/BLA': np.where(rng.random(n) < 0.3, 'BLA', 'NME'),
+        'Type': TYPES[rng.integers(0, len(TYPES), n)],
+    })
+
+
+def gtop_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    """Table shaped like PharmacologyDataFetcher.get_data() output"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'name': drug_names(n, seed),
+        'type': GTOP_TYPES[rng.integers(0, len(GTOP_TYPES), n)],
+        'Year': YEARS[rng.integers(0, len(YEARS), n)],
+    })
+
+
+def camelot_tables(n: int, rows_per_table: int = 50, seed: int = 0) -> list:
+    """Raw camelot tables (integer columns, header strings in the first row) holding n rows in total"""
+    rng = np.random.default_rng(seed)
+    names = drug_names(n, seed)
+    years = YEARS[rng.integers(0, len(YEARS), n)].astype(str)
+    header = pd.DataFrame([['Drug Name', 'Active Ingredient', 'Year']])
+
+    tables = []
+    for start in range(0, n, rows_per_table):
+        body = pd.DataFrame({0: names[start:start + rows_per_table], 1: names[start:start + rows_per_table],
+                             2: years[start:start + rows_per_table]})
+        tables.append(pd.concat([header, body], ignore_index=True))
+    return tables
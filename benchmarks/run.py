@@ -0,0 +1,199 @@
+"""
+Time and memory-profile the drug_nme hot paths over synthetic data from 1k to 1M rows. Results are saved as JSON and
+can be compared against an earlier run.
+
+Usage:
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --sizes 1000 10000 --only extract_approval_info --compare results.json --threshold 1.25
+"""
+
+import gc
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import tracemalloc
+import numpy as np
+import pandas as pd
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+from benchmarks import generators
+from drug_nme.fetch import FDADataFetcher, PharmacologyDataFetcher, _extract_approval_info, _infer_ingredient_type
+from drug_nme.plot import FDAPlot, _stacked_method
+from drug_nme.analytics import approval_counts
+from scrape.scrape import _format_tables
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+"""Benchmarks. Each setup function builds the input outside the timed region and returns a function to time."""
+
+
+def extract_approval_info(n):
+    sources = generators.approval_sources(n)
+    return lambda: sources.apply(lambda x: _extract_approval_info(x, 'FDA'))
+
+
+def infer_ingredient_type(n):
+    names = generators.ingredients(n)
+    return lambda: names.apply(_infer_ingredient_type)
+
+
+def fda_kinase_label(n):
+    data = generators.fda_frame(n)
+    fetcher = FDADataFetcher()
+    return lambda: fetcher.make_kinase_label(data.copy(deep=False))
+
+
+def gtop_kinase_label(n):
+    data = generators.gtop_frame(n)
+    fetcher = PharmacologyDataFetcher()
+    return lambda: fetcher.make_kinase_label(data.copy(deep=False))
+
+
+def fda_plot_aggregate(n):
+    data = generators.fda_frame(n)
+    return lambda: FDAPlot(data)
+
+
+def approval_counts_aggregate(n):
+    data = generators.fda_frame(n)
+    return lambda: approval_counts(data, use_cache=False)
+
+
+def stacked_render(n):
+    plot_data = FDAPlot(generators.fda_frame(n)).df[['BLA', 'NME']]
+
+    def render():
+        _stacked_method((10, 5), 0.8, 'white', 8, True, None, None, plot_data, None, None)
+        plt.close('all')
+
+    return render
+
+
+def scrape_table_cleaning(n):
+    tables = generators.camelot_tables(n)
+    return lambda: _format_tables(tables, None, False, 1)
+
+
+BENCHMARKS = {
+    'extract_approval_info': extract_approval_info,
+    'infer_ingredient_type': infer_ingredient_type,
+    'fda_kinase_label': fda_kinase_label,
+    'gtop_kinase_label': gtop_kinase_label,
+    'fda_plot_aggregate': fda_plot_aggregate,
+    'approval_counts': approval_counts_aggregate,
+    'stacked_render': stacked_render,
+    'scrape_table_cleaning': scrape_table_cleaning,
+}
+
+
+def run(names: list, sizes: list, repeat: int = 3) -> dict:
+    """
+    Run the benchmarks. The time is the best of repeat runs. Peak memory is measured in a separate traced run, so
+    tracing does not slow down the timed runs.
+    """
+    results = {}
+    for name in names:
+        results[name] = {}
+        for n in sizes:
+            func = BENCHMARKS[name](n)
+
+            times = []
+            for _ in range(repeat):
+                gc.collect()
+                start = time.perf_counter()
+                func()
+                times.append(time.perf_counter() - start)
+
+            gc.collect()
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[name][str(n)] = {'time': min(times), 'peak_mb': peak / 2 ** 20}
+            print(f"{name:<24} n={n:<9} {min(times):9.4f} s {peak / 2 ** 20:9.1f} MB", flush=True)
+
+    return results
+
+
+def scaling(results: dict) -> dict:
+    """
+    Estimate the growth exponent of each benchmark from the slope of log(time) against log(n). About 1 is linear;
+    clearly above 1 is super-linear.
+    """
+    exponents = {}
+    for name, by_size in results.items():
+        sizes = np.array([int(n) for n in by_size])
+        times = np.array([by_size[n]['time'] for n in by_size])
+        # small sizes are dominated by fixed overhead, so only use sizes from 10k up when available
+        keep = sizes >= 10_000 if (sizes >= 10_000).sum() >= 2 else np.ones(len(sizes), dtype=bool)
+        if keep.sum() >= 2:
+            exponents[name] = float(np.polyfit(np.log(sizes[keep]), np.log(times[keep]), 1)[0])
+    return exponents
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """List the benchmarks that got slower than threshold times the baseline"""
+    regressions = []
+    for name, by_size in current['results'].items():
+        for n, result in by_size.items():
+            old = baseline.get('results', {}).get(name, {}).get(n)
+            if old and result['time'] > threshold * old['time']:
+                regressions.append(f"{name} n={n}: {old['time']:.4f} s -> {result['time']:.4f} s "
+                                   f"({result['time'] / old['time']:.2f}x)")
+    return regressions
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Benchmark the drug_nme hot paths.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="Number of rows for each run.")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help="Benchmarks to run.")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per size. The best is kept.")
+    parser.add_argument('--output', help="Save the results to a JSON file.")
+    parser.add_argument('--compare', help="JSON file from an earlier run to compare against.")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="Report a regression if a benchmark is this many times slower than the baseline.")
+    args = parser.parse_args(argv)
+
+    results = run(args.only, args.sizes, args.repeat)
+    report = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+        },
+        'results': results,
+        'scaling': scaling(results),
+    }
+
+    for name, exponent in report['scaling'].items():
+        flag = '  <- super-linear' if exponent > 1.15 else ''
+        print(f"{name:<24} growth exponent {exponent:.2f}{flag}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,3 @@
-from .fetch import *
-from .plot import *
-from .target import *
-
 """
 Author: Tony E. Lin
 
@@ -12,15 +8,36 @@ import importlib
 
 __version__ = "0.1.2"
 
-_submodules = ["target", "fetch", "plot", "scrape"]
+_submodules = ["target", "fetch", "plot", "scrape", "pipeline", "aio", "metrics", "store", "resolve", "matcher",
+               "typetable", "schema", "diff", "watch", "cache", "cli", "ipc", "analytics", "serve"]
+
+# classes exported at the top level and their modules. They are imported on first use, so importing drug_nme (i.e. for
+# the command line) does not load pandas, matplotlib and seaborn
+_exports = {
+    "FDADataFetcher": "fetch",
+    "PharmacologyDataFetcher": "fetch",
+    "_ChemblDataFetcher": "fetch",
+    "Plot": "plot",
+    "FDAPlot": "plot",
+    "Target": "target",
+    "Pipeline": "pipeline",
+    "approval_pipeline": "pipeline",
+}
+
+__all__ = list(_exports)
 
 
 # lazy import of modules
 def __getattr__(name):
     if name in _submodules:
         return importlib.import_module(f"drug_nme.{name}")
+    elif name in _exports:
+        value = getattr(importlib.import_module(f"drug_nme.{_exports[name]}"), name)
+        globals()[name] = value
+        return value
     else:
-        try:
-            return globals()[name]
-        except KeyError:
-            raise AttributeError(f"Module 'drug_nme' has no attribute '{name}'")
+        raise AttributeError(f"Module 'drug_nme' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(list(globals()) + _submodules + list(_exports))
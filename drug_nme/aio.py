@@ -0,0 +1,68 @@
+"""
+Shared async HTTP client for the async fetchers. One pooled client is kept per event loop, so connections are reused
+(keep-alive) across all fetchers and the number of open connections is capped.
+"""
+
+import asyncio
+import httpx
+from tqdm import tqdm
+from drug_nme.metrics import show_progress
+from typing import Optional
+from drug_nme.utils import HEADERS
+
+__all__ = ["get_async_client", "aclose_async_client"]
+
+# one client per event loop. httpx clients cannot be shared across loops
+_clients = {}
+
+
+def get_async_client(max_connections: int = 20, max_keepalive: int = 10, timeout: float = 60.0) -> httpx.AsyncClient:
+    """
+    Get the pooled async HTTP client for the running event loop. The limits are only used when the client is created.
+    :param max_connections: int
+        Maximum number of open connections.
+    :param max_keepalive: int
+        Maximum number of idle connections kept alive for reuse.
+    :param timeout: float
+        Request timeout in seconds.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+
+    if client is None or client.is_closed:
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        client = httpx.AsyncClient(limits=limits, timeout=timeout, headers=HEADERS, follow_redirects=True)
+        _clients[loop] = client
+
+    return client
+
+
+async def aclose_async_client():
+    """Close the pooled async HTTP client for the running event loop."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def _gather_with_progress(coros: list, desc: Optional[str] = None, limit: Optional[int] = None) -> list:
+    """
+    Run coroutines concurrently and return their results in order. At most limit coroutines run at once. If one fails
+    or the caller is cancelled, the remaining coroutines are cancelled.
+    """
+    semaphore = asyncio.Semaphore(limit) if limit else None
+
+    async def run(coro):
+        if semaphore is None:
+            return await coro
+        async with semaphore:
+            return await coro
+
+    tasks = [asyncio.ensure_future(run(coro)) for coro in coros]
+    try:
+        for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc=desc,
+                         disable=desc is None or not show_progress()):
+            await task
+        return [task.result() for task in tasks]
+    finally:
+        for task in tasks:
+            task.cancel()
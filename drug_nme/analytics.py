@@ -0,0 +1,277 @@
+"""
+Approval time series. The year and category columns of a table are encoded once and counted with np.bincount into a
+years x categories matrix, and the rolling, cumulative, share and growth metrics are array operations on that matrix.
+Counts are cached per dataset hash, so several metrics and charts of one table share one aggregation. Plot and FDAPlot
+take an ApprovalCounts in place of the raw table.
+"""
+
+import hashlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from collections import OrderedDict
+from typing import Optional, Union
+from drug_nme.schema import CANONICAL_DTYPES
+
+__all__ = ["ApprovalCounts", "approval_counts", "clear_cache"]
+
+# year column and category columns of each source
+COLUMNS = {
+    'fda': ('Approval Year', ['NME/BLA', 'Type']),
+    'gtop': ('Year', ['type']),
+    'chembl': ('Year', ['Type']),
+}
+
+# number of aggregations kept in the cache
+CACHE_SIZE = 32
+
+_cache = OrderedDict()
+
+
+class ApprovalCounts:
+    def __init__(self, years: np.ndarray, categories: list, values: np.ndarray, year_col: str = 'Year',
+                 groups: Optional[list] = None, metric: str = 'Count', present: Optional[np.ndarray] = None):
+        """
+        Counts, or a metric of them, for each year and category. Use approval_counts() rather than building it
+        directly.
+        :param years: np.ndarray
+            Consecutive years, one per row of values. Years without approvals are rows of zeros.
+        :param categories: list
+            Category names, one per column of values.
+        :param values: np.ndarray
+            Matrix of years x categories.
+        :param year_col: str
+            Name of the year column in the tables.
+        :param groups: list
+            Column each category comes from, i.e. 'NME/BLA' or 'Type'. Shares are taken within each column.
+        :param metric: str
+            Name of the values, i.e. 'Count' or 'Share'.
+        :param present: np.ndarray
+            Whether each year has rows in the table. If None, all years do.
+        """
+        self.years = years
+        self.categories = list(categories)
+        self.values = values
+        self.year_col = year_col
+        self.groups = list(groups) if groups is not None else ['category'] * len(self.categories)
+        self.metric = metric
+        self.present = present if present is not None else np.ones(len(years), dtype=bool)
+
+    def __repr__(self):
+        return (f"ApprovalCounts({self.metric}, years={self.years[0] if len(self.years) else None}-"
+                f"{self.years[-1] if len(self.years) else None}, categories={len(self.categories)})")
+
+    def to_frame(self, fill_years: bool = True) -> pd.DataFrame:
+        """
+        Values as a wide pd.DataFrame, one row per year and one column per category, like FDAPlot.df.
+        :param fill_years: bool
+            Whether to keep the years without rows in the table, as rows of zeros. If False, only the years of the
+            table are kept, like FDAPlot.df.
+        """
+        keep = slice(None) if fill_years else self.present
+        index = pd.Index(self.years[keep], name=self.year_col, dtype=CANONICAL_DTYPES['year'])
+        return pd.DataFrame(self.values[keep], index=index, columns=self.categories)
+
+    def to_long(self, group: Optional[str] = None) -> pd.DataFrame:
+        """
+        Values as a long pd.DataFrame with a year, a category and a value column, like Plot.df. Years and categories
+        with a zero or missing value are left out.
+        :param group: str
+            Category column to keep, i.e. 'Type'. If None, the categories of all columns are kept.
+        """
+        cols_kept = np.array([group is None or col == group for col in self.groups], dtype=bool)
+        rows, cols = np.nonzero(~np.isnan(self.values.astype(float)) & (self.values != 0) & cols_kept)
+        kept_groups = [col for col, kept in zip(self.groups, cols_kept) if kept]
+        category_col = kept_groups[0] if len(set(kept_groups)) == 1 else 'category'
+        return pd.DataFrame({
+            self.year_col: pd.array(self.years[rows], dtype=CANONICAL_DTYPES['year']),
+            category_col: pd.array(np.array(self.categories, dtype=object)[cols], dtype=CANONICAL_DTYPES['text']),
+            self.metric: self.values[rows, cols],
+        })
+
+    def totals(self) -> pd.Series:
+        """Number of approvals per year."""
+        first_group = np.array(self.groups) == (self.groups[0] if self.groups else None)
+        index = pd.Index(self.years, name=self.year_col, dtype=CANONICAL_DTYPES['year'])
+        return pd.Series(self.values[:, first_group].sum(axis=1), index=index, name='Total')
+
+    def rolling(self, window: int = 5) -> 'ApprovalCounts':
+        """
+        Mean over the last years.
+        :param window: int
+            Number of years. The first window - 1 years have no value.
+        """
+        sums = np.cumsum(np.vstack([np.zeros((1, len(self.categories))), self.values]), axis=0)
+        result = np.full(self.values.shape, np.nan)
+        if len(self.years) >= window:
+            result[window - 1:] = (sums[window:] - sums[:-window]) / window
+        return self._with(result, f"Rolling{window}")
+
+    def cumulative(self) -> 'ApprovalCounts':
+        """Running total of each category."""
+        return self._with(np.cumsum(self.values, axis=0), 'Cumulative')
+
+    def share(self) -> 'ApprovalCounts':
+        """Fraction of each year's approvals in each category, taken within each category column."""
+        result = np.full(self.values.shape, np.nan)
+        groups = np.array(self.groups)
+        for group in dict.fromkeys(self.groups):
+            cols = groups == group
+            values = self.values[:, cols]
+            total = values.sum(axis=1, keepdims=True)
+            result[:, cols] = np.divide(values, total, out=np.full(values.shape, np.nan), where=total > 0)
+        return self._with(result, 'Share')
+
+    def change(self) -> 'ApprovalCounts':
+        """Difference with the previous year. The first year has no value."""
+        result = np.full(self.values.shape, np.nan)
+        result[1:] = np.diff(self.values, axis=0)
+        return self._with(result, 'Change')
+
+    def growth(self) -> 'ApprovalCounts':
+        """Relative change from the previous year, i.e. 0.5 for +50%. Missing where the previous year is 0."""
+        result = np.full(self.values.shape, np.nan)
+        previous = self.values[:-1].astype(float)
+        np.divide(np.diff(self.values, axis=0), previous, out=result[1:], where=previous != 0)
+        return self._with(result, 'Growth')
+
+    def summary(self, window: int = 5) -> pd.DataFrame:
+        """
+        All metrics as one long pd.DataFrame, one row per year and category.
+        :param window: int
+            Number of years for the rolling mean.
+        """
+        if not self.categories:
+            return pd.DataFrame(columns=[self.year_col, 'group', 'category', self.metric])
+        metrics = [self, self.cumulative(), self.rolling(window), self.share(), self.change(), self.growth()]
+        years, cols = np.divmod(np.arange(self.values.size), len(self.categories))
+        table = pd.DataFrame({
+            self.year_col: pd.array(self.years[years], dtype=CANONICAL_DTYPES['year']),
+            'group': pd.array(np.array(self.groups, dtype=object)[cols], dtype=CANONICAL_DTYPES['text']),
+            'category': pd.array(np.array(self.categories, dtype=object)[cols], dtype=CANONICAL_DTYPES['text']),
+        })
+        for metric in metrics:
+            table[metric.metric] = metric.values.ravel()
+        return table
+
+    """Support functions"""
+
+    def _with(self, values: np.ndarray, metric: str) -> 'ApprovalCounts':
+        return ApprovalCounts(self.years, self.categories, values, self.year_col, self.groups, metric, self.present)
+
+
+def approval_counts(data: pd.DataFrame, source: Optional[str] = None, year_col: Optional[str] = None,
+                    category_col: Optional[Union[str, list]] = None, years: Optional[tuple] = None,
+                    use_cache: bool = True) -> ApprovalCounts:
+    """
+    Count approvals per year and category.
+    :param data: pd.DataFrame
+        Table from a fetcher.
+    :param source: str
+        Source of the table, 'fda', 'gtop' or 'chembl', for the default columns. If None, it is guessed from the
+        columns.
+    :param year_col: str
+        Column with the approval year. If None, the year column of the source is used.
+    :param category_col: Union[str, list]
+        Column or columns to count by, i.e. 'Type'. If None, the category columns of the source are used: NME/BLA and
+        Type for the FDA, type for the Guide to Pharmacology and Type for ChEMBL.
+    :param years: tuple
+        First and last year to keep. If None, the years of the table are used.
+    :param use_cache: bool
+        Whether to reuse the counts of a table with the same content.
+    :return: ApprovalCounts
+    """
+    if source is None:
+        source = 'fda' if 'Approval Year' in data.columns else 'gtop' if 'type' in data.columns else 'chembl'
+    if source not in COLUMNS:
+        raise ValueError(f"Unknown source '{source}'. Choose from: {', '.join(COLUMNS)}")
+    year_col = year_col or COLUMNS[source][0]
+    if category_col is None:
+        category_col = [col for col in COLUMNS[source][1] if col in data.columns]
+    category_cols = [category_col] if isinstance(category_col, str) else list(category_col)
+
+    key = None
+    if use_cache:
+        key = (_dataset_hash(data, [year_col, *category_cols]), year_col, tuple(category_cols))
+        if key in _cache:
+            _cache.move_to_end(key)
+            counts = _cache[key]
+            return _clip_years(counts, years)
+
+    counts = _count(data, year_col, category_cols)
+    if key is not None:
+        _cache[key] = counts
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return _clip_years(counts, years)
+
+
+def clear_cache():
+    """Forget the cached counts."""
+    _cache.clear()
+
+
+"""Support functions"""
+
+
+def _count(data: pd.DataFrame, year_col: str, category_cols: list) -> ApprovalCounts:
+    """Count the rows of each year and category with one bincount per category column"""
+    year_values = pd.to_numeric(data[year_col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    has_year = ~np.isnan(year_values)
+    if not has_year.any():
+        return ApprovalCounts(np.array([], dtype=np.int64), [], np.zeros((0, 0), dtype=np.int64), year_col)
+
+    # years are encoded as offsets from the first year, so years without approvals get a row
+    first, last = int(year_values[has_year].min()), int(year_values[has_year].max())
+    n_years = last - first + 1
+    year_codes = np.where(has_year, year_values - first, -1).astype(np.int64)
+
+    matrices, categories, groups = [], [], []
+    for col in category_cols:
+        codes, uniques = pd.factorize(data[col], sort=True)
+        valid = (codes >= 0) & has_year
+        flat = year_codes[valid] * len(uniques) + codes[valid]
+        matrices.append(np.bincount(flat, minlength=n_years * len(uniques)).reshape(n_years, len(uniques)))
+        categories.extend(str(value) for value in uniques)
+        groups.extend([col] * len(uniques))
+
+    values = np.hstack(matrices) if matrices else np.zeros((n_years, 0), dtype=np.int64)
+    values = values.astype(np.int64)
+    present = np.bincount(year_codes[has_year], minlength=n_years) > 0
+    # counts are shared through the cache
+    values.setflags(write=False)
+    present.setflags(write=False)
+    return ApprovalCounts(np.arange(first, last + 1), categories, values, year_col, groups, present=present)
+
+
+def _clip_years(counts: ApprovalCounts, years: Optional[tuple]) -> ApprovalCounts:
+    """Rows of the counts between two years"""
+    if years is None:
+        return counts
+    keep = (counts.years >= years[0]) & (counts.years <= years[1])
+    return ApprovalCounts(counts.years[keep], counts.categories, counts.values[keep], counts.year_col, counts.groups,
+                          counts.metric, counts.present[keep])
+
+
+def _dataset_hash(data: pd.DataFrame, columns: list) -> str:
+    """
+    Hash of the content of the columns. Arrow-backed and numeric columns are hashed from their memory buffers, which is
+    much faster than hashing each value. Object columns are hashed by pandas
+    """
+    # sha256 has hardware support on most CPUs, so it is the fastest of the hashlib digests
+    digest = hashlib.sha256()
+    for col in columns:
+        if col not in data.columns:
+            continue
+        values = data[col]
+        digest.update(f"{col}:{values.dtype}:{len(values)}".encode())
+        if values.dtype == object:
+            digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+            continue
+        arrow = pa.array(values)
+        for chunk in (arrow.chunks if isinstance(arrow, pa.ChunkedArray) else [arrow]):
+            digest.update(f"{chunk.offset}:{len(chunk)}".encode())
+            for buffer in chunk.buffers():
+                if buffer is not None:
+                    digest.update(buffer)
+    return digest.hexdigest()[:32]
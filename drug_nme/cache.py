@@ -0,0 +1,286 @@
+"""
+Download and result cache shared by processes on one host. Entries are files written atomically, and a missing entry is
+fetched under an advisory file lock, so when several workers need the same resource only one of them downloads it while
+the others wait and read the result. The fetchers use the default cache, set with set_cache() or the
+DRUG_NME_CACHE_DIR environment variable.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+__all__ = ["DiskCache", "set_cache", "get_cache", "cached_get", "acached_get", "file_lock"]
+
+# per process locks, so threads of one process also wait for each other. Each path maps to its lock and the number of
+# threads holding or waiting for it, and is removed when that drops to 0
+_thread_locks = {}
+_thread_locks_lock = threading.Lock()
+
+
+class DiskCache:
+    def __init__(self, directory: str, ttl: Optional[float] = 86400):
+        """
+        :param directory: str
+            Directory of the cache. It is created if it does not exist and can be shared by several processes.
+        :param ttl: float
+            Seconds an entry is used for before it is fetched again. If None, entries do not expire. By default, one
+            day.
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self._stats = {'hits': 0, 'misses': 0, 'shared': 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[bytes]:
+        """
+        Read an entry. None if it is missing or expired.
+        :param key: str
+            Key of the entry, i.e. a URL.
+        :param ttl: float
+            Seconds the entry is valid for. If None, the cache's ttl is used.
+        """
+        path = self._path(key)
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            if ttl is not None and time.time() - os.path.getmtime(path) > ttl:
+                return None
+            with open(path, 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes):
+        """
+        Write an entry atomically. Readers see the old entry or the new one, never a partial file.
+        :param key: str
+            Key of the entry.
+        :param value: bytes
+            Content of the entry.
+        """
+        atomic_write(self._path(key), value)
+
+    def get_or_fetch(self, key: str, fetch: Callable, ttl: Optional[float] = None) -> Optional[bytes]:
+        """
+        Read an entry, or fetch and store it. Only one process or thread fetches a missing key at a time, the others
+        wait for it and read its result.
+        :param key: str
+            Key of the entry.
+        :param fetch: Callable
+            Function returning the content as bytes. If it returns None, i.e. for a failed request, nothing is stored.
+        :param ttl: float
+            Seconds the entry is valid for. If None, the cache's ttl is used.
+        """
+        value = self.get(key, ttl)
+        if value is not None:
+            self._count('hits')
+            return value
+
+        with file_lock(f"{self._path(key)}.lock"):
+            # another process may have fetched it while this one waited
+            value = self.get(key, ttl)
+            if value is not None:
+                self._count('shared')
+                return value
+
+            self._count('misses')
+            value = fetch()
+            if value is not None:
+                self.set(key, value)
+            return value
+
+    def stats(self) -> dict:
+        """
+        Counts of this process: 'hits' read from the cache, 'misses' fetched and 'shared' fetched by another process or
+        thread while this one waited.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def clear(self):
+        """Remove all entries."""
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.lock'):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except FileNotFoundError:
+                    pass
+
+    """Support functions"""
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest()[:32])
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+
+class CachedResponse:
+    """Successful response read from the cache, with the parts of requests.Response the fetchers use"""
+    status_code = 200
+    from_cache = True
+
+    def __init__(self, url: str, content: bytes):
+        self.url = url
+        self.content = content
+        self.headers = {'content-length': str(len(content))}
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        pass
+
+
+# default cache of the fetchers
+_default_cache = None
+
+
+def set_cache(cache: Optional[DiskCache]):
+    """
+    Set the cache used by the fetchers that are not given one.
+    :param cache: DiskCache
+        The cache, i.e. DiskCache('/tmp/drug_nme'). If None, caching is turned off.
+    """
+    global _default_cache
+    _default_cache = cache
+    return cache
+
+
+def get_cache() -> Optional[DiskCache]:
+    """The default cache. Without set_cache(), a cache in DRUG_NME_CACHE_DIR is used if the variable is set."""
+    global _default_cache
+    if _default_cache is None and os.environ.get('DRUG_NME_CACHE_DIR'):
+        _default_cache = DiskCache(os.environ['DRUG_NME_CACHE_DIR'])
+    return _default_cache
+
+
+def cached_get(url: str, get: Callable, cache: Optional[DiskCache] = None, **kwargs):
+    """
+    Send a GET request through a cache. Successful responses are stored, and concurrent requests for the same URL from
+    other processes wait for the first one. Failed responses are returned as they are and not stored.
+    :param url: str
+        Link for the request.
+    :param get: Callable
+        Function sending the request, i.e. ClientManager.get.
+    :param cache: DiskCache
+        The cache. If None, the request is sent directly.
+    :param kwargs:
+        Keyword arguments passed to get.
+    :return:
+        A requests.Response, or a CachedResponse if it was read from the cache.
+    """
+    if cache is None:
+        return get(url, **kwargs)
+
+    live = {}
+
+    def fetch():
+        response = live['response'] = get(url, **kwargs)
+        return response.content if response.status_code == 200 else None
+
+    content = cache.get_or_fetch(f"GET {url}", fetch)
+    if 'response' in live:
+        return live['response']
+    return CachedResponse(url, content)
+
+
+async def acached_get(url: str, get: Callable, cache: Optional[DiskCache] = None, **kwargs):
+    """
+    Async version of cached_get(), sharing its entries. A missing entry is fetched without the file lock, which would
+    block the event loop, so concurrent requests for the same URL from other processes are not merged.
+    :param url: str
+        Link for the request.
+    :param get: Callable
+        Coroutine function sending the request, i.e. httpx.AsyncClient.get.
+    :param cache: DiskCache
+        The cache. If None, the request is sent directly.
+    :param kwargs:
+        Keyword arguments passed to get.
+    :return:
+        An httpx.Response, or a CachedResponse if it was read from the cache.
+    """
+    if cache is None:
+        return await get(url, **kwargs)
+
+    content = cache.get(f"GET {url}")
+    if content is not None:
+        cache._count('hits')
+        return CachedResponse(url, content)
+
+    cache._count('misses')
+    response = await get(url, **kwargs)
+    if response.status_code == 200:
+        cache.set(f"GET {url}", response.content)
+    return response
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Hold an exclusive advisory lock on a lock file. Other processes and threads locking the same path wait.
+    :param path: str
+        Path of the lock file. It is created if it does not exist.
+    """
+    with _thread_lock(path):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            os.close(fd)
+
+
+def atomic_write(path: str, data: bytes):
+    """Write a file through a temporary file unique to the process and thread, then move it in place"""
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def temp_path(path: str) -> str:
+    """Temporary path next to a file, unique to the process and thread"""
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+@contextmanager
+def _thread_lock(path: str):
+    with _thread_locks_lock:
+        entry = _thread_locks.setdefault(path, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _thread_locks_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _thread_locks[path]
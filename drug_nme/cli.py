@@ -0,0 +1,325 @@
+"""
+Command line interface, installed as `drug-nme`. Each subcommand imports only the modules it needs, so the command
+starts without loading pandas, matplotlib and the HTTP clients until a subcommand runs.
+
+    drug-nme fetch fda -o fda.parquet --since 2015 --jobs 8 --cache-dir ~/.cache/drug_nme
+    drug-nme fetch gtop --agency FDA EMA --format csv
+    drug-nme types fda.parquet -o fda_typed.parquet --type-table chembl_types/
+    drug-nme targets P00533 P04626 --format csv
+    drug-nme plot fda_typed.parquet -o fda.png --kind facet
+    drug-nme report -o report/ --since 2010 --metrics report/metrics.prom
+    drug-nme serve --fda fda_typed.arrow --gtop gtop.arrow --port 8050
+"""
+
+import os
+import sys
+import argparse
+
+__all__ = ["main"]
+
+FORMATS = {'parquet': '.parquet', 'csv': '.csv', 'arrow': '.arrow'}
+
+# year column of each source, for --since
+YEAR_COLS = {'fda': 'Approval Year', 'gtop': 'Year', 'chembl': 'Year'}
+
+
+def main(argv: list = None) -> int:
+    """
+    Run the command line interface.
+    :param argv: list
+        Command line arguments. If None, sys.argv is used.
+    :return: int
+        Exit status.
+    """
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    if args.cache_dir:
+        from drug_nme.cache import DiskCache, set_cache
+        set_cache(DiskCache(os.path.expanduser(args.cache_dir)))
+
+    if args.metrics is None:
+        return args.func(args) or 0
+
+    from drug_nme.metrics import Metrics
+    with Metrics() as metrics:
+        status = args.func(args) or 0
+    _write_metrics(metrics, args.metrics)
+    return status
+
+
+"""Subcommands"""
+
+
+def _fetch(args) -> int:
+    if args.source == 'fda':
+        fetcher = _fda_fetcher(args)
+        data = fetcher.get_data()
+        if args.types:
+            data = fetcher.add_types(data)
+    elif args.source == 'gtop':
+        from drug_nme.fetch import PharmacologyDataFetcher
+        data = PharmacologyDataFetcher(url=args.ligand).get_data(agency=args.agency)
+    else:
+        from drug_nme.fetch import _ChemblDataFetcher
+        data = _ChemblDataFetcher(chembl_url=args.chembl_url).get_approved_drugs()
+
+    if data is None or data.empty:
+        print(f"No data fetched from {args.source}!", file=sys.stderr)
+        return 1
+
+    _save(_since(data, args.source, args.since), args.output, args.format, args.source)
+    return 0
+
+
+def _types(args) -> int:
+    data = _read(args.input)
+    if 'Active Ingredient' not in data.columns:
+        print(f"Error: {args.input} has no 'Active Ingredient' column. Is it from `drug-nme fetch fda`?",
+              file=sys.stderr)
+        return 1
+
+    data = _fda_fetcher(args).add_types(_since(data, 'fda', args.since))
+    _save(data, args.output, args.format, 'fda_types')
+    return 0
+
+
+def _targets(args) -> int:
+    from drug_nme.target import Target
+
+    ids = list(args.uniprot_id)
+    if args.input:
+        with open(args.input) as file:
+            ids.extend(line.strip() for line in file if line.strip())
+    if not ids:
+        print("Error: give Uniprot IDs as arguments or with --input!", file=sys.stderr)
+        return 1
+
+    data = Target(ids, max_workers=args.jobs or 4, gtop_url=args.gtop_url, uniprot_url=args.uniprot_url).get_data()
+    _save(data, args.output, args.format, 'targets')
+    return 0
+
+
+def _plot(args) -> int:
+    data = _read(args.input)
+    source = args.source or ('fda' if 'Approval Year' in data.columns else 'gtop')
+    _render(_since(data, source, args.since), source, args.kind, args.output, args.title)
+    print(f"Saved {args.kind} plot to {args.output}")
+    return 0
+
+
+def _report(args) -> int:
+    from drug_nme.fetch import PharmacologyDataFetcher
+
+    os.makedirs(args.output, exist_ok=True)
+    fetcher = _fda_fetcher(args)
+    tables = {
+        'fda': fetcher.get_data(),
+        'gtop': PharmacologyDataFetcher(url=args.ligand).get_data(agency=args.agency),
+    }
+    if tables['fda'] is not None and not tables['fda'].empty:
+        tables['fda'] = fetcher.add_types(tables['fda'])
+
+    status = 0
+    for source, data in tables.items():
+        if data is None or data.empty:
+            print(f"No data fetched from {source}!", file=sys.stderr)
+            status = 1
+            continue
+        data = _since(data, source, args.since)
+        _save(data, os.path.join(args.output, f"{source}{FORMATS[args.format or 'parquet']}"), args.format, source)
+        for kind in ('stacked', 'facet'):
+            _render(data, source, kind, os.path.join(args.output, f"{source}_{kind}.png"))
+    return status
+
+
+def _serve(args) -> int:
+    from drug_nme.serve import ChartServer
+
+    data = {source: _read(path) for source, path in (('fda', args.fda), ('gtop', args.gtop)) if path}
+    if not data:
+        print("Give a table to serve with --fda and/or --gtop.", file=sys.stderr)
+        return 2
+    workers = 2 if args.jobs is None else args.jobs
+    ChartServer(data, host=args.host, port=args.port, workers=workers, cache_size=args.cache_size).serve_forever()
+    return 0
+
+
+"""Support functions"""
+
+
+def _fda_fetcher(args):
+    from drug_nme.fetch import FDADataFetcher
+
+    type_table = None
+    if getattr(args, 'type_table', None):
+        from drug_nme.typetable import MoleculeTypeTable
+        type_table = MoleculeTypeTable(args.type_table)
+
+    return FDADataFetcher(max_workers=args.jobs or 10, landing=args.landing,
+                          new_drug_approvals=args.new_drug_approvals, chembl_url=args.chembl_url,
+                          type_table=type_table, web_fallback=getattr(args, 'web_fallback', False),
+                          cache_dir=os.path.expanduser(args.cache_dir) if args.cache_dir else None)
+
+
+def _since(data, source: str, since: int):
+    """Keep the rows approved in or after a year"""
+    if since is None or YEAR_COLS[source] not in data.columns:
+        return data
+    return data[(data[YEAR_COLS[source]] >= since).fillna(False)].reset_index(drop=True)
+
+
+def _render(data, source: str, kind: str, savepath: str, title: str = None):
+    """Draw a chart of a fetched table and save it without opening a window"""
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    import matplotlib.pyplot as plt
+    from drug_nme.plot import Plot, FDAPlot
+
+    if source == 'fda':
+        plot = FDAPlot(data)
+        cols = [col for col in plot.df.columns if col not in ('BLA', 'NME')] if 'Type' in data.columns else None
+        if kind == 'stacked':
+            plot.stacked(cols=cols or None, title=title, savepath=savepath)
+        else:
+            plot.facet(title=title, savepath=savepath)
+    else:
+        plot = Plot(data, sort_col=['Year', 'type'])
+        getattr(plot, kind)(title=title, savepath=savepath)
+    plt.close('all')
+
+
+def _read(path: str):
+    """Read a table saved by `drug-nme fetch`, by its extension"""
+    import pandas as pd
+
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    if path.endswith(('.arrow', '.feather')):
+        from drug_nme.ipc import read_arrow
+        return read_arrow(path)
+    return pd.read_csv(path, sep='\t' if path.endswith('.tsv') else ',')
+
+
+def _save(data, output: str, data_format: str, name: str):
+    """Write a table in the given format. The format is taken from the output's extension if not given"""
+    if data_format is None and output == '-':
+        data_format = 'csv'
+    elif data_format is None:
+        extension = os.path.splitext(output or '')[1]
+        data_format = next((fmt for fmt, ext in FORMATS.items() if ext == extension), 'parquet')
+        if extension == '.feather':
+            data_format = 'arrow'
+    if output is None:
+        output = f"{name}{FORMATS[data_format]}"
+
+    if data_format == 'parquet':
+        data.to_parquet(output, index=False)
+    elif data_format == 'arrow':
+        from drug_nme.ipc import to_arrow
+        to_arrow(data, output)
+    elif output == '-':
+        data.to_csv(sys.stdout, index=False)
+        return
+    else:
+        data.to_csv(output, index=False)
+    print(f"Saved {len(data)} rows to {output}")
+
+
+def _write_metrics(metrics, path: str):
+    """Write the stage totals as Prometheus text for .prom files, otherwise as JSON. '-' writes to stderr"""
+    text = metrics.to_prometheus() if path.endswith('.prom') else metrics.to_json() + '\n'
+    if path == '-':
+        sys.stderr.write(text)
+    else:
+        with open(path, 'w') as file:
+            file.write(text)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    from drug_nme import __version__
+
+    # options shared by all subcommands
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--jobs', '-j', type=int, default=None,
+                        help="Number of worker threads for the lookups. By default, 10 for types and 4 for targets.")
+    common.add_argument('--cache-dir', default=os.environ.get('DRUG_NME_CACHE_DIR'),
+                        help="Directory of the download cache shared by processes. Defaults to $DRUG_NME_CACHE_DIR.")
+    common.add_argument('--metrics', nargs='?', const='-', default=None, metavar='PATH',
+                        help="Write stage metrics to PATH, as Prometheus text for .prom files and JSON otherwise. "
+                             "Without PATH, JSON is written to stderr.")
+
+    # options of the commands writing tables
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--output', '-o', default=None,
+                        help="Output file. '-' writes CSV to stdout. By default, named after the command.")
+    output.add_argument('--format', '-f', choices=list(FORMATS), default=None,
+                        help="Output format. By default, taken from the output extension, else parquet.")
+    output.add_argument('--since', type=int, default=None, help="Keep only approvals in or after this year.")
+
+    # source URLs, i.e. for a mirror or the stand-in server
+    sources = argparse.ArgumentParser(add_help=False)
+    sources.add_argument('--landing', default=None, help="URL of the CDER NME compilation page.")
+    sources.add_argument('--new-drug-approvals', default=None,
+                         help="Base URL of the yearly Novel Drug Approvals pages.")
+    sources.add_argument('--ligand', default=None, help="URL of the Guide to Pharmacology approved ligands.")
+    sources.add_argument('--chembl-url', default=None, help="Base URL of the ChEMBL REST API.")
+    sources.add_argument('--agency', nargs='+', default=['FDA'], help="Agencies for the Guide to Pharmacology data.")
+
+    parser = argparse.ArgumentParser(prog='drug-nme', description="Get drug approvals from the FDA, the Guide to "
+                                                                  "Pharmacology and ChEMBL.")
+    parser.add_argument('--version', action='version', version=f"%(prog)s {__version__}")
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+
+    fetch = subparsers.add_parser('fetch', parents=[common, output, sources], help="Download approved drugs.")
+    fetch.add_argument('source', choices=['fda', 'gtop', 'chembl'])
+    fetch.add_argument('--types', action='store_true', help="Add the molecule type of the FDA drugs.")
+    fetch.set_defaults(func=_fetch)
+
+    types = subparsers.add_parser('types', parents=[common, output, sources],
+                                  help="Add molecule types to a fetched FDA table.")
+    types.add_argument('input', help="Table from `drug-nme fetch fda`.")
+    types.add_argument('--type-table', default=None, help="Directory of a MoleculeTypeTable built from a ChEMBL dump.")
+    types.add_argument('--web-fallback', action='store_true',
+                       help="Query ChEMBL for the names missing from the type table.")
+    types.set_defaults(func=_types)
+
+    targets = subparsers.add_parser('targets', parents=[common, output], help="Look up protein targets.")
+    targets.add_argument('uniprot_id', nargs='*', help="Uniprot IDs.")
+    targets.add_argument('--input', '-i', default=None, help="File with one Uniprot ID per line.")
+    targets.add_argument('--gtop-url', default=None, help="Base URL of the Guide to Pharmacology API.")
+    targets.add_argument('--uniprot-url', default=None, help="Base URL of the UniProt entries.")
+    targets.set_defaults(func=_targets)
+
+    plot = subparsers.add_parser('plot', parents=[common], help="Plot a fetched table.")
+    plot.add_argument('input', help="Table from `drug-nme fetch` or `drug-nme types`.")
+    plot.add_argument('--output', '-o', required=True, help="Image file, i.e. approvals.png.")
+    plot.add_argument('--kind', choices=['stacked', 'facet'], default='stacked')
+    plot.add_argument('--source', choices=['fda', 'gtop'], default=None,
+                      help="Source of the table. By default, guessed from its columns.")
+    plot.add_argument('--since', type=int, default=None, help="Plot only approvals in or after this year.")
+    plot.add_argument('--title', default=None)
+    plot.set_defaults(func=_plot)
+
+    report = subparsers.add_parser('report', parents=[common, sources],
+                                   help="Fetch the FDA and Guide to Pharmacology data and plot them.")
+    report.add_argument('--output', '-o', default='report', help="Output directory.")
+    report.add_argument('--format', '-f', choices=list(FORMATS), default=None, help="Format of the tables.")
+    report.add_argument('--since', type=int, default=None, help="Keep only approvals in or after this year.")
+    report.set_defaults(func=_report)
+
+    serve = subparsers.add_parser('serve', parents=[common], help="Serve approval charts over HTTP.")
+    serve.add_argument('--fda', default=None, help="Table from `drug-nme fetch fda` or `drug-nme types`.")
+    serve.add_argument('--gtop', default=None, help="Table from `drug-nme fetch gtop`.")
+    serve.add_argument('--host', default='127.0.0.1', help="Interface to listen on.")
+    serve.add_argument('--port', type=int, default=8050)
+    serve.add_argument('--cache-size', type=int, default=256, help="Number of rendered charts kept in memory.")
+    serve.set_defaults(func=_serve)
+
+    return parser
+
+
+if __name__ == '__main__':
+    sys.exit(main())
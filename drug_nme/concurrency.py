@@ -0,0 +1,286 @@
+"""
+Adaptive concurrency for remote lookups. Each remote service gets a limiter that raises the number of concurrent
+requests while responses are fast and healthy and cuts it when latency climbs or the service answers with 429/5xx
+(additive increase, multiplicative decrease). Failed calls are retried with jittered exponential backoff.
+"""
+
+import time
+import httpx
+import random
+import asyncio
+import threading
+import requests
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Optional
+
+__all__ = ["AdaptiveLimiter", "get_limiter"]
+
+# start and max concurrency per service
+LIMITER_DEFAULTS = {
+    'chembl': {'initial': 4, 'max_limit': 16},
+    'uniprot': {'initial': 4, 'max_limit': 16},
+    'gtop': {'initial': 2, 'max_limit': 8},
+    'fda': {'initial': 2, 'max_limit': 5},
+}
+
+# HTTP status codes worth retrying
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# ChEMBL client errors worth retrying. Matched by name, as importing the client requires network access
+RETRY_ERRORS = {'HttpTooManyRequests', 'HttpApplicationError', 'HttpBadGateway', 'HttpServiceUnavailable',
+                'HttpGatewayTimeout'}
+
+
+class AdaptiveLimiter:
+    def __init__(self, name: str = 'default', initial: int = 4, min_limit: int = 1, max_limit: int = 16,
+                 decrease: float = 0.5, latency_factor: float = 2.0, retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 30.0):
+        """
+        :param name: str
+            Name of the remote service.
+        :param initial: int
+            Number of concurrent calls allowed at the start.
+        :param min_limit: int
+            Lowest number of concurrent calls.
+        :param max_limit: int
+            Highest number of concurrent calls.
+        :param decrease: float
+            Factor applied to the limit when the service is overloaded.
+        :param latency_factor: float
+            The service is treated as overloaded when a call takes this many times longer than the fastest typical
+            call.
+        :param retries: int
+            Number of retries for calls that fail with a transient error.
+        :param backoff: float
+            Base delay in seconds between retries. The delay doubles on each retry and is jittered.
+        :param max_backoff: float
+            Longest delay in seconds between retries.
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._active = 0
+        self._condition = threading.Condition()
+        self._base_latency = None
+        self._last_decrease = 0.0
+        self._stats = {'calls': 0, 'retries': 0, 'throttled': 0, 'failures': 0}
+
+    @property
+    def limit(self) -> int:
+        """Current number of concurrent calls allowed."""
+        return int(self._limit)
+
+    def stats(self) -> dict:
+        """Call, retry, throttle and failure counts and the current limit."""
+        with self._condition:
+            return {**self._stats, 'limit': self.limit}
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Call func within the concurrency limit. Transient errors (connection errors, timeouts, 429/5xx responses) are
+        retried with jittered exponential backoff. A response with a 429/5xx status is returned after the last retry.
+        :param func: Callable
+            Function making the remote call. It can return a requests.Response or any result.
+        :param args:
+            Positional arguments passed to func.
+        :param kwargs:
+            Keyword arguments passed to func.
+        """
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            with self._slot() as slot:
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    transient = _is_transient_error(e)
+                    slot['overloaded'] = transient
+                    if not transient or attempt == self.retries:
+                        with self._condition:
+                            self._stats['failures'] += 1
+                        raise
+                else:
+                    status = getattr(result, 'status_code', None)
+                    if status not in RETRY_STATUS:
+                        return result
+
+                    slot['overloaded'] = True
+                    if attempt == self.retries:
+                        with self._condition:
+                            self._stats['failures'] += 1
+                        return result
+                    retry_after = _retry_after(result)
+
+            with self._condition:
+                self._stats['retries'] += 1
+
+            # full jitter, unless the service asked for a specific delay
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            time.sleep(retry_after if retry_after is not None else random.uniform(0, delay))
+
+    async def acall(self, func: Callable, *args, **kwargs):
+        """
+        Async version of call(). Awaits func within the concurrency limit, with the same retries and backoff. The limit
+        is shared with call(), so threads and coroutines querying one service are limited together.
+        :param func: Callable
+            Coroutine function making the remote call. It can return an httpx.Response or any result.
+        :param args:
+            Positional arguments passed to func.
+        :param kwargs:
+            Keyword arguments passed to func.
+        """
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            async with self._aslot() as slot:
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    transient = _is_transient_error(e)
+                    slot['overloaded'] = transient
+                    if not transient or attempt == self.retries:
+                        with self._condition:
+                            self._stats['failures'] += 1
+                        raise
+                else:
+                    status = getattr(result, 'status_code', None)
+                    if status not in RETRY_STATUS:
+                        return result
+
+                    slot['overloaded'] = True
+                    if attempt == self.retries:
+                        with self._condition:
+                            self._stats['failures'] += 1
+                        return result
+                    retry_after = _retry_after(result)
+
+            with self._condition:
+                self._stats['retries'] += 1
+
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            await asyncio.sleep(retry_after if retry_after is not None else random.uniform(0, delay))
+
+    def map(self, func: Callable, items: list, workers: Optional[int] = None) -> list:
+        """
+        Apply func to each item in a thread pool, with each call going through call(). Results keep the input order.
+        :param func: Callable
+            Function making the remote call for one item.
+        :param items: list
+            Items to process.
+        :param workers: Optional[int]
+            Number of threads. If None, it will default to max_limit. The limiter decides how many run at once.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers or self.max_limit) as executor:
+            return list(executor.map(lambda item: self.call(func, item), items))
+
+    """Support functions"""
+
+    @contextmanager
+    def _slot(self):
+        """Wait for a free slot, then record the latency and outcome of the call made in it"""
+        with self._condition:
+            while self._active >= int(self._limit):
+                self._condition.wait()
+            self._active += 1
+            self._stats['calls'] += 1
+
+        slot = {'overloaded': False}
+        start = time.perf_counter()
+        try:
+            yield slot
+        finally:
+            self._record(time.perf_counter() - start, slot['overloaded'])
+
+    @asynccontextmanager
+    async def _aslot(self):
+        """Async version of _slot(). Polls for a free slot, as waiting on the condition would block the event loop"""
+        wait = 0.001
+        while not self._try_acquire():
+            await asyncio.sleep(wait)
+            wait = min(wait * 2, 0.05)
+
+        slot = {'overloaded': False}
+        start = time.perf_counter()
+        try:
+            yield slot
+        finally:
+            self._record(time.perf_counter() - start, slot['overloaded'])
+
+    def _try_acquire(self) -> bool:
+        with self._condition:
+            if self._active >= int(self._limit):
+                return False
+            self._active += 1
+            self._stats['calls'] += 1
+            return True
+
+    def _record(self, latency: float, overloaded: bool):
+        with self._condition:
+            self._active -= 1
+
+            # track the typical fast latency. It drifts up slowly, so a lasting slowdown is eventually accepted
+            if self._base_latency is None or latency < self._base_latency:
+                self._base_latency = latency
+            else:
+                self._base_latency += 0.01 * (latency - self._base_latency)
+
+            if not overloaded and latency > self.latency_factor * self._base_latency:
+                overloaded = True
+
+            if overloaded:
+                self._stats['throttled'] += 1
+                # only decrease once per round trip, so a burst of failures from one window counts once
+                now = time.monotonic()
+                if now - self._last_decrease > latency:
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+                    self._last_decrease = now
+            else:
+                # additive increase of about one slot per full window of successful calls
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+            self._condition.notify_all()
+
+
+# limiters shared by all fetchers, one per remote service
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str, **settings) -> AdaptiveLimiter:
+    """
+    Get the shared AdaptiveLimiter for a remote service. Settings are only used when the limiter is created.
+    :param name: str
+        Name of the remote service, i.e. 'chembl', 'uniprot', 'gtop' or 'fda'.
+    :param settings:
+        Keyword arguments for AdaptiveLimiter. They override the defaults in LIMITER_DEFAULTS.
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveLimiter(name=name, **{**LIMITER_DEFAULTS.get(name, {}), **settings})
+        return _limiters[name]
+
+
+def _is_transient_error(error: Exception) -> bool:
+    """Check if a failed call is worth retrying"""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, httpx.TransportError)):
+        return True
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) in RETRY_STATUS:
+        return True
+    return type(error).__name__ in RETRY_ERRORS
+
+
+def _retry_after(response) -> Optional[float]:
+    """Read the Retry-After header in seconds, if given"""
+    value = getattr(response, 'headers', {}).get('Retry-After')
+    try:
+        return min(float(value), 60.0) if value is not None else None
+    except ValueError:
+        return None
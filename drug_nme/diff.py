@@ -0,0 +1,211 @@
+"""
+Changes between two snapshots of a fetched table. Rows are matched on a stable key and compared by a hash of their
+content, so added, removed and modified records are found in linear time. The changes can be written as a compact
+change feed in JSONL or parquet, and the added and modified rows passed on to add_types() or the plots on their own.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from typing import Optional, Union
+
+__all__ = ["SnapshotDiff", "diff", "update_snapshot", "KEYS"]
+
+# columns identifying a record in each source
+KEYS = {
+    'fda': ['Drug Name', 'Active Ingredient'],
+    'gtop': ['ligandId'],
+    'chembl': ['ChEMBL_ID'],
+}
+
+CHANGES = ['added', 'removed', 'modified']
+
+
+class SnapshotDiff:
+    def __init__(self, added: pd.DataFrame, removed: pd.DataFrame, modified: pd.DataFrame, previous: pd.DataFrame,
+                 key: list):
+        """
+        Result of diff(). Use diff() rather than building it directly.
+        :param added: pd.DataFrame
+            Rows of the new snapshot whose key is not in the old one.
+        :param removed: pd.DataFrame
+            Rows of the old snapshot whose key is not in the new one.
+        :param modified: pd.DataFrame
+            Rows of the new snapshot whose content changed, with a 'changed_columns' column.
+        :param previous: pd.DataFrame
+            Rows of the old snapshot matching the modified rows, in the same order.
+        :param key: list
+            Key columns.
+        """
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+        self.previous = previous
+        self.key = key
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.modified)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __repr__(self):
+        counts = ', '.join(f"{change}={count}" for change, count in self.summary().items())
+        return f"SnapshotDiff({counts})"
+
+    def summary(self) -> dict:
+        """Number of added, removed and modified records."""
+        return {'added': len(self.added), 'removed': len(self.removed), 'modified': len(self.modified)}
+
+    def upserts(self) -> pd.DataFrame:
+        """Added and modified rows of the new snapshot, i.e. the rows downstream steps need to process again."""
+        return pd.concat([self.added, self.modified.drop(columns='changed_columns')], ignore_index=True)
+
+    def to_frame(self) -> pd.DataFrame:
+        """The changes as one pd.DataFrame with a 'change' column. Removed rows hold their old values."""
+        tables = [table.assign(change=change) for change, table in zip(CHANGES, [self.added, self.removed,
+                                                                                self.modified]) if len(table)]
+        if not tables:
+            return pd.DataFrame(columns=['change', *self.key])
+        feed = pd.concat(tables, ignore_index=True)
+        return feed[['change'] + [col for col in feed.columns if col != 'change']]
+
+    def to_jsonl(self, path: Optional[str] = None) -> Optional[str]:
+        """
+        Write the changes as JSON lines, one record per line. Dates are written in ISO format and missing values as
+        null.
+        :param path: str
+            Output file. It is appended to, so one file can collect the changes of several runs. If None, the JSON
+            lines are returned as a string.
+        """
+        feed = self.to_frame()
+        lines = feed.to_json(orient='records', lines=True, date_format='iso') if len(feed) else ''
+        if path is None:
+            return lines
+        with open(path, 'a') as file:
+            file.write(lines)
+
+    def to_parquet(self, path: str):
+        """
+        Write the changes as a parquet file.
+        :param path: str
+            Output file.
+        """
+        feed = self.to_frame()
+        if 'changed_columns' in feed.columns:
+            feed['changed_columns'] = feed['changed_columns'].map(lambda cols: list(cols) if isinstance(
+                cols, (list, tuple)) else [])
+        feed.to_parquet(path, index=False)
+
+
+def diff(old: pd.DataFrame, new: pd.DataFrame, key: Optional[Union[str, list]] = None,
+         source: Optional[str] = None) -> SnapshotDiff:
+    """
+    Find the records added, removed and modified between two snapshots of a table.
+    :param old: pd.DataFrame
+        Previous snapshot.
+    :param new: pd.DataFrame
+        Current snapshot.
+    :param key: Union[str, list]
+        Columns identifying a record. If None, the key of the source is used.
+    :param source: str
+        Source of the tables, 'fda', 'gtop' or 'chembl', for the default key.
+    :return: SnapshotDiff
+    """
+    if key is None:
+        if source not in KEYS:
+            raise ValueError(f"Give a key or a source from: {', '.join(KEYS)}")
+        key = KEYS[source]
+    key = [key] if isinstance(key, str) else list(key)
+
+    old = old.reset_index(drop=True)
+    new = new.reset_index(drop=True)
+
+    # content is compared on the columns both snapshots have
+    columns = [col for col in new.columns if col in old.columns and col not in key]
+
+    old_keys, new_keys = _key_hashes(old, key), _key_hashes(new, key)
+    matches = pd.Index(old_keys).get_indexer(new_keys)
+    found = matches >= 0
+
+    added = new[~found]
+    removed_mask = np.ones(len(old), dtype=bool)
+    removed_mask[matches[found]] = False
+    removed = old[removed_mask]
+
+    # rows with the same key are modified if their content hash differs
+    new_pos, old_pos = np.flatnonzero(found), matches[found]
+    changed = _row_hashes(new, columns)[new_pos] != _row_hashes(old, columns)[old_pos]
+    new_pos, old_pos = new_pos[changed], old_pos[changed]
+
+    modified = new.iloc[new_pos].copy()
+    previous = old.iloc[old_pos].reset_index(drop=True)
+    modified['changed_columns'] = _changed_columns(previous[columns], modified[columns].reset_index(drop=True))
+
+    return SnapshotDiff(added, removed, modified, previous, key)
+
+
+def update_snapshot(data: pd.DataFrame, path: str, key: Optional[Union[str, list]] = None,
+                    source: Optional[str] = None) -> SnapshotDiff:
+    """
+    Diff a table against the snapshot saved at path, then save the table as the new snapshot. Without a saved
+    snapshot, every row is added.
+    :param data: pd.DataFrame
+        Current table.
+    :param path: str
+        Parquet file of the snapshot.
+    :param key: Union[str, list]
+        Columns identifying a record. If None, the key of the source is used.
+    :param source: str
+        Source of the table, 'fda', 'gtop' or 'chembl', for the default key.
+    :return: SnapshotDiff
+    """
+    old = pd.read_parquet(path) if os.path.exists(path) else data.iloc[:0]
+    changes = diff(old, data, key, source)
+
+    data.to_parquet(f"{path}.tmp", index=False)
+    os.replace(f"{path}.tmp", path)
+    return changes
+
+
+def _key_hashes(data: pd.DataFrame, key: list) -> np.ndarray:
+    """Hash of the key of each row. Repeated keys are told apart by their order of appearance"""
+    hashes = pd.util.hash_pandas_object(data[key].apply(_comparable), index=False, categorize=False).to_numpy()
+    repeated = pd.Index(hashes).duplicated()
+    if repeated.any():
+        # only the repeats are rehashed, so the first row of each key matches a snapshot without repeats
+        occurrence = pd.Series(hashes).groupby(hashes).cumcount().to_numpy().astype(np.uint64)
+        hashes = hashes.copy()
+        hashes[repeated] = pd.util.hash_array(hashes[repeated] ^ occurrence[repeated] * np.uint64(0x9E3779B97F4A7C15))
+    return hashes
+
+
+def _row_hashes(data: pd.DataFrame, columns: list) -> np.ndarray:
+    """Hash of the content of each row"""
+    if not columns:
+        return np.zeros(len(data), dtype=np.uint64)
+    return pd.util.hash_pandas_object(data[columns].apply(_comparable), index=False, categorize=False).to_numpy()
+
+
+def _comparable(values: pd.Series) -> pd.Series:
+    """
+    Bring a column to a dtype that hashes the same after a parquet round trip. Text and cells like lists are hashed as
+    strings, dates in nanoseconds and numbers as floats
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype('datetime64[ns]')
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        return values.astype('float64')
+    if isinstance(values.dtype, pd.StringDtype):
+        return values.astype(object)
+    return values.astype(object).where(values.isna(), values.astype(str))
+
+
+def _changed_columns(old: pd.DataFrame, new: pd.DataFrame) -> list:
+    """Names of the columns that differ in each pair of rows. Missing values on both sides are equal"""
+    if old.empty:
+        return []
+    differs = pd.DataFrame({col: ~((old[col] == new[col]).fillna(False) | (old[col].isna() & new[col].isna()))
+                            for col in old.columns})
+    names = np.array(old.columns, dtype=object)
+    return [list(names[row]) for row in differs.to_numpy(dtype=bool)]
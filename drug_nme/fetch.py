@@ -5,6 +5,7 @@ Additional information on their API can be found here: https://www.guidetopharma
 
 import re
 import os
+import httpx
 import requests
 import datetime
 import numpy as np
@@ -13,20 +14,37 @@ from bs4 import BeautifulSoup
 from tqdm import tqdm
 import zipfile
 import json
+import hashlib
 from io import BytesIO, StringIO
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urljoin
 from typing import Union
 from concurrent.futures import ThreadPoolExecutor
-from chembl_webresource_client.new_client import new_client
-from drug_nme.utils import ligand_url, FDA_LANDING, DRUGS_FDA, HEADERS, COL_TO_KEEP, NAMED_COLS, DRUG_OVERRIDE
+from drug_nme.aio import get_async_client, _gather_with_progress
+from drug_nme.session import ClientManager, get_client_manager
+from drug_nme.concurrency import get_limiter, _is_transient_error
+from drug_nme.cache import DiskCache, get_cache, cached_get, acached_get, file_lock, temp_path
+from drug_nme.schema import apply_schema, parse_dates
+from drug_nme.ipc import to_arrow
+from drug_nme.metrics import stage, checkpoint, error, enabled, memory_profile, show_progress
+from drug_nme.utils import (ligand_url, FDA_LANDING, DRUGS_FDA, HEADERS, COL_TO_KEEP, COL_DTYPES, NAMED_COLS,
+                            DRUG_OVERRIDE, CHEMBL_API)
 
 __all__ = ["FDADataFetcher", "PharmacologyDataFetcher", "_ChemblDataFetcher"]
 
 
 class _ChemblDataFetcher:  # todo process data pulled from ChEMBL
-    def __init__(self):
+    def __init__(self, manager: ClientManager = None, chembl_url: str = None):
+        """
+        :param manager: ClientManager
+            Manager for the HTTP sessions and ChEMBL clients. If None, the shared default manager is used.
+        :param chembl_url: str
+            Base URL of the ChEMBL REST API, i.e. a local stand-in server. If None, the ChEMBL client library is used.
+        """
+        self.manager = manager or get_client_manager()
+        self.chembl_url = chembl_url
+
         # Initialize the ChEMBL molecule client
-        self.chembl_client = new_client.molecule
+        self.chembl_client = self.manager.chembl('molecule') if chembl_url is None else None
         self.data = None
 
     def get_approved_drugs(self, year: int = None):
@@ -35,23 +53,29 @@ class _ChemblDataFetcher:  # todo process data pulled from ChEMBL
         If a year is provided, it only pulls drugs first approved in that year.
         """
         # In ChEMBL, max_phase = 4 means it is an approved drug
-        query = self.chembl_client.filter(max_phase=4)
+        filters = {'max_phase': 4}
 
         # If you only want a specific year, add it to the filter
         if year:
-            query = query.filter(first_approval=year)
+            filters['first_approval'] = year
 
         # 1. Ask ChEMBL for the total number of records so tqdm knows where 100% is
-        total_records = len(query)
-
-        if total_records == 0:
-            print(f"No approved drugs found for year {year}.")
-            return pd.DataFrame()
-
-        # 2. Fetch the data one by one to feed the progress bar
-        results = []
-        for record in tqdm(query, total=total_records, desc="Downloading ChEMBL Data"):
-            results.append(record)
+        with stage('download', 'chembl') as s:
+            if self.chembl_url is None:
+                query = self.chembl_client.filter(**filters)
+                total_records = len(query)
+            else:
+                query, total_records = _chembl_rest_molecules(self.manager.get, self.chembl_url, filters)
+
+            if total_records == 0:
+                print(f"No approved drugs found for year {year}.")
+                return pd.DataFrame()
+
+            # 2. Fetch the data one by one to feed the progress bar
+            results = []
+            for record in tqdm(query, total=total_records, desc="Downloading ChEMBL Data", disable=not show_progress()):
+                results.append(record)
+            s.add(rows_out=len(results))
 
         df = pd.DataFrame(results)
 
@@ -59,6 +83,23 @@ class _ChemblDataFetcher:  # todo process data pulled from ChEMBL
             print(f"No approved drugs found for year {year}!")
             return df
 
+        with stage('clean', 'chembl', rows_in=len(df)) as s:
+            self.data = self._clean_approved_drugs(df)
+            s.output(self.data)
+
+        return self.data
+
+    def to_arrow(self, path: str, data: pd.DataFrame = None):
+        """Save data as an Arrow IPC file, by default the data from the last get_approved_drugs()."""
+        if data is None:
+            data = self.data
+        return to_arrow(data, path)
+
+    @staticmethod
+    def _clean_approved_drugs(df: pd.DataFrame):
+        """
+        Support function to keep the columns and drug types of interest from the ChEMBL records.
+        """
         # Filter down to the specific columns you care about
         cols_to_keep = [
             'molecule_chembl_id',
@@ -81,9 +122,6 @@ class _ChemblDataFetcher:  # todo process data pulled from ChEMBL
         # Clean up missing names or years
         processed_df = processed_df.dropna(subset=['pref_name'])
 
-        if 'first_approval' in processed_df.columns:
-            processed_df['first_approval'] = processed_df['first_approval'].astype('Int64')
-
         # Rename columns to be cleaner
         processed_df = processed_df.rename(columns={
             'molecule_chembl_id': 'ChEMBL_ID',
@@ -102,17 +140,23 @@ class _ChemblDataFetcher:  # todo process data pulled from ChEMBL
         if 'Type' in processed_df.columns:
             processed_df = processed_df[processed_df['Type'].isin(cder_types)]
 
-        self.data = processed_df
-        return self.data
+        return apply_schema(processed_df, 'chembl')
 
 
 class PharmacologyDataFetcher:
-    def __init__(self, url: str = None):
+    def __init__(self, url: str = None, manager: ClientManager = None, cache: DiskCache = None):
         """
         :param url: str
             Can be a URL link to the JSON file or file path to JSON file on hard disk. If None, will default to Guide to
             Pharmacology json link.
+        :param manager: ClientManager
+            Manager for the HTTP sessions. If None, the shared default manager is used.
+        :param cache: DiskCache
+            Cache shared with other processes for the downloaded JSON file. If None, the default cache is used, if set.
         """
+        self.manager = manager or get_client_manager()
+        self.cache = cache if cache is not None else get_cache()
+
         # set link to Guide To Pharmacology
         if url is None:
             self.url = ligand_url
@@ -121,7 +165,7 @@ class PharmacologyDataFetcher:
 
         self.data = None
 
-    def get_data(self, url: str = None, agency: Union[str, list] = 'FDA'):
+    def get_data(self, url: str = None, agency: Union[str, list] = 'FDA', profile_memory: bool = False):
         """
         Get data from Guide to Pharmacology API and convert into pd.DataFrame.
         :param url: str
@@ -131,6 +175,9 @@ class PharmacologyDataFetcher:
             Input agency name to get data from. A list can be input or the name of a specific agency, i.e. ['FDA',
             'EMA'].
             Default to FDA.
+        :param profile_memory: bool
+            If True, trace memory while fetching and return a tuple of the data and a pd.DataFrame with the peak
+            traced memory and frame sizes at each stage and intermediate frame.
         :return:
         """
 
@@ -144,53 +191,44 @@ class PharmacologyDataFetcher:
 
         agency_list = [_check_agency_input(x) for x in agency]
 
-        # Download JSON data
-        json_data = _download_json_with_progress(url, type='guide')
-        json_df = pd.DataFrame(json_data)
-
-        extraction_tables = []
-
-        # Apply the extract_approval_info function for each query
-        for query in agency_list:
-            # apply the function to each row
-            extracted_series = json_df['approvalSource'].apply(lambda x: _extract_approval_info(x, query))
-
-            # convert Series to DataFrame and rename table
-            agency_df = extracted_series.to_frame()
-            agency_df.columns = [f"{query}_info"]
-
-            # split the 'approval_info' column into two columns
-            agency_df[[f'{query}', 'Year']] = agency_df[f"{query}_info"].str.extract(r'([^\(]+)\s*\((\d{4})\)',
-                                                                                     expand=True)
-
-            agency_df = agency_df.drop(columns=f"{query}_info")
-
-            # append to list
-            extraction_tables.append(agency_df)
-
-        # Combine the results with the original DataFrame
-        data_df = pd.concat([json_df] + extraction_tables, axis=1)
+        with memory_profile(profile_memory) as profile:
+            # Download JSON data
+            json_data = _download_json_with_progress(url, type='guide', session=self.manager.session(),
+                                                     cache=self.cache)
+            with stage('parse', 'gtop', rows_in=len(json_data)) as s:
+                processed_df = _process_ligands(json_data, agency_list)
+                s.output(processed_df)
+        self.data = processed_df  # set processed_df to self.df
 
-        # drop columns by name
-        col_to_drop = ['abbreviation', 'inn', 'species', 'radioactive', 'labelled', 'immuno', 'malaria',
-                       'antibacterial', 'subunitIds', 'complexIds', 'prodrugIds', 'activeDrugIds']
-        processed_df = data_df.drop(columns=col_to_drop).copy()
+        if profile is not None:
+            return pd.DataFrame(processed_df), profile.to_frame()
+        return pd.DataFrame(processed_df)
 
-        # Replace empty strings in approvalSource with "" and drop.
-        processed_df.replace("", np.nan, inplace=True)
+    async def aget_data(self, url: str = None, agency: Union[str, list] = 'FDA'):
+        """
+        Async version of get_data(). The JSON file is downloaded with the shared async HTTP client.
+        :param url: str
+            Input string to get data from. If None, it will default to Guide to Pharmacology json link set in the
+            __init__.
+        :param agency: str or list
+            Input agency name to get data from. A list can be input or the name of a specific agency, i.e. ['FDA',
+            'EMA'].
+            Default to FDA.
+        :return:
+        """
+        if url is None:
+            url = self.url
 
-        # For troubleshooting, remove approvalSource from list above and run or comment this during testing
-        # processed_df = processed_df.dropna(subset='approvalSource')
-        processed_df = processed_df.drop(columns='approvalSource')
+        if isinstance(agency, str):
+            agency = [agency]
 
-        # if columns after col7 are all None, remove the row
-        processed_df = processed_df.loc[~processed_df.iloc[:, 7:].isnull().all(axis=1)]
+        agency_list = [_check_agency_input(x) for x in agency]
 
-        # ensure columns are string or int
-        processed_df['type'] = processed_df['type'].astype(str)
-        processed_df['FDA'] = processed_df['FDA'].astype(str)
-        processed_df['Year'] = processed_df['Year'].astype(int)
-        self.data = processed_df  # set processed_df to self.df
+        json_data = await _adownload_json_with_progress(url)
+        with stage('parse', 'gtop', rows_in=len(json_data)) as s:
+            processed_df = _process_ligands(json_data, agency_list)
+            s.output(processed_df)
+        self.data = processed_df
 
         return pd.DataFrame(processed_df)
 
@@ -214,10 +252,71 @@ class PharmacologyDataFetcher:
 
         return pd.DataFrame(data)
 
+    def to_arrow(self, path: str, data: pd.DataFrame = None):
+        """Save data as an Arrow IPC file, by default the data from the last get_data()."""
+        if data is None:
+            data = self.data
+        return to_arrow(data, path)
+
 
 """Support functions for Pharmacology data fetcher"""
 
 
+def _process_ligands(json_data, agency_list: list):
+    """
+    Support function to convert the Guide to Pharmacology ligand JSON into a pd.DataFrame with a column for each agency
+    and the approval year.
+    """
+    json_df = pd.DataFrame(json_data)
+    checkpoint('parse', 'gtop', 'json_df', json_df)
+
+    extraction_tables = []
+
+    # Apply the extract_approval_info function for each query
+    for query in agency_list:
+        # apply the function to each row
+        extracted_series = json_df['approvalSource'].apply(lambda x: _extract_approval_info(x, query))
+
+        # convert Series to DataFrame and rename table
+        agency_df = extracted_series.to_frame()
+        agency_df.columns = [f"{query}_info"]
+
+        # split the 'approval_info' column into two columns
+        agency_df[[f'{query}', 'Year']] = agency_df[f"{query}_info"].str.extract(r'([^\(]+)\s*\((\d{4})\)',
+                                                                                 expand=True)
+
+        agency_df = agency_df.drop(columns=f"{query}_info")
+
+        # append to list
+        extraction_tables.append(agency_df)
+        checkpoint('parse', 'gtop', f'{query}_df', agency_df)
+
+    # Combine the results with the original DataFrame
+    data_df = pd.concat([json_df] + extraction_tables, axis=1)
+    checkpoint('parse', 'gtop', 'concat', data_df)
+
+    # drop columns by name
+    col_to_drop = ['abbreviation', 'inn', 'species', 'radioactive', 'labelled', 'immuno', 'malaria',
+                   'antibacterial', 'subunitIds', 'complexIds', 'prodrugIds', 'activeDrugIds']
+    processed_df = data_df.drop(columns=col_to_drop).copy()
+    checkpoint('parse', 'gtop', 'processed_copy', processed_df)
+
+    # Replace empty strings in approvalSource with "" and drop.
+    processed_df.replace("", np.nan, inplace=True)
+
+    # For troubleshooting, remove approvalSource from list above and run or comment this during testing
+    # processed_df = processed_df.dropna(subset='approvalSource')
+    processed_df = processed_df.drop(columns='approvalSource')
+
+    # if columns after col7 are all None, remove the row
+    processed_df = processed_df.loc[~processed_df.iloc[:, 7:].isnull().all(axis=1)]
+
+    # the remaining columns are cast by the gtop schema
+    processed_df['FDA'] = processed_df['FDA'].astype(str)
+
+    return apply_schema(processed_df, 'gtop')
+
+
 def _check_suffix(row, suffixes, replacement_string, col_name='name', col_output='type'):
     if any(row[col_name].endswith(suffix) for suffix in suffixes):
         return replacement_string
@@ -266,78 +365,156 @@ def _extract_approval_info(text, agency_name):
 
 
 class FDADataFetcher:
-    def __init__(self):
+    def __init__(self, max_workers: int = 10, manager: ClientManager = None, landing: str = None,
+                 new_drug_approvals: str = None, chembl_url: str = None, matcher=None, type_table=None,
+                 web_fallback: bool = False, cache_dir: str = None, cache: DiskCache = None):
+        """
+        :param max_workers: int
+            Number of threads used for the ChEMBL lookups in add_types(). The number of concurrent lookups is adapted
+            to the ChEMBL service within this limit.
+        :param manager: ClientManager
+            Manager for the HTTP sessions and ChEMBL clients. If None, the shared default manager is used. Its
+            connection pool is grown to max_workers.
+        :param landing: str
+            URL of the CDER NME compilation page. If None, it will default to the FDA site.
+        :param new_drug_approvals: str
+            Base URL of the yearly Novel Drug Approvals pages. The year is appended as '-YYYY'. If None, it will
+            default to the FDA site.
+        :param chembl_url: str
+            Base URL of the ChEMBL REST API, i.e. a local stand-in server. If None, the ChEMBL client library is used.
+        :param matcher: NameMatcher
+            Offline matcher over cached ChEMBL names, i.e. NameMatcher.load() of a cache_chembl_names() file. Names not
+            found in ChEMBL take the type of their best match, so misspelled names are typed without an override.
+        :param type_table: MoleculeTypeTable
+            Offline molecule types from a ChEMBL dump, i.e. MoleculeTypeTable.build() or MoleculeTypeTable(path). Names
+            are looked up in the table before ChEMBL is queried.
+        :param web_fallback: bool
+            Whether names missing from the type_table are queried on the ChEMBL web service. If False, they are only
+            matched with the matcher. Ignored without a type_table.
+        :param cache_dir: str
+            Directory to cache the decoded compilation file in. The cache is keyed by the file's URL and content, so a
+            new release of the file is decoded again. If None, the file is decoded on every call.
+        :param cache: DiskCache
+            Cache shared with other processes for the downloaded pages and files and the ChEMBL types. If None, the
+            default cache is used, if set.
+        """
+        self.max_workers = max_workers
+        self.manager = manager or get_client_manager()
+        self.manager.reserve(max_workers)
+
         # set link to CDER NME
-        self.landing = FDA_LANDING
-        self.new_drug_approvals = DRUGS_FDA
+        self.landing = landing or FDA_LANDING
+        self.new_drug_approvals = new_drug_approvals or DRUGS_FDA
+        self.chembl_url = chembl_url
+        self.matcher = matcher
+        self.type_table = type_table
+        self.web_fallback = web_fallback
+        self.cache_dir = cache_dir
+        self.cache = cache if cache is not None else get_cache()
         self.data = None
 
-    def get_data(self, path: str = None) -> pd.DataFrame:
+    def get_data(self, path: str = None, profile_memory: bool = False) -> pd.DataFrame:
         """
         Get data from the US FDA website.
         :param path: str
             Input string to get data from. If None, it will default to openFDA json link set in the __init__.
+        :param profile_memory: bool
+            If True, trace memory while fetching and return a tuple of the data and a pd.DataFrame with the peak
+            traced memory and frame sizes at each stage.
         :return:
         """
-
-        global url_type, json_data, file_url, df, missing_years
-
         # Check input data as url or filepath
         if path is None:
             path = self.landing
 
         current_year = datetime.date.today().year
-        years = [(current_year - year) for year in range(5)]
 
-        for year in years:
-            try:
-                response = requests.get(path, headers=HEADERS)  # HEADERS to mimic a webpage
-                soup = BeautifulSoup(response.content, 'html.parser')
+        with memory_profile(profile_memory) as profile:
+            # look for link to data and download file
+            file_content, file_url = None, None
+            with stage('download', 'fda', limiters=(get_limiter('fda'),)) as s:
+                try:
+                    # HEADERS to mimic a webpage
+                    response = cached_get(path, self._fda_get, self.cache, headers=HEADERS)
+                    s.add(bytes=len(response.content))
+                    file_url = _find_compilation_url(response.content, current_year, path)
+
+                    if file_url:
+                        file_response = cached_get(file_url, self._fda_get, self.cache, headers=HEADERS)
+                        file_response.raise_for_status()
+                        file_content = file_response.content
+                        s.add(bytes=len(file_content))
+                except requests.exceptions.RequestException as e:
+                    print(f"ERROR: {e}")
+                    error('download', 'fda', str(e))
+
+            # convert downloaded data into df
+            with stage('parse', 'fda') as s:
+                df, missing_years, cached = _read_compilation(file_content, current_year, file_url, self.cache_dir)
+                s.output(df)
+                s.add(cache_hits=int(cached))
+
+            # get missing years from Drugs@FDA
+            df2 = self._scrape_fda_drug_approvals(missing_years)
+
+            # combine dfs
+            with stage('combine', 'fda', rows_in=len(df2) + (0 if df is None else len(df))) as s:
+                df = pd.concat([df2, df], ignore_index=True)
+                s.output(df)
+        self.data = df
 
-                # look for link to data
-                pattern = f"Compilation of CDER NME and New Biologic Approvals 1985-{year}"
-                link = soup.find('a', string=pattern)
+        if profile is not None:
+            return df, profile.to_frame()
+        return df
+
+    async def aget_data(self, path: str = None, max_concurrency: int = 10) -> pd.DataFrame:
+        """
+        Async version of get_data(). The landing page, compilation file and yearly pages are downloaded with the shared
+        async HTTP client, within the FDA concurrency limit and through the cache if one is set. The yearly pages are
+        downloaded concurrently.
+        :param path: str
+            Input string to get data from. If None, it will default to openFDA json link set in the __init__.
+        :param max_concurrency: int
+            Maximum number of yearly pages downloaded at once.
+        :return:
+        """
+        if path is None:
+            path = self.landing
 
-                if link:
-                    file_url = link.get('href')
-                    link_text = link.get_text(strip=True)
+        current_year = datetime.date.today().year
 
-                    # look for url
-                    if not file_url.startswith('http'):
-                        file_url = "https://www.fda.gov" + file_url
+        file_content, file_url = None, None
+        with stage('download', 'fda', limiters=(get_limiter('fda'),)) as s:
+            try:
+                response = await acached_get(path, self._afda_get, self.cache)
+                s.add(bytes=len(response.content))
+                file_url = _find_compilation_url(response.content, current_year, path)
 
-                    # download file
-                    file_response = requests.get(file_url, headers=HEADERS)
+                if file_url:
+                    file_response = await acached_get(file_url, self._afda_get, self.cache)
                     file_response.raise_for_status()
-                    break
-            except requests.exceptions.RequestException as e:
+                    file_content = file_response.content
+                    s.add(bytes=len(file_content))
+            except httpx.HTTPError as e:
                 print(f"ERROR: {e}")
+                error('download', 'fda', str(e))
 
-        # convert downloaded data into df
-        missing_years = []
-        try:
-            df = pd.read_excel(file_url)
-
-            # clean up col headers
-            df = df[COL_TO_KEEP]
-            df = df.rename(columns=NAMED_COLS)
-            df = df.rename(columns={'NDA/BLA': 'NME/BLA'})
-
-            # refactor NDA to NME
-            df['NME/BLA'] = df['NME/BLA'].replace('NDA', 'NME')
-
-            # extract missing years
-            max_year = df['Approval Year'].max()
-            missing_years = [(current_year - year) for year in range(current_year - max_year)]
-            # # for debugging
-            # print(missing_years)
-        except Exception as e:
-            print(f"Data Download Error: {e}")
+        with stage('parse', 'fda') as s:
+            df, missing_years, cached = _read_compilation(file_content, current_year, file_url, self.cache_dir)
+            s.output(df)
+            s.add(cache_hits=int(cached))
 
         # get missing years from Drugs@FDA
-        df2 = self._scrape_fda_drug_approvals(missing_years)
+        with stage('download', 'fda', limiters=(get_limiter('fda'),)) as s:
+            responses = await _gather_with_progress(
+                [acached_get(f"{self.new_drug_approvals}-{year}", self._afda_get, self.cache) for year in missing_years],
+                limit=max_concurrency)
+            s.add(bytes=sum(len(response.content) for response in responses))
+        pages = [(year, response.status_code, response.text) for year, response in zip(missing_years, responses)]
+        with stage('parse', 'fda', rows_in=len(pages)) as s:
+            df2 = _combine_fda_approval_pages(pages)
+            s.output(df2)
 
-        # combine dfs
         df = pd.concat([df2, df], ignore_index=True)
         self.data = df
         return df
@@ -359,10 +536,55 @@ class FDADataFetcher:
 
         # multi threading
         names_list = data['Active Ingredient'].tolist()
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            results = list(tqdm(executor.map(self._fetch_chembl_types, names_list),
-                                total=len(names_list), desc="Fetching Drug Types From ChEMBL"))
-        data['Type'] = results
+        with stage('types', 'chembl', rows_in=len(names_list), limiters=(get_limiter('chembl'),)) as s:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(tqdm(executor.map(self._fetch_chembl_types, names_list), total=len(names_list),
+                                    desc="Fetching Drug Types From ChEMBL", disable=not show_progress()))
+            data['Type'] = results
+
+            # lookups that still failed after retrying are left empty rather than labelled
+            failed = sum(result is None for result in results)
+            s.output(data)
+            s.add(failed=failed, overrides=_count_overrides(names_list) if enabled() else 0)
+
+        if failed:
+            print(f"{failed} ChEMBL lookups failed after retrying and were left empty. Rerun add_types() to retry.")
+            error('types', 'chembl', f"{failed} lookups failed")
+
+        self.data = data
+
+        return data
+
+    async def aadd_types(self, data: pd.DataFrame = None, max_concurrency: int = 10) -> pd.DataFrame:
+        """
+        Async version of add_types(). The ChEMBL web service is queried with the shared async HTTP client.
+        :param data: pd.DataFrame
+            A dataframe from the get_data() function.
+        :param max_concurrency: int
+            Maximum number of ChEMBL lookups running at once.
+        :return:
+        """
+        if data is None:
+            data = self.data
+        data = data.copy()
+        if 'Active Ingredient' not in data.columns:
+            print("Error: 'Active Ingredient' column not found in dataframe.")
+            return data
+
+        client = get_async_client()
+        names_list = data['Active Ingredient'].tolist()
+        with stage('types', 'chembl', rows_in=len(names_list), limiters=(get_limiter('chembl'),)) as s:
+            results = await _gather_with_progress([self._afetch_chembl_types(client, name) for name in names_list],
+                                                  desc="Fetching Drug Types From ChEMBL", limit=max_concurrency)
+            data['Type'] = results
+
+            failed = sum(result is None for result in results)
+            s.output(data)
+            s.add(failed=failed, overrides=_count_overrides(names_list) if enabled() else 0)
+
+        if failed:
+            print(f"{failed} ChEMBL lookups failed after retrying and were left empty. Rerun aadd_types() to retry.")
+            error('types', 'chembl', f"{failed} lookups failed")
 
         self.data = data
 
@@ -392,6 +614,12 @@ class FDADataFetcher:
 
         return data
 
+    def to_arrow(self, path: str, data: pd.DataFrame = None):
+        """Save data as an Arrow IPC file, by default the data from the last get_data() or add_types()."""
+        if data is None:
+            data = self.data
+        return to_arrow(data, path)
+
     def _fetch_chembl_types(self, raw_name):
         """
         Support function to clean the data from the FDA data from the get_data() function. This will add the drug type
@@ -400,90 +628,108 @@ class FDADataFetcher:
         if pd.isna(raw_name) or not isinstance(raw_name, str):
             return "Unknown"
 
-        # set chembl client
-        molecule_client = new_client.molecule
-
-        # # prep table
-        # clean_name = raw_name.strip().lower()
+        clean_name, override = _clean_ingredient_name(raw_name)
+        if override:
+            return override
 
-        # strip hidden \xa0 space
-        clean_name = raw_name.replace('\xa0', ' ').strip().lower()
+        molecule_type = self._type_from_table(clean_name)
+        if molecule_type is not None:
+            return molecule_type
 
-        # add manual overrides for specific types not found in ChEMBL
-        if clean_name in DRUG_OVERRIDE:
-            return DRUG_OVERRIDE[clean_name]
+        # query ChEMBL
+        try:
+            molecule_type = self._query_chembl(clean_name)
+        except Exception as e:
+            # transient failures are left empty, so they are not mistaken for a type
+            if _is_transient_error(e):
+                return None
+            return f"Error {e}"
 
-        # remove parentheses
-        clean_name = re.sub(r'\(.*?\)', '', clean_name).strip()
+        return self._match_offline(clean_name, molecule_type)
 
-        # handle name combinations
-        if ' and ' in clean_name or ',' in clean_name:
-            clean_name = clean_name.replace(' and ', ',')
-            clean_name = clean_name.split(',')[0].strip()
+    async def _afetch_chembl_types(self, client, raw_name):
+        """
+        Async version of _fetch_chembl_types(). Queries the ChEMBL REST API directly.
+        """
+        if pd.isna(raw_name) or not isinstance(raw_name, str):
+            return "Unknown"
 
-        # remove FDA biologic suffixes ("-abcd")
-        clean_name = re.sub(r'-[a-z]{4}$', '', clean_name)
+        clean_name, override = _clean_ingredient_name(raw_name)
+        if override:
+            return override
 
-        # identify adn remove potential salt name
-        salt_removal = [' sulfate', ' chloride', ' hydrochloride', ' sodium', ' potassium', ' mesylate', ' acetate',
-                        ' maleate']
-        for salt in salt_removal:
-            if clean_name.endswith(salt):
-                clean_name = clean_name.replace(salt, '')
+        molecule_type = self._type_from_table(clean_name)
+        if molecule_type is not None:
+            return molecule_type
 
-        # query ChEMBL
         try:
-            # for exact name match
-            res = molecule_client.filter(pref_name__iexact=clean_name).only('molecule_type')
-            if len(res) > 0:
-                return res[0].get('molecule_type', 'Unknown')
-
-            # if name fail, try synonym
-            res_syn = molecule_client.filter(molecule_synonyms__molecule_synonym__iexact=clean_name).only(
-                'molecule_type')
-            if len(res_syn) > 0:
-                return res_syn[0].get('molecule_type', 'Unknown')
-
-            # if above fails, try partial matches (salt form)
-            res_partial = molecule_client.filter(pref_name__icontains=clean_name).only('molecule_type')
-            if len(res_partial) > 0:
-                return res_partial[0].get('molecule_type', 'Unknown')
-
+            molecule_type = await _aquery_chembl_type_rest(client, self.chembl_url or CHEMBL_API, clean_name)
         except Exception as e:
+            # transient failures are left empty, as in _fetch_chembl_types()
+            if _is_transient_error(e):
+                return None
             return f"Error {e}"
 
-        return "Not Found in ChEMBL"
+        return self._match_offline(clean_name, molecule_type)
 
-    @staticmethod
-    def _extract_links_from_fda_drugname(table_provided):
+    def _query_chembl(self, clean_name: str):
         """
-        Extract hyperlinks and drug names from the HTML table
+        Query ChEMBL for the molecule type of a cleaned name. With a cache, each name is queried once across processes.
         """
+        def query():
+            if self.chembl_url is None:
+                # set chembl client, one per thread
+                molecule_client = self.manager.chembl('molecule')
+                return get_limiter('chembl').call(_query_chembl_type, molecule_client, clean_name)
+            return get_limiter('chembl').call(_query_chembl_type_rest, self.manager.get, self.chembl_url, clean_name)
+
+        if self.cache is None:
+            return query()
+        key = f"chembl-type {self.chembl_url or CHEMBL_API} {clean_name}"
+        # a missing type is cached as an empty entry
+        value = self.cache.get_or_fetch(key, lambda: (query() or '').encode('utf-8')).decode('utf-8')
+        return value or None
+
+    def _fda_get(self, url: str, **kwargs):
+        """GET a FDA page within the FDA concurrency limit"""
+        return get_limiter('fda').call(self.manager.get, url, **kwargs)
+
+    async def _afda_get(self, url: str, **kwargs):
+        """Async version of _fda_get(), with the shared async HTTP client"""
+        return await get_limiter('fda').acall(get_async_client().get, url, **kwargs)
+
+    def _type_from_table(self, clean_name: str):
+        """
+        Type a name from the offline type table. None if there is no table, or the name is not in it and is to be
+        queried on ChEMBL.
+        """
+        if self.type_table is None:
+            return None
 
-        # Initialize lists to store links and names
-        links, names = [], []
-
-        # Iterate through each row in the provided table, excluding the header (first row)
-        for tr in table_provided.select("tr")[1:]:
-            try:
-                # Try to find the first hyperlink in the row
-                trs = tr.find("a")
-
-                # Check if trs is not None before trying to access attributes
-                if trs is not None:
-                    actual_link, name = trs.get('href', ''), trs.get_text()
-                else:
-                    actual_link, name = '', ''
+        molecule_type = self.type_table.get(clean_name)
+        if molecule_type is None and not self.web_fallback:
+            return self._match_offline(clean_name, "Not Found in ChEMBL")
+        return molecule_type
 
-            except (AttributeError, IndexError):
-                # Handle cases where there's an attribute error or indexing error
-                actual_link, name = '', ''
+    def _match_offline(self, clean_name: str, molecule_type: str):
+        """
+        Type a name not found in ChEMBL from its best match in the offline matcher, if one is set and scores high
+        enough.
+        """
+        if molecule_type != "Not Found in ChEMBL" or self.matcher is None:
+            return molecule_type
 
-            # Append the extracted link and name to the respective lists
-            links.append(actual_link)
-            names.append(name)
+        match = self.matcher.best(clean_name)
+        if match is not None and match[1]:
+            return match[1]
+        return molecule_type
 
-        return links, names
+    @staticmethod
+    def _extract_links_from_fda_drugname(table_provided):
+        """
+        Extract hyperlinks and drug names from the HTML table
+        """
+        return _extract_links_from_fda_drugname(table_provided)
 
     def _scrape_fda_drug_approvals(self, missing_years: list):
         """
@@ -493,84 +739,347 @@ class FDADataFetcher:
             A list of years to scrape from the FDA site.
         """
 
-        tables = []
+        pages = []
 
         # get data for each year
-        for year in missing_years:
-            # # for debugging
-            # print(f"Scraping data for year {year}")
+        with stage('download', 'fda', limiters=(get_limiter('fda'),)) as s:
+            for year in missing_years:
+                # url
+                url = f"{self.new_drug_approvals}-{year}"
 
-            # url
-            url = f"{self.new_drug_approvals}-{year}"
-            # # for debugging
-            # print(url)
+                # get request
+                response = cached_get(url, self._fda_get, self.cache, headers=HEADERS)
+                pages.append((year, response.status_code, response.text))
+                s.add(bytes=len(response.content))
 
-            # get and check request
-            response = requests.get(url, headers=HEADERS)
-            if response.status_code != 200:
-                print(f"Failed to retrieve content for year {year}. Status code: {response.status_code}")
-                continue
+        with stage('parse', 'fda', rows_in=len(pages)) as s:
+            df = _combine_fda_approval_pages(pages)
+            s.output(df)
 
-            # extract table
-            df_list = pd.read_html(StringIO(response.text))
+        return df
 
-            # table check
-            if not df_list:
-                print(f"No tables found for year {year}.")
-                continue
 
-            # process tables
-            df = df_list[0]
-            df.rename(columns={'Date': 'Approval Date', 'Drug  Name': 'Drug Name'}, inplace=True)
+"""
+The following are support functions for the FDA and Pharmacology Classes above 
+"""
 
-            # extract links
-            soup = BeautifulSoup(response.text, 'html.parser')
-            table = soup.find('table')
 
-            # check extracted table
-            if table is None:
-                print(f"No table found for year {year}.")
-                continue  # Skip to the next iteration
+def _find_compilation_url(html, current_year: int, base_url: str = FDA_LANDING):
+    """
+    Find the link to the Compilation of CDER NME and New Biologic Approvals file on the FDA landing page. The most
+    recent file from the last five years is used. Relative links are resolved against the landing page URL.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
 
-            # add links and names to df
-            links, names = self._extract_links_from_fda_drugname(table)
-            df['links'], df['check_names'] = links, names
+    for year in [(current_year - year) for year in range(5)]:
+        # look for link to data
+        pattern = f"Compilation of CDER NME and New Biologic Approvals 1985-{year}"
+        link = soup.find('a', string=pattern)
 
-            # append to tables list
-            tables.append(df)
+        if link:
+            file_url = link.get('href')
 
-        # process df
-        df_final = pd.concat(tables, ignore_index=True)
+            # look for url
+            if not file_url.startswith('http'):
+                file_url = urljoin(base_url, file_url)
+            return file_url
 
-        # drop junk and add additional column info
-        df_final['Approval Date'] = pd.to_datetime(df_final['Approval Date'])
-        df_final['Approval Year'] = df_final['Approval Date'].dt.year
-        df_final['Approval Date'] = df_final['Approval Date'].dt.strftime('%m/%d/%Y')
-        df_final['NME/BLA'] = df_final["Active Ingredient"].apply(_infer_ingredient_type)
+    return None
 
-        df_final = df_final.drop(columns=['No.', 'check_names', 'links', 'FDA-approved use on approval date*'])
 
-        return df_final
+def _read_compilation(file_content, current_year: int, file_url: str = None, cache_dir: str = None):
+    """
+    Read the downloaded compilation file into a pd.DataFrame. Returns the table, the list of years missing from the
+    file and whether the table was read from the cache.
+    """
+    df = None
+    missing_years = []
+    cached = False
+    try:
+        if file_content is None:
+            raise ValueError("Compilation file not found")
+        df, cached = _decode_compilation(file_content, file_url, cache_dir)
 
+        # clean up col headers
+        df = df.rename(columns=NAMED_COLS)
+        df = df.rename(columns={'NDA/BLA': 'NME/BLA'})
 
-"""
-The following are support functions for the FDA and Pharmacology Classes above 
-"""
+        # refactor NDA to NME
+        df['NME/BLA'] = df['NME/BLA'].replace('NDA', 'NME')
+        df = apply_schema(df, 'fda')
+
+        # extract missing years
+        max_year = df['Approval Year'].max()
+        missing_years = [(current_year - year) for year in range(current_year - max_year)]
+    except Exception as e:
+        print(f"Data Download Error: {e}")
+        error('parse', 'fda', str(e))
+
+    return df, missing_years, cached
+
+
+def _decode_compilation(file_content: bytes, file_url: str = None, cache_dir: str = None):
+    """
+    Decode the columns kept from the compilation workbook. With a cache_dir, the decoded columns are saved as parquet
+    keyed by the file's URL and content hash and read from there on later calls, skipping the Excel parser. Returns
+    the table and whether it was read from the cache.
+    """
+    if cache_dir is None:
+        return _decode_workbook(file_content), False
+
+    url_key = hashlib.sha256((file_url or '').encode('utf-8')).hexdigest()[:16]
+    content_key = hashlib.sha256(file_content).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"cder-{url_key}-{content_key}.parquet")
+    if os.path.exists(path):
+        return pd.read_parquet(path), True
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # one process decodes the file while the others wait for the parquet
+    with file_lock(f"{path}.lock"):
+        if os.path.exists(path):
+            return pd.read_parquet(path), True
+
+        df = _decode_workbook(file_content)
+        try:
+            # older releases of the same file are replaced
+            for filename in os.listdir(cache_dir):
+                if filename.startswith(f"cder-{url_key}-") and filename.endswith('.parquet'):
+                    os.remove(os.path.join(cache_dir, filename))
+            tmp_path = temp_path(path)
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Cache Write Error: {e}")
+
+    return df, False
+
+
+def _decode_workbook(file_content: bytes) -> pd.DataFrame:
+    """Parse only the kept columns of the compilation workbook"""
+    return pd.read_excel(BytesIO(file_content), usecols=COL_TO_KEEP, dtype=COL_DTYPES)[COL_TO_KEEP]
+
+
+def _parse_fda_approval_page(year: int, status_code: int, text: str):
+    """
+    Extract the approval table from a Novel Drug Approvals page. Returns None if the page has no table.
+    """
+    if status_code != 200:
+        print(f"Failed to retrieve content for year {year}. Status code: {status_code}")
+        error('download', 'fda', f"status {status_code} for year {year}")
+        return None
+
+    # extract table
+    df_list = pd.read_html(StringIO(text))
+
+    # table check
+    if not df_list:
+        print(f"No tables found for year {year}.")
+        return None
+
+    # process tables
+    df = df_list[0]
+    df.rename(columns={'Date': 'Approval Date', 'Drug  Name': 'Drug Name'}, inplace=True)
+
+    # extract links
+    soup = BeautifulSoup(text, 'html.parser')
+    table = soup.find('table')
+
+    # check extracted table
+    if table is None:
+        print(f"No table found for year {year}.")
+        return None
+
+    # add links and names to df
+    links, names = _extract_links_from_fda_drugname(table)
+    df['links'], df['check_names'] = links, names
 
+    return df
 
-def _download_json_with_progress(url, type: str = None):
+
+def _combine_fda_approval_pages(pages: list):
+    """
+    Combine the (year, status_code, text) of each Novel Drug Approvals page into a single pd.DataFrame.
+    """
+    tables = [_parse_fda_approval_page(year, status_code, text) for year, status_code, text in pages]
+    tables = [df for df in tables if df is not None]
+
+    # process df
+    df_final = pd.concat(tables, ignore_index=True)
+    checkpoint('parse', 'fda', 'pages', df_final)
+
+    # drop junk and add additional column info
+    df_final['Approval Date'] = parse_dates(df_final['Approval Date'])
+    df_final['Approval Year'] = df_final['Approval Date'].dt.year
+    df_final['NME/BLA'] = df_final["Active Ingredient"].apply(_infer_ingredient_type)
+
+    df_final = df_final.drop(columns=['No.', 'check_names', 'links', 'FDA-approved use on approval date*'])
+
+    return apply_schema(df_final, 'fda')
+
+
+def _extract_links_from_fda_drugname(table_provided):
+    """
+    Extract hyperlinks and drug names from the HTML table
+    """
+
+    # Initialize lists to store links and names
+    links, names = [], []
+
+    # Iterate through each row in the provided table, excluding the header (first row)
+    for tr in table_provided.select("tr")[1:]:
+        try:
+            # Try to find the first hyperlink in the row
+            trs = tr.find("a")
+
+            # Check if trs is not None before trying to access attributes
+            if trs is not None:
+                actual_link, name = trs.get('href', ''), trs.get_text()
+            else:
+                actual_link, name = '', ''
+
+        except (AttributeError, IndexError):
+            # Handle cases where there's an attribute error or indexing error
+            actual_link, name = '', ''
+
+        # Append the extracted link and name to the respective lists
+        links.append(actual_link)
+        names.append(name)
+
+    return links, names
+
+
+def _clean_ingredient_name(raw_name: str):
+    """
+    Clean an FDA active ingredient name for a ChEMBL lookup. Returns the cleaned name and the type from DRUG_OVERRIDE,
+    if the drug has a manual override.
+    """
+    # strip hidden \xa0 space
+    clean_name = raw_name.replace('\xa0', ' ').strip().lower()
+
+    # add manual overrides for specific types not found in ChEMBL
+    if clean_name in DRUG_OVERRIDE:
+        return clean_name, DRUG_OVERRIDE[clean_name]
+
+    # remove parentheses
+    clean_name = re.sub(r'\(.*?\)', '', clean_name).strip()
+
+    # handle name combinations
+    if ' and ' in clean_name or ',' in clean_name:
+        clean_name = clean_name.replace(' and ', ',')
+        clean_name = clean_name.split(',')[0].strip()
+
+    # remove FDA biologic suffixes ("-abcd")
+    clean_name = re.sub(r'-[a-z]{4}$', '', clean_name)
+
+    # identify adn remove potential salt name
+    salt_removal = [' sulfate', ' chloride', ' hydrochloride', ' sodium', ' potassium', ' mesylate', ' acetate',
+                    ' maleate']
+    for salt in salt_removal:
+        if clean_name.endswith(salt):
+            clean_name = clean_name.replace(salt, '')
+
+    return clean_name, None
+
+
+def _count_overrides(names: list):
+    """Count the names typed from DRUG_OVERRIDE without a ChEMBL lookup"""
+    return sum(isinstance(name, str) and _clean_ingredient_name(name)[1] is not None for name in names)
+
+
+def _query_chembl_type(molecule_client, clean_name: str):
+    """Query ChEMBL for the molecule type of a cleaned name"""
+    # for exact name match, then synonym, then partial matches (salt form)
+    for query in _chembl_type_queries(clean_name):
+        res = molecule_client.filter(**query).only('molecule_type')
+        if len(res) > 0:
+            return res[0].get('molecule_type') or 'Unknown'
+
+    return "Not Found in ChEMBL"
+
+
+def _query_chembl_type_rest(get, chembl_url: str, clean_name: str):
+    """Query the ChEMBL REST API for the molecule type of a cleaned name"""
+    for query in _chembl_type_queries(clean_name):
+        params = {**query, 'only': 'molecule_type', 'limit': 1}
+        response = get(f"{chembl_url}/molecule.json", params=params)
+        response.raise_for_status()
+        molecules = response.json().get('molecules', [])
+        if len(molecules) > 0:
+            return molecules[0].get('molecule_type') or 'Unknown'
+
+    return "Not Found in ChEMBL"
+
+
+async def _aquery_chembl_type_rest(client, chembl_url: str, clean_name: str):
+    """Async version of _query_chembl_type_rest(). Each request goes through the ChEMBL limiter"""
+    for query in _chembl_type_queries(clean_name):
+        params = {**query, 'only': 'molecule_type', 'limit': 1}
+        response = await get_limiter('chembl').acall(client.get, f"{chembl_url}/molecule.json", params=params)
+        response.raise_for_status()
+        molecules = response.json().get('molecules', [])
+        if len(molecules) > 0:
+            return molecules[0].get('molecule_type') or 'Unknown'
+
+    return "Not Found in ChEMBL"
+
+
+def _chembl_rest_molecules(get, chembl_url: str, filters: dict, limit: int = 1000):
+    """
+    Page through the ChEMBL REST API molecule endpoint. Returns a generator over the molecules and the total count.
+    """
+    def get_page(offset):
+        response = get(f"{chembl_url}/molecule.json", params={**filters, 'limit': limit, 'offset': offset})
+        response.raise_for_status()
+        return response.json()
+
+    first_page = get_page(0)
+
+    def molecules():
+        page, offset = first_page, 0
+        while True:
+            yield from page.get('molecules', [])
+            offset += limit
+            if not page.get('page_meta', {}).get('next'):
+                break
+            page = get_page(offset)
+
+    return molecules(), first_page.get('page_meta', {}).get('total_count', 0)
+
+
+def _chembl_type_queries(clean_name: str):
+    """ChEMBL molecule filters to try, in order: exact name, synonym and partial name (salt form)"""
+    return [
+        {'pref_name__iexact': clean_name},
+        {'molecule_synonyms__molecule_synonym__iexact': clean_name},
+        {'pref_name__icontains': clean_name},
+    ]
+
+
+def _download_json_with_progress(url, type: str = None, session: requests.Session = None, cache: DiskCache = None):
     """
     Support function to download the json file and add a progress bar.
     :param url: str
         Link to download the json file.
     :param type: str
         Describe information source. Can be "guide" (Guide to Pharmacology) or "fda" (openFDA).
+    :param session: requests.Session
+        Session used for the download. If None, a new connection is opened.
+    :param cache: DiskCache
+        Cache shared with other processes. The Guide to Pharmacology file is downloaded once for all of them.
     :return: json_data
     """
+    get = session.get if session is not None else requests.get
+
+    if type == 'guide' and cache is not None:
+        with stage('download', 'gtop') as s:
+            response = cached_get(url, get, cache)
+            from_cache = getattr(response, 'from_cache', False)
+            s.add(bytes=len(response.content), requests=int(not from_cache), cache_hits=int(from_cache))
+        return json.loads(response.content.decode('utf-8'))
 
     if type == 'guide':
         # Send a GET request to the URL
-        response = requests.get(url, stream=True)
+        response = get(url, stream=True)
 
         # Get the total file size from the headers
         total_size = int(response.headers.get('content-length', 0))
@@ -579,10 +1088,12 @@ def _download_json_with_progress(url, type: str = None):
         data = b''
 
         # Use tqdm to display the progress bar
-        for chunk in tqdm(response.iter_content(1024), total=total_size // 1024, unit='KB',
-                          desc='Downloading Data From Guide To Pharmacology'):
-            # Accumulate the data chunks
-            data += chunk
+        with stage('download', 'gtop') as s:
+            for chunk in tqdm(response.iter_content(1024), total=total_size // 1024, unit='KB',
+                              desc='Downloading Data From Guide To Pharmacology', disable=not show_progress()):
+                # Accumulate the data chunks
+                data += chunk
+            s.add(bytes=len(data), requests=1)
 
         # Decode the accumulated byte string to a JSON object
         json_guide_data = json.loads(data.decode('utf-8'))
@@ -591,7 +1102,7 @@ def _download_json_with_progress(url, type: str = None):
 
     elif type == 'fda':
         # Send a GET request to the URL
-        response = requests.get(url, stream=True)
+        response = get(url, stream=True)
 
         # Get the total file size from the headers
         total_size = int(response.headers.get('content-length', 0))
@@ -600,10 +1111,12 @@ def _download_json_with_progress(url, type: str = None):
         data_zip = b''
 
         # Use tqdm to display the progress bar
-        for chunk in tqdm(response.iter_content(1024), total=total_size // 1024, unit='KB',
-                          desc='Downloading Data From openFDA'):
-            # Accumulate the data chunks
-            data_zip += chunk
+        with stage('download', 'fda') as s:
+            for chunk in tqdm(response.iter_content(1024), total=total_size // 1024, unit='KB',
+                              desc='Downloading Data From openFDA', disable=not show_progress()):
+                # Accumulate the data chunks
+                data_zip += chunk
+            s.add(bytes=len(data_zip), requests=1)
 
         data = BytesIO(data_zip)
 
@@ -619,6 +1132,34 @@ def _download_json_with_progress(url, type: str = None):
         return fda_data
 
 
+async def _adownload_json_with_progress(url):
+    """
+    Async version of _download_json_with_progress() for the Guide to Pharmacology json file. Uses the shared async HTTP
+    client.
+    :param url: str
+        Link to download the json file.
+    :return: json_data
+    """
+    client = get_async_client()
+
+    with stage('download', 'gtop') as s:
+        async with client.stream('GET', url) as response:
+            # Get the total file size from the headers
+            total_size = int(response.headers.get('content-length', 0))
+
+            chunks = []
+            with tqdm(total=total_size // 1024, unit='KB', desc='Downloading Data From Guide To Pharmacology',
+                      disable=not show_progress()) as pbar:
+                async for chunk in response.aiter_bytes(1024):
+                    chunks.append(chunk)
+                    pbar.update(1)
+
+        data = b''.join(chunks)
+        s.add(bytes=len(data), requests=1)
+
+    return json.loads(data.decode('utf-8'))
+
+
 def _path_or_url(path: str = None):
     """
     Check if input string is a filepath or a url. Output will be a string
@@ -0,0 +1,145 @@
+"""
+Arrow IPC (Feather v2) files for the fetched and aggregated tables. Tables are written uncompressed as a single record
+batch, so a reader can memory-map the file instead of reading it. read_arrow() builds the pd.DataFrame on top of the
+mapping: numeric and date columns are views of the mapped pages and text columns stay Arrow-backed, so loading takes
+milliseconds whatever the size of the table and reader processes share one physical copy through the page cache.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from typing import Optional, Union
+from drug_nme.cache import temp_path
+
+__all__ = ["to_arrow", "read_arrow"]
+
+
+def to_arrow(data: pd.DataFrame, path: str) -> str:
+    """
+    Save a table as an Arrow IPC (Feather v2) file that read_arrow() can memory-map. The file is replaced atomically,
+    so processes that mapped the old file keep reading it until they load again.
+    :param data: pd.DataFrame
+        Table to save, i.e. from a fetcher or the df of FDAPlot or Plot. A non default index is saved and restored.
+    :param path: str
+        Output file, i.e. 'fda.arrow'.
+    :return: str
+        The path.
+    """
+    table = pa.Table.from_pandas(_arrow_compatible(data), preserve_index=None)
+
+    tmp_path = temp_path(path)
+    try:
+        # one record batch, so every column is one contiguous buffer in the file
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table.combine_chunks())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def read_arrow(path: str, columns: Optional[list] = None, as_table: bool = False) -> Union[pd.DataFrame, pa.Table]:
+    """
+    Load an Arrow IPC (Feather v2) file by memory-mapping it. The file is mapped copy-on-write: the returned table can
+    be modified, and only the pages written to are copied.
+    :param path: str
+        File saved by to_arrow(). Files from pd.DataFrame.to_feather() are also read, but compressed files are
+        decompressed into memory.
+    :param columns: list
+        Columns to load. If None, all columns are loaded.
+    :param as_table: bool
+        If True, return the pyarrow.Table instead of a pd.DataFrame.
+    """
+    mapping = np.memmap(path, dtype=np.uint8, mode='c')
+    table = pa.ipc.open_file(pa.BufferReader(pa.py_buffer(mapping))).read_all()
+    if columns is not None:
+        table = table.select(_with_index_columns(table, columns))
+    if as_table:
+        return table
+    return _to_frame(table, mapping)
+
+
+"""Support functions"""
+
+
+def _arrow_compatible(data: pd.DataFrame) -> pd.DataFrame:
+    """Cast object columns mixing types (i.e. lists and strings from the JSON sources) to strings"""
+    mixed = [col for col in data.columns if data[col].dtype == object and
+             data[col].dropna().map(type).nunique() > 1]
+    if not mixed:
+        return data
+    data = data.copy(deep=False)
+    for col in mixed:
+        data[col] = data[col].where(data[col].isna(), data[col].astype(str))
+    return data
+
+
+def _with_index_columns(table: pa.Table, columns: list) -> list:
+    """Selected columns and the saved index columns, so the index is restored"""
+    metadata = table.schema.pandas_metadata or {}
+    index = [col for col in metadata.get('index_columns', []) if isinstance(col, str) and col not in columns]
+    return list(columns) + index
+
+
+def _to_frame(table: pa.Table, mapping: np.memmap) -> pd.DataFrame:
+    """Build a pd.DataFrame from a mapped table without copying the numeric and date columns"""
+    metadata = table.schema.pandas_metadata
+    if not metadata or len(metadata.get('column_indexes', [])) > 1:
+        # i.e. MultiIndex columns, which pyarrow rebuilds itself
+        return table.to_pandas()
+
+    numpy_types = {col['field_name']: col['numpy_type'] for col in metadata['columns']}
+    names = {col['field_name']: col['name'] for col in metadata['columns']}
+    frame = pd.DataFrame({name: _to_array(column, numpy_types.get(name), mapping)
+                          for name, column in zip(table.column_names, table.columns)}, copy=False)
+
+    # restore the index saved by to_arrow()
+    index_columns = metadata.get('index_columns', [])
+    saved = [col for col in index_columns if isinstance(col, str)]
+    if saved:
+        frame = frame.set_index(saved)
+        frame.index.names = [names.get(col) for col in saved]
+    elif index_columns and index_columns[0].get('kind') == 'range':
+        index = index_columns[0]
+        if len(range(index['start'], index['stop'], index['step'])) == len(frame):
+            frame.index = pd.RangeIndex(index['start'], index['stop'], index['step'], name=index['name'])
+    return frame
+
+
+def _to_array(column: pa.ChunkedArray, numpy_type: Optional[str], mapping: np.memmap):
+    """
+    Column as an array for pandas. Numbers and dates are views of the mapping, nullable integers and floats a view and
+    a mask. Other columns are converted by pyarrow, which keeps text Arrow-backed
+    """
+    if column.num_chunks == 1:
+        chunk = column.chunk(0)
+        kind = chunk.type
+        is_numeric = pa.types.is_integer(kind) or pa.types.is_floating(kind)
+        is_date = (pa.types.is_timestamp(kind) and kind.tz is None) or pa.types.is_duration(kind)
+        nullable = numpy_type is not None and numpy_type[:1].isupper()
+
+        if is_numeric and nullable:
+            mask = chunk.is_null().to_numpy(zero_copy_only=False)
+            values = _view(chunk, mapping)
+            array_class = pd.arrays.IntegerArray if pa.types.is_integer(kind) else pd.arrays.FloatingArray
+            return array_class(values, mask, copy=False)
+        if (is_numeric or is_date) and chunk.null_count == 0:
+            return _view(chunk, mapping)
+
+    return column.to_pandas()
+
+
+def _view(chunk: pa.Array, mapping: np.memmap) -> np.ndarray:
+    """Writable copy-on-write view of the values of an array in the mapping"""
+    dtype = np.dtype(chunk.type.to_pandas_dtype())
+    buffer = chunk.buffers()[1]
+    if buffer is None:
+        return chunk.to_numpy(zero_copy_only=False)
+    start = buffer.address - mapping.ctypes.data
+    end = start + (chunk.offset + len(chunk)) * dtype.itemsize
+    if start < 0 or end > len(mapping):
+        # not in the mapping, i.e. a decompressed buffer
+        return chunk.to_numpy(zero_copy_only=False)
+    return mapping[start:end].view(np.ndarray).view(dtype)[chunk.offset:]
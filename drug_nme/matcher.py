@@ -0,0 +1,202 @@
+"""
+Offline approximate name matching. Names are indexed by their character trigrams. A query collects the names sharing
+the most trigrams with it and ranks them by string similarity, so misspelled names (i.e. 'clofarbine') can be matched to
+a locally cached list of ChEMBL names and synonyms without further network requests.
+"""
+
+import difflib
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from typing import Optional
+from drug_nme.session import ClientManager, get_client_manager
+from drug_nme.concurrency import get_limiter
+from drug_nme.metrics import show_progress
+from drug_nme.utils import CHEMBL_API
+
+__all__ = ["NameMatcher", "cache_chembl_names"]
+
+# fields requested for the cached ChEMBL name list
+CHEMBL_NAME_FIELDS = 'molecule_chembl_id,pref_name,molecule_type,molecule_synonyms'
+
+
+class NameMatcher:
+    def __init__(self, names: list, values: Optional[list] = None, min_score: float = 0.85, candidates: int = 20):
+        """
+        :param names: list
+            Names to match against.
+        :param values: list
+            Value for each name, i.e. the molecule type. Optional.
+        :param min_score: float
+            Default lowest similarity score for best(), from 0 to 1.
+        :param candidates: int
+            Number of names sharing the most trigrams with a query that are scored by similarity.
+        """
+        self.names = np.asarray(names, dtype=object)
+        self.values = np.asarray(values, dtype=object) if values is not None else None
+        self.min_score = min_score
+        self.candidates = candidates
+        self._keys = [_normalize(name) for name in self.names]
+
+        # inverted index of trigram -> positions of the names containing it
+        postings = {}
+        sizes = np.zeros(len(self._keys), dtype=np.int32)
+        for i, key in enumerate(self._keys):
+            grams = _grams(key)
+            sizes[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self._index = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._sizes = sizes
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, name_col: str = 'name', value_col: Optional[str] = 'molecule_type',
+                   **kwargs) -> 'NameMatcher':
+        """
+        Build a matcher from a table, i.e. one saved by cache_chembl_names().
+        :param data: pd.DataFrame
+            Table of names.
+        :param name_col: str
+            Column with the names.
+        :param value_col: str
+            Column with the values. Optional.
+        :param kwargs:
+            Keyword arguments for NameMatcher.
+        """
+        data = data.dropna(subset=[name_col])
+        values = data[value_col].tolist() if value_col else None
+        return cls(data[name_col].tolist(), values, **kwargs)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'NameMatcher':
+        """
+        Build a matcher from a name list saved by cache_chembl_names().
+        :param path: str
+            Path to the parquet file.
+        :param kwargs:
+            Keyword arguments for NameMatcher.from_frame().
+        """
+        return cls.from_frame(pd.read_parquet(path), **kwargs)
+
+    def query(self, name: str, k: int = 5, min_score: float = 0.0) -> list:
+        """
+        Find the names most similar to a name.
+        :param name: str
+            Name to look up.
+        :param k: int
+            Number of matches to return.
+        :param min_score: float
+            Lowest similarity score to return, from 0 to 1.
+        :return: list
+            Up to k (name, value, score) tuples, best first. The value is None if the matcher has no values.
+        """
+        key = _normalize(name)
+        grams = _grams(key)
+        postings = sorted((self._index[gram] for gram in grams if gram in self._index), key=len)
+        if not postings:
+            return []
+
+        # a close match shares most trigrams with the query, so it shares at least one of the rarest half. Leaving out
+        # the common trigrams keeps the candidate set small
+        hits = np.concatenate(postings[:len(grams) // 2 + 1])
+
+        # names sharing the most trigrams relative to their length are the candidates
+        ids, shared = np.unique(hits, return_counts=True)
+        overlap = shared / (len(grams) + self._sizes[ids])
+        n_candidates = max(k, self.candidates)
+        if len(ids) > n_candidates:
+            top = np.argpartition(overlap, -n_candidates)[-n_candidates:]
+            ids = ids[top]
+
+        matcher = difflib.SequenceMatcher(b=key, autojunk=False)
+        scored = []
+        for i in ids:
+            matcher.set_seq1(self._keys[i])
+            score = matcher.ratio()
+            if score >= min_score:
+                scored.append((score, int(i)))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        return [(self.names[i], self.values[i] if self.values is not None else None, score) for score, i in scored[:k]]
+
+    def best(self, name: str, min_score: Optional[float] = None):
+        """
+        Best match for a name, or None if no name scores at least min_score.
+        :param name: str
+            Name to look up.
+        :param min_score: float
+            Lowest similarity score, from 0 to 1. If None, the matcher's min_score is used.
+        """
+        matches = self.query(name, k=1, min_score=self.min_score if min_score is None else min_score)
+        return matches[0] if matches else None
+
+    def match(self, names: pd.Series, k: int = 1, min_score: float = 0.0) -> pd.DataFrame:
+        """
+        Find the top-k matches for each name.
+        :param names: pd.Series
+            Names to look up.
+        :param k: int
+            Number of matches per name.
+        :param min_score: float
+            Lowest similarity score to return, from 0 to 1.
+        :return: pd.DataFrame
+            One row per match with the query, rank, name, value and score.
+        """
+        rows = []
+        for query in pd.Series(names).dropna().unique():
+            for rank, (name, value, score) in enumerate(self.query(query, k, min_score), start=1):
+                rows.append((query, rank, name, value, score))
+        return pd.DataFrame(rows, columns=['query', 'rank', 'name', 'value', 'score'])
+
+
+def cache_chembl_names(path: str, filters: Optional[dict] = None, manager: ClientManager = None,
+                       chembl_url: str = None) -> pd.DataFrame:
+    """
+    Download ChEMBL preferred names and synonyms with their molecule type and save them to a parquet file for
+    NameMatcher.load().
+    :param path: str
+        Output parquet file.
+    :param filters: dict
+        ChEMBL molecule filters. If None, molecules that reached clinical trials ({'max_phase__gte': 1}) are cached.
+    :param manager: ClientManager
+        Manager for the HTTP sessions. If None, the shared default manager is used.
+    :param chembl_url: str
+        Base URL of the ChEMBL REST API. If None, it will default to the EBI ChEMBL API.
+    :return: pd.DataFrame
+        The cached names, with the name, chembl_id and molecule_type.
+    """
+    from drug_nme.fetch import _chembl_rest_molecules
+
+    manager = manager or get_client_manager()
+    params = {**({'max_phase__gte': 1} if filters is None else filters), 'only': CHEMBL_NAME_FIELDS}
+
+    def get(url, **kwargs):
+        return get_limiter('chembl').call(manager.get, url, **kwargs)
+
+    molecules, total = _chembl_rest_molecules(get, chembl_url or CHEMBL_API, params)
+
+    rows = []
+    for molecule in tqdm(molecules, total=total, desc='Downloading ChEMBL Names', disable=not show_progress()):
+        synonyms = [synonym.get('molecule_synonym') for synonym in molecule.get('molecule_synonyms') or []]
+        for name in [molecule.get('pref_name')] + synonyms:
+            if name:
+                rows.append((name, molecule.get('molecule_chembl_id'), molecule.get('molecule_type')))
+
+    table = pd.DataFrame(rows, columns=['name', 'chembl_id', 'molecule_type'])
+    table = table.drop_duplicates(subset=['name', 'chembl_id'], ignore_index=True)
+    table.to_parquet(path, index=False)
+    return table
+
+
+def _normalize(name) -> str:
+    """Lower case the name and collapse whitespace"""
+    return ' '.join(str(name).replace('\xa0', ' ').lower().split())
+
+
+def _grams(key: str) -> set:
+    """Character trigrams of a name, padded so the first and last characters count"""
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
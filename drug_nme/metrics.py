@@ -0,0 +1,359 @@
+"""
+Instrumentation for the fetchers. Each stage (download, parse, clean, type resolution, aggregation) emits an event with
+its wall time, bytes downloaded, request count, cache hits, names typed from DRUG_OVERRIDE ('overrides') and rows
+in/out to the registered callbacks. With no callback registered, stages are no-ops. While a MemoryProfile is active,
+stages also record traced and peak memory and the size of the frames they produce.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+import pandas as pd
+from contextlib import nullcontext
+from typing import Callable
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+__all__ = ["Metrics", "MemoryProfile", "add_callback", "remove_callback", "set_progress", "show_progress"]
+
+# registered event callbacks
+_callbacks = []
+
+# number of active memory profiles
+_profiling = 0
+
+# stages measuring memory, outermost first. tracemalloc has one peak for the process, so it is reset when a stage starts
+# or ends and the peak up to then is added to every open stage
+_open_stages = []
+_profile_lock = threading.Lock()
+
+# fields holding a level rather than a count. They are totalled by their max
+GAUGES = ('peak_bytes', 'traced_bytes', 'frame_bytes', 'max_rss_bytes')
+
+# progress bars can also be disabled with DRUG_NME_PROGRESS=0
+_progress = os.environ.get('DRUG_NME_PROGRESS', '1') != '0'
+
+
+def add_callback(callback: Callable):
+    """
+    Register a callback. It is called with an event dict for each finished stage, i.e. {'stage': 'download',
+    'source': 'fda', 'seconds': 1.2, 'bytes': 1048576, 'requests': 2}.
+    :param callback: Callable
+        Function or Metrics instance taking the event dict.
+    """
+    _callbacks.append(callback)
+    return callback
+
+
+def remove_callback(callback: Callable):
+    """
+    Unregister a callback.
+    :param callback: Callable
+        A callback registered with add_callback().
+    """
+    if callback in _callbacks:
+        _callbacks.remove(callback)
+
+
+def set_progress(enabled: bool):
+    """
+    Show or hide the tqdm progress bars of all fetchers.
+    :param enabled: bool
+        Whether to show progress bars.
+    """
+    global _progress
+    _progress = enabled
+
+
+def show_progress() -> bool:
+    """Whether progress bars are shown."""
+    return _progress
+
+
+def enabled() -> bool:
+    """Whether any callback is registered."""
+    return bool(_callbacks)
+
+
+def stage(name: str, source: str = None, rows_in: int = None, limiters: tuple = ()):
+    """
+    Time a stage. Use as a context manager and add counters to it, i.e.
+    with stage('download', 'fda') as s: s.add(bytes=len(content), requests=1)
+    :param name: str
+        Stage name: 'download', 'parse', 'clean', 'types' or 'aggregate'.
+    :param source: str
+        Data source, i.e. 'fda', 'gtop', 'chembl' or 'uniprot'.
+    :param rows_in: int
+        Number of rows going into the stage.
+    :param limiters: tuple
+        AdaptiveLimiters used in the stage. Their calls and retries during the stage are added as 'requests' and
+        'retries'. Calls made by other threads through the same limiter at the same time are counted too.
+    """
+    if not _callbacks:
+        return _NULL_STAGE
+    return _Stage(name, source, rows_in, limiters)
+
+
+def emit(event: dict):
+    """Send an event to all callbacks"""
+    for callback in list(_callbacks):
+        callback(event)
+
+
+def checkpoint(name: str, source: str, label: str, frame: pd.DataFrame = None):
+    """
+    Record memory at a point within a stage, i.e. after an intermediate frame is built. Only used while a
+    MemoryProfile is active.
+    :param name: str
+        Stage name.
+    :param source: str
+        Data source.
+    :param label: str
+        Name of the checkpoint, i.e. the intermediate frame.
+    :param frame: pd.DataFrame
+        Frame to measure with memory_usage(deep=True).
+    """
+    if _profiling:
+        event = {'stage': name, 'source': source, 'checkpoint': label, **_memory()}
+        with _profile_lock:
+            if _open_stages:
+                event['peak_bytes'] = max(event['peak_bytes'], _open_stages[-1].peak)
+        if frame is not None:
+            event['frame_bytes'] = _frame_bytes(frame)
+        emit(event)
+
+
+def memory_profile(enabled: bool = True):
+    """
+    A MemoryProfile context if enabled, else a context giving None. Used by the fetchers' profile_memory option.
+    """
+    return MemoryProfile() if enabled else nullcontext()
+
+
+def error(name: str, source: str, message: str):
+    """
+    Report an error that the fetchers print, i.e. a failed download, as an event with an 'errors' count and a
+    'message'.
+    """
+    if _callbacks:
+        emit({'stage': name, 'source': source, 'errors': 1, 'message': message})
+
+
+class _Stage:
+    __slots__ = ('event', 'start', 'limiters', 'counts', 'profiling', 'peak')
+
+    def __init__(self, name, source, rows_in, limiters):
+        self.event = {'stage': name, 'source': source}
+        if rows_in is not None:
+            self.event['rows_in'] = rows_in
+        self.limiters = limiters
+
+    def add(self, **counters):
+        for key, value in counters.items():
+            self.event[key] = self.event.get(key, 0) + value
+
+    def output(self, frame: pd.DataFrame):
+        """Record the frame produced by the stage. Its size is measured while profiling memory."""
+        if frame is None:
+            return
+        self.add(rows_out=len(frame))
+        if self.profiling:
+            self.event['frame_bytes'] = _frame_bytes(frame)
+
+    def _limiter_counts(self):
+        stats = [limiter.stats() for limiter in self.limiters]
+        return sum(s['calls'] for s in stats), sum(s['retries'] for s in stats)
+
+    def __enter__(self):
+        self.counts = self._limiter_counts() if self.limiters else None
+        self.profiling = bool(_profiling) and tracemalloc.is_tracing()
+        if self.profiling:
+            # the peak is measured from the start of each stage
+            with _profile_lock:
+                _fold_peak()
+                self.peak = tracemalloc.get_traced_memory()[0]
+                _open_stages.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.event['seconds'] = time.perf_counter() - self.start
+        if self.profiling:
+            with _profile_lock:
+                _fold_peak()
+                _open_stages.remove(self)
+            self.event.update(_memory(), peak_bytes=self.peak)
+        if self.counts is not None:
+            calls, retries = self._limiter_counts()
+            self.add(requests=calls - self.counts[0], retries=retries - self.counts[1])
+        if exc_type is not None:
+            self.event['errors'] = self.event.get('errors', 0) + 1
+        emit(self.event)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def add(self, **counters):
+        pass
+
+    def output(self, frame):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Metrics:
+    def __init__(self, keep_events: bool = False):
+        """
+        Collect stage events and total them per stage and source. Register with add_callback(), or use as a context
+        manager to register it for a block.
+        :param keep_events: bool
+            Whether to also keep every raw event in self.events.
+        """
+        self.totals = {}
+        self.events = []
+        self.keep_events = keep_events
+        self._lock = threading.Lock()
+
+    def __call__(self, event: dict):
+        # memory checkpoints within a stage are left to MemoryProfile
+        if 'checkpoint' in event:
+            return
+        key = (event.get('stage'), event.get('source'))
+        with self._lock:
+            totals = self.totals.setdefault(key, {'calls': 0})
+            # error reports are not stage runs
+            if 'seconds' in event:
+                totals['calls'] += 1
+            for field, value in event.items():
+                if field in GAUGES:
+                    totals[field] = max(totals.get(field, 0), value)
+                elif field not in ('stage', 'source') and isinstance(value, (int, float)):
+                    totals[field] = totals.get(field, 0) + value
+            if self.keep_events:
+                self.events.append(dict(event))
+
+    def __enter__(self):
+        return add_callback(self)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        remove_callback(self)
+
+    def to_dict(self) -> list:
+        """Totals as a list of dicts, one per stage and source."""
+        with self._lock:
+            return [{'stage': stage, 'source': source, **totals} for (stage, source), totals in self.totals.items()]
+
+    def to_json(self) -> str:
+        """Totals as a JSON string."""
+        return json.dumps(self.to_dict(), indent=1)
+
+    def to_prometheus(self, prefix: str = 'drug_nme') -> str:
+        """Totals in the Prometheus text exposition format. Memory levels are gauges, everything else counters."""
+        series = {}
+        for row in self.to_dict():
+            labels = f'stage="{row["stage"]}",source="{row["source"] or ""}"'
+            for field, value in row.items():
+                if field not in ('stage', 'source'):
+                    name = f"{prefix}_{field}" if field in GAUGES else f"{prefix}_{field}_total"
+                    series.setdefault(name, ('gauge' if field in GAUGES else 'counter', []))[1].append(
+                        f"{name}{{{labels}}} {value}")
+
+        lines = []
+        for name, (kind, samples) in series.items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Clear the collected totals and events."""
+        with self._lock:
+            self.totals = {}
+            self.events = []
+
+
+class MemoryProfile:
+    def __init__(self):
+        """
+        Record traced memory at each stage boundary and checkpoint. Use as a context manager. tracemalloc is started for
+        the block if it is not already running, which slows the code down while profiling. Traced memory is process
+        wide, so stages running at the same time in other threads are included.
+        """
+        self.records = []
+        self._started = False
+        self._lock = threading.Lock()
+
+    def __call__(self, event: dict):
+        if 'traced_bytes' in event:
+            with self._lock:
+                self.records.append(dict(event))
+
+    def __enter__(self):
+        global _profiling
+        with _profile_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            _profiling += 1
+        add_callback(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _profiling
+        remove_callback(self)
+        with _profile_lock:
+            _profiling -= 1
+            if self._started:
+                tracemalloc.stop()
+                self._started = False
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The records as a pd.DataFrame in MB, one row per stage or checkpoint in the order they finished. 'peak_mb' is
+        the highest traced memory since the stage started, 'frame_mb' the deep size of the frame produced and
+        'max_rss_mb' the highest resident memory of the process so far.
+        """
+        columns = ['stage', 'source', 'checkpoint', 'seconds', 'rows_in', 'rows_out', 'frame_bytes', 'traced_bytes',
+                   'peak_bytes', 'max_rss_bytes']
+        table = pd.DataFrame(self.records, columns=columns)
+        for col in ['frame_bytes', 'traced_bytes', 'peak_bytes', 'max_rss_bytes']:
+            table[col.replace('_bytes', '_mb')] = table.pop(col) / 2 ** 20
+        return table
+
+
+def _fold_peak():
+    """Add the traced peak since the last reset to the open stages and reset it. Call with _profile_lock held"""
+    peak = tracemalloc.get_traced_memory()[1]
+    for open_stage in _open_stages:
+        open_stage.peak = max(open_stage.peak, peak)
+    tracemalloc.reset_peak()
+
+
+def _memory() -> dict:
+    """Current and peak traced memory and the max resident memory of the process, in bytes"""
+    traced, peak = tracemalloc.get_traced_memory()
+    memory = {'traced_bytes': traced, 'peak_bytes': peak}
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # reported in KB on Linux and bytes on macOS
+        memory['max_rss_bytes'] = max_rss if sys.platform == 'darwin' else max_rss * 1024
+    return memory
+
+
+def _frame_bytes(frame: pd.DataFrame) -> int:
+    """Deep memory usage of a frame in bytes"""
+    return int(frame.memory_usage(deep=True).sum())
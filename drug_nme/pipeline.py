@@ -0,0 +1,310 @@
+"""
+Lazy pipeline to chain the fetch, type, label and aggregate steps. Stages are only run when requested and their output
+is checkpointed to disk, keyed by the content of their inputs. Re-running only recomputes stages whose inputs changed.
+"""
+
+import os
+import pickle
+import hashlib
+import pandas as pd
+from typing import Callable, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = ["Pipeline", "approval_pipeline"]
+
+
+class Pipeline:
+    def __init__(self, cache_dir: Optional[str] = None, workers: int = 4):
+        """
+        :param cache_dir: Optional[str]
+            Directory to save the stage checkpoints. If None, it will default to '.drug_nme_cache'.
+        :param workers: int
+            Number of threads used to run independent stages in parallel.
+        """
+        self.cache_dir = cache_dir or '.drug_nme_cache'
+        self.workers = workers
+        self.stages = {}
+
+        # in memory results of the current session
+        self._keys = {}
+        self._hashes = {}
+        self._values = {}
+
+    def add(self, name: str, func: Callable, deps: Optional[Union[str, list]] = None, checkpoint: bool = True,
+            **params):
+        """
+        Declare a stage. Nothing is run until the stage is requested with run().
+        :param name: str
+            The name of the stage.
+        :param func: Callable
+            Function for the stage. It is called with the output of each dependency, in order, and the params.
+        :param deps: Optional[Union[str, list]]
+            Name or list of names of the stages this stage depends on.
+        :param checkpoint: bool
+            Whether to save the stage output to disk. Set to False for outputs that cannot be pickled (i.e. figures).
+        :param params:
+            Keyword arguments passed to func. They are part of the stage key, so changing them reruns the stage.
+        """
+        if isinstance(deps, str):
+            deps = [deps]
+        deps = deps or []
+
+        for dep in deps:
+            if dep not in self.stages:
+                raise KeyError(f"Stage '{dep}' must be added before '{name}'!")
+
+        self.stages[name] = {'func': func, 'deps': deps, 'checkpoint': checkpoint, 'params': params}
+
+        # the stage definition changed, so drop anything computed this session from it and downstream
+        for stage in self._downstream(name):
+            self._keys.pop(stage, None)
+            self._hashes.pop(stage, None)
+            self._values.pop(stage, None)
+
+        return self
+
+    def run(self, name: Optional[str] = None, refresh: Optional[Union[str, list]] = None):
+        """
+        Evaluate a stage and the stages it depends on. Stages with a valid checkpoint are loaded instead of run.
+        Independent stages are run in parallel.
+        :param name: Optional[str]
+            The name of the stage to evaluate. If None, the last added stage is used.
+        :param refresh: Optional[Union[str, list]]
+            Name or list of names of stages to force rerun, i.e. source stages to download fresh data. Downstream
+            stages are only rerun if the refreshed output has changed.
+        """
+        if name is None:
+            name = list(self.stages)[-1]
+        if isinstance(refresh, str):
+            refresh = [refresh]
+        refresh = set(refresh or [])
+
+        for stage in refresh:
+            for downstream in self._downstream(stage):
+                self._keys.pop(downstream, None)
+                self._hashes.pop(downstream, None)
+                self._values.pop(downstream, None)
+
+        # group the required stages into levels. Stages in the same level do not depend on each other
+        levels = {}
+        for stage in self._upstream(name):
+            deps = self.stages[stage]['deps']
+            levels[stage] = 1 + max((levels[dep] for dep in deps), default=-1)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for level in range(max(levels.values()) + 1):
+                stages = [stage for stage, stage_level in levels.items() if stage_level == level]
+                list(executor.map(lambda stage: self._resolve(stage, stage in refresh), stages))
+
+        return self._load(name)
+
+    def invalidate(self, name: Optional[str] = None):
+        """
+        Remove the checkpoints of a stage. If None, all checkpoints in the cache directory are removed.
+        :param name: Optional[str]
+            The name of the stage.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        if name is None:
+            for filename in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, filename))
+        else:
+            self._remove_checkpoints(name)
+
+        stages = self.stages if name is None else self._downstream(name)
+        for stage in stages:
+            self._keys.pop(stage, None)
+            self._hashes.pop(stage, None)
+            self._values.pop(stage, None)
+
+    """Support functions"""
+
+    def _resolve(self, name: str, refresh: bool = False):
+        """Find the key of a stage and load its checkpoint hash, or run it"""
+        stage = self.stages[name]
+        key = _hash_bytes(pickle.dumps((name, _func_id(stage['func']), sorted(stage['params'].items(), key=str),
+                                        [self._hashes[dep] for dep in stage['deps']])))
+
+        if self._keys.get(name) == key and name in self._hashes and not refresh:
+            return
+
+        self._keys[name] = key
+        self._values.pop(name, None)
+        hash_path = self._path(name, key, 'hash')
+
+        if (stage['checkpoint'] and os.path.exists(hash_path) and os.path.exists(self._path(name, key, 'pkl'))
+                and not refresh):
+            # the output is only loaded if a downstream stage needs to run
+            with open(hash_path) as file:
+                self._hashes[name] = file.read()
+            return
+
+        value = stage['func'](*[self._load(dep) for dep in stage['deps']], **stage['params'])
+        self._values[name] = value
+        self._hashes[name] = _content_hash(value)
+
+        if stage['checkpoint']:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _atomic_write(self._path(name, key, 'pkl'), pickle.dumps(value))
+            _atomic_write(hash_path, self._hashes[name].encode('utf-8'))
+            # the checkpoints of earlier keys are replaced by this one
+            self._remove_checkpoints(name, keep=key)
+
+    def _load(self, name: str):
+        if name not in self._values:
+            with open(self._path(name, self._keys[name], 'pkl'), 'rb') as file:
+                self._values[name] = pickle.load(file)
+        return self._values[name]
+
+    def _path(self, name: str, key: str, ext: str):
+        return os.path.join(self.cache_dir, f"{name}-{key}.{ext}")
+
+    def _remove_checkpoints(self, name: str, keep: Optional[str] = None):
+        """Remove the checkpoint files of a stage, except those of the key to keep"""
+        for filename in os.listdir(self.cache_dir):
+            stem = filename[:-len('.tmp')] if filename.endswith('.tmp') else filename
+            stem, _, ext = stem.rpartition('.')
+            stage, _, key = stem.rpartition('-')
+            if stage == name and key != keep and ext in ('pkl', 'hash'):
+                try:
+                    os.remove(os.path.join(self.cache_dir, filename))
+                except FileNotFoundError:
+                    pass  # removed by another pipeline on the same directory
+
+    def _upstream(self, name: str):
+        """Stage and all stages it depends on, in declaration order"""
+        needed, stack = set(), [name]
+        while stack:
+            stage = stack.pop()
+            if stage not in needed:
+                needed.add(stage)
+                stack.extend(self.stages[stage]['deps'])
+        return [stage for stage in self.stages if stage in needed]
+
+    def _downstream(self, name: str):
+        """Stage and all stages that depend on it"""
+        found = {name}
+        for stage, spec in self.stages.items():
+            if any(dep in found for dep in spec['deps']):
+                found.add(stage)
+        return found
+
+
+def approval_pipeline(cache_dir: Optional[str] = None, agency: Union[str, list] = 'FDA', workers: int = 4):
+    """
+    Build the standard pipeline. The FDA branch (get_data -> add_types -> make_kinase_label -> FDAPlot) and the Guide
+    to Pharmacology branch (get_data -> make_kinase_label -> Plot) are independent and run in parallel. Plot stages can
+    be added on top, i.e. pipeline.add('chart', lambda plot: plot.stacked(), deps='fda_plot', checkpoint=False).
+    :param cache_dir: Optional[str]
+        Directory to save the stage checkpoints.
+    :param agency: Union[str, list]
+        Agency or list of agencies for the Guide to Pharmacology data.
+    :param workers: int
+        Number of threads used to run independent stages in parallel.
+    """
+    pipeline = Pipeline(cache_dir=cache_dir, workers=workers)
+    pipeline.add('fda', _fetch_fda)
+    pipeline.add('fda_types', _add_fda_types, deps='fda')
+    pipeline.add('fda_kinase', _label_fda_kinase, deps='fda_types')
+    pipeline.add('fda_plot', _make_fda_plot, deps='fda_kinase')
+    pipeline.add('gtop', _fetch_gtop, agency=agency)
+    pipeline.add('gtop_kinase', _label_gtop_kinase, deps='gtop')
+    pipeline.add('gtop_plot', _make_gtop_plot, deps='gtop_kinase')
+    return pipeline
+
+
+"""Stage functions for the approval pipeline"""
+
+
+def _fetch_fda():
+    from drug_nme.fetch import FDADataFetcher
+    return FDADataFetcher().get_data()
+
+
+def _add_fda_types(data: pd.DataFrame):
+    from drug_nme.fetch import FDADataFetcher
+    return FDADataFetcher().add_types(data)
+
+
+def _label_fda_kinase(data: pd.DataFrame):
+    from drug_nme.fetch import FDADataFetcher
+    # shallow copy, so the labels are not written into the cached upstream table
+    return FDADataFetcher().make_kinase_label(data.copy(deep=False))
+
+
+def _make_fda_plot(data: pd.DataFrame):
+    from drug_nme.plot import FDAPlot
+    return FDAPlot(data)
+
+
+def _fetch_gtop(agency: Union[str, list] = 'FDA'):
+    from drug_nme.fetch import PharmacologyDataFetcher
+    return PharmacologyDataFetcher().get_data(agency=agency)
+
+
+def _label_gtop_kinase(data: pd.DataFrame):
+    from drug_nme.fetch import PharmacologyDataFetcher
+    return PharmacologyDataFetcher().make_kinase_label(data.copy(deep=False))
+
+
+def _make_gtop_plot(data: pd.DataFrame):
+    from drug_nme.plot import Plot
+    return Plot(data, sort_col=['Year', 'type'])
+
+
+"""Hashing support functions"""
+
+
+def _hash_bytes(data: bytes):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _func_id(func: Callable, _seen: Optional[set] = None):
+    """
+    Identify a function by its name, code, default arguments and the variables it captures, so editing a stage function
+    or changing a captured variable reruns the stage.
+    """
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return repr(func)
+
+    # nested functions can capture themselves
+    _seen = _seen or set()
+    if id(func) in _seen:
+        return func.__qualname__
+    _seen.add(id(func))
+
+    cells = []
+    for cell in func.__closure__ or ():
+        try:
+            cells.append(cell.cell_contents)
+        except ValueError:  # the variable is not assigned yet
+            cells.append(None)
+    values = [*cells, *(func.__defaults__ or ()), *sorted((func.__kwdefaults__ or {}).items(), key=str)]
+    value_ids = [_func_id(value, _seen) if callable(value) and hasattr(value, '__code__') else _content_hash(value)
+                 for value in values]
+    return (f"{func.__module__}.{func.__qualname__}:"
+            f"{_hash_bytes(code.co_code + repr(code.co_consts).encode() + repr(value_ids).encode())}")
+
+
+def _content_hash(value):
+    """Hash the output of a stage"""
+    if isinstance(value, pd.DataFrame):
+        try:
+            row_hashes = pd.util.hash_pandas_object(value, index=True).to_numpy()
+            return _hash_bytes(row_hashes.tobytes() + repr(list(value.columns)).encode())
+        except TypeError:
+            pass  # unhashable cells, i.e. lists
+    try:
+        return _hash_bytes(pickle.dumps(value))
+    except Exception:
+        return _hash_bytes(repr(value).encode())
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
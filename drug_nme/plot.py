@@ -2,11 +2,16 @@
 Script to plot information from drug_nme pd.DataFrames
 """
 
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+from matplotlib.patches import Patch
 from legendkit import legend
-from typing import Union
+from typing import Optional, Union
+from drug_nme.metrics import stage
+from drug_nme.ipc import to_arrow
+from drug_nme.analytics import ApprovalCounts
 
 __all__ = ["Plot", "FDAPlot"]
 
@@ -23,15 +28,21 @@ class Plot:
         Parameters to initialize the plots are optional. If given, the pd.DataFrame will be shaped and organized for
         plotting. The pd.DataFrame sources should come from either from openFDA or from Guide to Pharmacology.
 
-        :param df: pd.DataFrame
+        :param df: Union[pd.DataFrame, ApprovalCounts]
             Input pd.DataFrame containing drug approvals. The DataFrame must be obtained from the DataFetcher or Scrape
-            classes.
+            classes. Counts or a metric from approval_counts() are used as they are, without aggregating again.
         :param sort_col: str
             The name of the column for processing. Name should match that of the existing column headers from the
-            pd.DataFrame.
+            pd.DataFrame. With approval counts, it can only be the year column and one category column.
         """
+        if isinstance(df, ApprovalCounts):
+            self.df = _counts_by(df, sort_col) if sort_col else df.to_long()
+            return
+
         # count values from the input pd.DataFrame
-        count_df = df.groupby(sort_col).size().reset_index(name='Count')
+        with stage('aggregate', rows_in=len(df)) as s:
+            count_df = df.groupby(sort_col).size().reset_index(name='Count')
+            s.output(count_df)
         self.df = count_df
 
     def show(self, head: int = None):
@@ -41,6 +52,10 @@ class Plot:
             df = df.head(head)
         return pd.DataFrame(df)
 
+    def to_arrow(self, path: str):
+        """Save the processed pd.DataFrame as an Arrow IPC file, to load with read_arrow()."""
+        return to_arrow(self.df, path)
+
     def bar(self, data: pd.DataFrame = None, x: str = 'Year', y: str = 'Count', hue: str = 'type', width: float = 0.8,
             title: str = None, palette: Union[str, list] = None, legend_loc: str = None,
             figsize: tuple[float, float] = (10, 5), savepath: str = None):
@@ -148,6 +163,58 @@ class Plot:
         return _stacked_method(figsize, width, fontcolor, fontsize, label, legend_loc, palette, pivot_df, savepath,
                                title)
 
+    def facet(self, data: pd.DataFrame = None, facet: str = 'type', x: str = 'Year', y: str = 'Count',
+              groups: str = None, ncols: int = 5, width: float = 0.8, title: str = None,
+              palette: Union[str, list] = None, sharey: bool = True, legend_loc: str = 'upper right',
+              figsize: tuple[float, float] = None, savepath: str = None):
+        """
+        Generate a grid of small bar plots, one panel per value in the facet column (i.e. per type, agency or target).
+        All panels are drawn in a single figure and share their axes, ticks and legend. Ideally, the pd.DataFrame
+        should be preprocessed upon initialization of Plot with the facet column included in the sort_col.
+
+        :param data: pd.DataFrame
+            Input query pd.DataFrame. Should be processed. If not given, function will utilize the initialized processed
+            pd.DataFrame.
+        :param facet: str
+            The column header used to split the data into panels.
+        :param x: str
+            The column header for the X-axis.
+        :param y: str
+            The column header for the Y-axis.
+        :param groups: str
+            The column header to stack within each panel. If None, each panel is a single bar series.
+        :param ncols: int
+            Set the number of panels per row.
+        :param width: float
+            Set the width of the bars in plot.
+        :param title: str
+            Set the title of the figure.
+        :param palette: str or list
+            Set the color palette for the plot. Can be single palette name or a list of color names or hex codes.
+        :param sharey: bool
+            Whether all panels share the same Y-axis.
+        :param legend_loc: str
+            Set the legend location for the figure. Only used if groups is given.
+        :param figsize: tuple
+            Set the size of the figure. If None, it is scaled to the number of panels.
+        :param savepath: str
+            Set the save location for the plot.
+        """
+        if data is None:
+            data = self.df
+
+        # pivot once into a (x, facet, group) array and slice each panel from it
+        columns = [facet] if groups is None else [facet, groups]
+        pivot_df = data.pivot_table(index=x, columns=columns, values=y, aggfunc='sum', fill_value=0, observed=True)
+        facet_labels = sorted(pivot_df.columns.get_level_values(0).unique())
+        group_labels = [y] if groups is None else sorted(pivot_df.columns.get_level_values(1).unique())
+        full_cols = pd.MultiIndex.from_product([facet_labels, group_labels]) if groups else facet_labels
+        pivot_df = pivot_df.reindex(columns=full_cols, fill_value=0)
+        values = pivot_df.to_numpy().reshape(len(pivot_df.index), len(facet_labels), len(group_labels))
+
+        return _facet_method(values, pivot_df.index, facet_labels, group_labels, ncols, width, title, palette, sharey,
+                             legend_loc if groups else None, figsize, savepath, x, y)
+
     def donut(self, data: pd.DataFrame = None, title: str = None, titlesize: int = 14, palette: Union[str, list] = None,
               pctdistance: float = 0.8, labeldistance: float = 1.1, fontsize: int = 10, annotsize: int = 10,
               annotcolor: str = 'black', legend_loc: str = None, figsize: tuple[float, float] = (10, 5),
@@ -247,26 +314,33 @@ class FDAPlot:
         """
         Input pulled FDA information for plotting. This will be lightly processed to obtain the number of drugs
         approved by a given year.
-        :param df: pd.DataFrame
+        :param df: Union[pd.DataFrame, ApprovalCounts]
             Input pd.DataFrame containing drug approvals. The DataFrame must be obtained from the FDADataFetcher
-            class.
+            class. Counts or a metric from approval_counts() are used as they are, without aggregating again.
         :param sort_col: Union[str, list]
             The name of the column for processing. Name should match that of the existing column headers from the
-            pd.DataFrame.
+            pd.DataFrame. With approval counts, it can only be the year column and one category column.
         """
-        # get columns for approval, NME/BLA, and type and convert into separate cols. 'Type' is optional
-        if 'Type' in df.columns:
-            subset_df = df[['Approval Year', 'NME/BLA', 'Type']]
-            subset_df = pd.get_dummies(subset_df, columns=['NME/BLA', 'Type'], prefix='', prefix_sep='', dtype=int)
-        else:
-            subset_df = df[['Approval Year', 'NME/BLA']]
-            subset_df = pd.get_dummies(subset_df, columns=['NME/BLA'], prefix='', prefix_sep='', dtype=int)
-
-        # group by year and sum cols
-        plot_data = subset_df.groupby('Approval Year').sum()
-
-        if sort_col:
-            plot_data = df.groupby(sort_col).size().reset_index(name='Count')
+        if isinstance(df, ApprovalCounts):
+            # only the years of the table are kept, as when aggregating the table here
+            self.df = _counts_by(df, sort_col) if sort_col else df.to_frame(fill_years=False)
+            return
+
+        with stage('aggregate', 'fda', rows_in=len(df)) as s:
+            # get columns for approval, NME/BLA, and type and convert into separate cols. 'Type' is optional
+            if 'Type' in df.columns:
+                subset_df = df[['Approval Year', 'NME/BLA', 'Type']]
+                subset_df = pd.get_dummies(subset_df, columns=['NME/BLA', 'Type'], prefix='', prefix_sep='', dtype=int)
+            else:
+                subset_df = df[['Approval Year', 'NME/BLA']]
+                subset_df = pd.get_dummies(subset_df, columns=['NME/BLA'], prefix='', prefix_sep='', dtype=int)
+
+            # group by year and sum cols
+            plot_data = subset_df.groupby('Approval Year').sum()
+
+            if sort_col:
+                plot_data = df.groupby(sort_col).size().reset_index(name='Count')
+            s.output(plot_data)
 
         self.df = plot_data
 
@@ -279,6 +353,10 @@ class FDAPlot:
             df = df.head(head)
         return pd.DataFrame(df)
 
+    def to_arrow(self, path: str):
+        """Save the processed pd.DataFrame as an Arrow IPC file, to load with read_arrow()."""
+        return to_arrow(self.df, path)
+
     def stacked(self, cols: list = None, years: tuple = None, width: float = 0.8, title: str = None,
                 label: bool = True, palette: Union[str, list] = None, fontsize: int = 8, fontcolor: str = 'white',
                 legend_loc: str = None, figsize: tuple[float, float] = (10, 5), savepath: str = None):
@@ -323,6 +401,48 @@ class FDAPlot:
 
         return _stacked_method(figsize, width, fontcolor, fontsize, label, legend_loc, palette, data, savepath, title)
 
+    def facet(self, cols: list = None, years: tuple = None, ncols: int = 5, width: float = 0.8, title: str = None,
+              palette: Union[str, list] = None, sharey: bool = True, figsize: tuple[float, float] = None,
+              savepath: str = None):
+        """
+        Generate a grid of small bar plots, one panel for each column (i.e. NME, BLA or a drug Type). All panels are
+        drawn in a single figure and share their axes and ticks.
+        :param cols: list
+            A list of column data to plot. Each column will be drawn in its own panel. If None, all columns are used.
+        :param years: tuple
+            The year range to for FDA approval for plotting.
+        :param ncols: int
+            Set the number of panels per row.
+        :param width: float
+            Set the width of the bars in the plot.
+        :param title: str
+            Set the title for the figure.
+        :param palette: Union[str, list]
+            Set the color palette of the plot.
+        :param sharey: bool
+            Whether all panels share the same Y-axis.
+        :param figsize: tuple
+            Set the size of the figure. If None, it is scaled to the number of panels.
+        :param savepath: str
+            Set the path for saving the figure.
+        """
+        data = self.df
+
+        if years:
+            data = data.loc[years[0]:years[1]]
+
+        if title is None:
+            title = "FDA Approved Drugs"
+
+        if cols is not None:
+            data = data[cols]
+
+        # the FDAPlot table is already pivoted, so each column is one panel
+        values = data.to_numpy()[:, :, None]
+
+        return _facet_method(values, data.index, list(data.columns), ['Count'], ncols, width, title, palette, sharey,
+                             None, figsize, savepath, 'Approval Year', 'Count')
+
     def donut(self, data: pd.DataFrame = None, title: str = None, titlesize: int = 14, palette: Union[str, list] = None,
               pctdistance: float = 0.8, labeldistance: float = 1.1, fontsize: int = 10, annotsize: int = 10,
               annotcolor: str = 'black', legend_loc: str = None, figsize: tuple[float, float] = (10, 5),
@@ -422,9 +542,9 @@ class FDAPlot:
 
 
 def _stacked_method(figsize: tuple[float, float], width, fontcolor: str, fontsize: int, label: bool,
-                    legend_loc: str | None, palette: str | list | tuple | None, pivot_df: DataFrame,
-                    savepath: str | None,
-                    title: str | None):
+                    legend_loc: Optional[str], palette: Optional[Union[str, list, tuple]], pivot_df: DataFrame,
+                    savepath: Optional[str],
+                    title: Optional[str]):
     # set seaborn color palette
     if isinstance(palette, str):
         num_colors = len(pivot_df.columns)
@@ -478,6 +598,93 @@ def _stacked_method(figsize: tuple[float, float], width, fontcolor: str, fontsiz
     return image
 
 
+def _facet_method(values, x_labels, facet_labels: list, group_labels: list, ncols: int, width: float,
+                  title: Optional[str], palette: Optional[Union[str, list]], sharey: bool, legend_loc: Optional[str],
+                  figsize: Optional[tuple[float, float]], savepath: Optional[str], xlabel: str, ylabel: str):
+    """
+    Support function to draw small multiples. The values are a (x, facet, group) array and each panel is drawn as a
+    stacked bar from a slice of it.
+    """
+    n_facets, n_groups = len(facet_labels), len(group_labels)
+    if n_facets == 0:
+        raise ValueError("No data to plot. Check the data, the facet column and the years.")
+
+    # set color palette. With a single group, each panel gets its own color
+    num_colors = n_groups if n_groups > 1 else n_facets
+    if isinstance(palette, str):
+        colormap = plt.get_cmap(palette, num_colors)
+        adjusted_palette = [colormap(i) for i in range(num_colors)]
+    elif isinstance(palette, list) and palette:
+        adjusted_palette = palette
+    else:
+        cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        adjusted_palette = [cycle[i % len(cycle)] for i in range(num_colors)]
+
+    ncols = max(1, min(ncols, n_facets))
+    nrows = -(-n_facets // ncols)
+    if figsize is None:
+        figsize = (2.5 * ncols, 2 * nrows)
+
+    fig, axes = plt.subplots(nrows, ncols, figsize=figsize, sharex=True, sharey=sharey, squeeze=False)
+    axes = axes.ravel()
+
+    # stack offsets are computed once for all panels
+    positions = np.arange(len(x_labels))
+    bottoms = np.cumsum(values, axis=2) - values
+
+    for i, facet_label in enumerate(facet_labels):
+        ax = axes[i]
+        for j in range(n_groups):
+            # colors are reused when the palette is shorter than the groups or panels
+            color = adjusted_palette[(j if n_groups > 1 else i) % len(adjusted_palette)]
+            ax.bar(positions, values[:, i, j], width=width, bottom=bottoms[:, i, j], color=color, linewidth=0)
+        ax.set_title(facet_label, fontsize=9)
+
+    # hide unused panels
+    for ax in axes[n_facets:]:
+        ax.set_visible(False)
+
+    # ticks are shared, so they only need to be set once
+    step = max(1, len(x_labels) // 10)
+    axes[0].set_xticks(positions[::step])
+    axes[0].set_xticklabels([str(label) for label in x_labels[::step]])
+    for ax in axes[:n_facets]:
+        ax.tick_params(axis='x', labelrotation=90, labelsize=7)
+    fig.supxlabel(xlabel)
+    fig.supylabel(ylabel)
+
+    if title:
+        fig.suptitle(title)
+
+    # one legend for the whole figure
+    if legend_loc and n_groups > 1:
+        handles = [Patch(color=adjusted_palette[j % len(adjusted_palette)]) for j in range(n_groups)]
+        fig.legend(handles, group_labels, loc=legend_loc)
+
+    # save fig
+    if savepath:
+        # adjust layout to prevent clipping
+        plt.tight_layout()
+        plt.savefig(savepath, dpi=300)
+
+    plt.tight_layout()
+    plt.show()
+
+    return axes[:n_facets]
+
+
+def _counts_by(counts: ApprovalCounts, sort_col: Union[str, list]) -> pd.DataFrame:
+    """
+    Long table of approval counts like df.groupby(sort_col).size(). sort_col must be the year column and one category
+    column of the counts.
+    """
+    cols = [sort_col] if isinstance(sort_col, str) else list(sort_col)
+    if len(cols) != 2 or cols[0] != counts.year_col or cols[1] not in counts.groups:
+        raise ValueError(f"sort_col {cols} cannot be used with approval counts. Use ['{counts.year_col}', <column>] "
+                         f"with a column from: {', '.join(dict.fromkeys(counts.groups))}")
+    return counts.to_long(group=cols[1])
+
+
 if __name__ == "__main__":
     import doctest
 
@@ -0,0 +1,308 @@
+"""
+Entity resolution across sources. FDA active ingredients, Guide to Pharmacology ligands and ChEMBL molecules are linked
+to shared entity IDs through hashed keys of their names: the exact name, the name cleaned of salts, parentheses and FDA
+biologic suffixes, a compact form without spaces or punctuation, and known synonyms. Names that match no key fall back
+to a scored fuzzy match over a trigram index. The mapping is kept in SQLite and updated incrementally as new names are
+added.
+"""
+
+import sqlite3
+import numpy as np
+import pandas as pd
+from typing import Optional
+from drug_nme.fetch import _clean_ingredient_name
+from drug_nme.matcher import NameMatcher
+
+__all__ = ["EntityIndex"]
+
+# key levels, from strictest to loosest
+LEVELS = ['exact', 'synonym', 'clean', 'compact']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    entity_id INTEGER PRIMARY KEY,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS entity_keys (
+    level TEXT,
+    key TEXT,
+    entity_id INTEGER,
+    PRIMARY KEY (level, key)
+);
+CREATE TABLE IF NOT EXISTS entity_mappings (
+    source TEXT,
+    name TEXT,
+    source_id TEXT,
+    entity_id INTEGER,
+    method TEXT,
+    score REAL,
+    PRIMARY KEY (source, name)
+);
+CREATE INDEX IF NOT EXISTS entity_mappings_entity ON entity_mappings (entity_id);
+"""
+
+
+class EntityIndex:
+    def __init__(self, path: str = ':memory:'):
+        """
+        :param path: str
+            Path to the SQLite file holding the mapping. It can be the same file as a DrugStore. Existing mappings are
+            loaded. By default, the index is kept in memory.
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+        self.names = dict(self.conn.execute("SELECT entity_id, name FROM entities"))
+        self.keys = {level: {} for level in LEVELS}
+        for level, key, entity_id in self.conn.execute("SELECT level, key, entity_id FROM entity_keys"):
+            self.keys[level][key] = entity_id
+        self.mapped = {(source, name) for source, name in self.conn.execute("SELECT source, name FROM entity_mappings")}
+        self._matcher = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, data: pd.DataFrame, source: str, name_col: str, id_col: Optional[str] = None,
+            fuzzy: bool = False, min_score: float = 0.9) -> pd.DataFrame:
+        """
+        Add the names of a table to the index. Names already added for the source are skipped, so the same table can be
+        added again as new rows appear. Names matching no entity create a new one.
+        :param data: pd.DataFrame
+            Table with a name column.
+        :param source: str
+            Name of the source, i.e. 'fda', 'gtop' or 'chembl'.
+        :param name_col: str
+            Column with the names.
+        :param id_col: str
+            Column with the source ID, i.e. the ChEMBL ID. Optional.
+        :param fuzzy: bool
+            Whether names matching no key are matched to existing entities by similarity before a new entity is
+            created. Off by default, as similar names are often different drugs.
+        :param min_score: float
+            Lowest similarity score for a fuzzy match, from 0 to 1.
+        :return: pd.DataFrame
+            The new mappings, with the source, name, source_id, entity_id, method and score.
+        """
+        rows = data[[name_col] + ([id_col] if id_col else [])].dropna(subset=[name_col])
+        rows = rows.drop_duplicates(subset=[name_col])
+        rows = rows[[(source, name) not in self.mapped for name in rows[name_col]]]
+        if rows.empty:
+            return pd.DataFrame(columns=['source', 'name', 'source_id', 'entity_id', 'method', 'score'])
+
+        names = rows[name_col].astype(str)
+        mapping = self.resolve(names, fuzzy=fuzzy, min_score=min_score)
+        mapping.insert(0, 'source', source)
+        mapping['source_id'] = rows[id_col].astype(str).to_numpy() if id_col else None
+
+        # unmatched names with the same cleaned key become one new entity
+        new = mapping['entity_id'].isna()
+        if new.any():
+            clean = _keys(mapping.loc[new, 'name'])['clean']
+            next_id = max(self.names, default=0) + 1
+            new_ids = {key: next_id + i for i, key in enumerate(clean.unique())}
+            mapping.loc[new, 'entity_id'] = clean.map(new_ids).to_numpy()
+            mapping.loc[new, 'method'] = 'new'
+            mapping.loc[new, 'score'] = 1.0
+            first_names = mapping.loc[new].groupby(clean.to_numpy())['name'].first()
+            self.names.update({new_ids[key]: name for key, name in first_names.items()})
+        mapping['entity_id'] = mapping['entity_id'].astype(int)
+
+        self._save(mapping, self._register(mapping['name'], mapping['entity_id']))
+        return mapping[['source', 'name', 'source_id', 'entity_id', 'method', 'score']]
+
+    def add_fda(self, data: pd.DataFrame, **kwargs) -> pd.DataFrame:
+        """Add the active ingredients of a table from FDADataFetcher."""
+        return self.add(data, 'fda', 'Active Ingredient', **kwargs)
+
+    def add_gtop(self, data: pd.DataFrame, **kwargs) -> pd.DataFrame:
+        """Add the ligands of a table from PharmacologyDataFetcher."""
+        return self.add(data, 'gtop', 'name', 'ligandId', **kwargs)
+
+    def add_chembl(self, data: pd.DataFrame, **kwargs) -> pd.DataFrame:
+        """Add the molecules of a table from _ChemblDataFetcher."""
+        return self.add(data, 'chembl', 'Name', 'ChEMBL_ID', **kwargs)
+
+    def add_synonyms(self, synonyms: dict):
+        """
+        Add synonyms, i.e. brand names or former INNs. Each synonym is linked to the entity of its name.
+        :param synonyms: dict
+            Mapping of synonym to a name already in the index.
+        """
+        targets = self.resolve(pd.Series(list(synonyms.values()), dtype=str), fuzzy=False)
+        keys = _keys(pd.Series(list(synonyms), dtype=str))['exact']
+
+        new_keys = []
+        for key, entity_id in zip(keys, targets['entity_id']):
+            if pd.notna(entity_id) and key not in self.keys['synonym']:
+                self.keys['synonym'][key] = int(entity_id)
+                new_keys.append(('synonym', key, int(entity_id)))
+
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO entity_keys VALUES (?, ?, ?)", new_keys)
+
+    def resolve(self, names: pd.Series, fuzzy: bool = True, min_score: float = 0.85) -> pd.DataFrame:
+        """
+        Find the entity of each name. Keys are matched level by level with hash lookups. Names matching no key are
+        matched by similarity to known names, if fuzzy is True.
+        :param names: pd.Series
+            Names to resolve.
+        :param fuzzy: bool
+            Whether to fall back to a similarity match.
+        :param min_score: float
+            Lowest similarity score for a fuzzy match, from 0 to 1.
+        :return: pd.DataFrame
+            One row per name with the entity_id, method ('exact', 'synonym', 'clean', 'compact' or 'fuzzy') and score.
+            Unresolved names have no entity_id.
+        """
+        names = pd.Series(names, dtype=object).reset_index(drop=True)
+        names = names.where(names.isna(), names.astype(str))
+        result = pd.DataFrame({'name': names, 'entity_id': pd.Series(pd.NA, index=names.index, dtype='Int64'),
+                               'method': None, 'score': float('nan')})
+
+        unique = pd.Series(names.dropna().unique(), dtype=str)
+        keys = _keys(unique)
+        keys['synonym'] = keys['exact']
+
+        # hash join on each key level, from strictest to loosest
+        found = pd.Series(pd.NA, index=unique.index, dtype='Int64')
+        method = pd.Series(None, index=unique.index, dtype=object)
+        for level in LEVELS:
+            todo = found.isna()
+            if not todo.any():
+                break
+            hits = keys.loc[todo, level].map(self.keys[level]).dropna()
+            found[hits.index] = hits.astype(int)
+            method[hits.index] = level
+        score = pd.Series(1.0, index=unique.index).where(found.notna())
+
+        if fuzzy and found.isna().any():
+            for i in found.index[found.isna()]:
+                match = self._fuzzy(keys.at[i, 'compact'], min_score)
+                if match is not None:
+                    found[i], score[i], method[i] = match[0], match[1], 'fuzzy'
+
+        by_name = pd.DataFrame({'entity_id': found, 'method': method, 'score': score})
+        by_name.index = unique.to_numpy()
+        valid = names.notna()
+        result.loc[valid, ['entity_id', 'method', 'score']] = by_name.loc[names[valid]].to_numpy()
+        result['entity_id'] = result['entity_id'].astype('Int64')
+        return result
+
+    def mappings(self, source: Optional[str] = None) -> pd.DataFrame:
+        """
+        The stored mapping of names to entities.
+        :param source: str
+            Only return the mapping for this source.
+        """
+        sql = "SELECT * FROM entity_mappings" + (" WHERE source = ?" if source else "")
+        return pd.read_sql_query(sql, self.conn, params=(source,) if source else None)
+
+    def link(self) -> pd.DataFrame:
+        """
+        Cross-source table with one row per entity and, for each source, the names and IDs linked to it.
+        """
+        mapping = self.mappings()
+        mapping['source_id'] = mapping['source_id'].fillna(mapping['name'])
+        table = mapping.pivot_table(index='entity_id', columns='source', values='source_id',
+                                    aggfunc=lambda values: '; '.join(sorted(set(values))))
+        table.insert(0, 'name', table.index.map(self.names))
+        return table.reset_index().rename_axis(columns=None)
+
+    def merge(self, left: pd.DataFrame, right: pd.DataFrame, left_on: str, right_on: str, how: str = 'inner',
+              fuzzy: bool = True, min_score: float = 0.85) -> pd.DataFrame:
+        """
+        Join two tables on their resolved entities, i.e. FDA approvals with Guide to Pharmacology ligands.
+        :param left: pd.DataFrame
+            Left table.
+        :param right: pd.DataFrame
+            Right table.
+        :param left_on: str
+            Name column in the left table.
+        :param right_on: str
+            Name column in the right table.
+        :param how: str
+            Type of join, as in pd.merge. Rows with unresolved names are kept by 'left', 'right' and 'outer' joins with
+            a missing entity_id, and never match each other.
+        :param fuzzy: bool
+            Whether to fall back to a similarity match when resolving names.
+        :param min_score: float
+            Lowest similarity score for a fuzzy match, from 0 to 1.
+        """
+        left_ids = pd.array(self.resolve(left[left_on], fuzzy, min_score)['entity_id'], dtype='Int64')
+        right_ids = pd.array(self.resolve(right[right_on], fuzzy, min_score)['entity_id'], dtype='Int64')
+        if how == 'inner':
+            left, right = left.assign(entity_id=left_ids), right.assign(entity_id=right_ids)
+            return pd.merge(left.dropna(subset=['entity_id']), right.dropna(subset=['entity_id']), on='entity_id',
+                            how=how, suffixes=('', '_right'))
+
+        # pd.merge matches missing keys with each other, so each unresolved row gets its own negative key
+        left_ids = _unmatched_keys(left_ids, 0)
+        right_ids = _unmatched_keys(right_ids, len(left_ids))
+        merged = pd.merge(left.assign(entity_id=left_ids), right.assign(entity_id=right_ids), on='entity_id', how=how,
+                          suffixes=('', '_right'))
+        merged['entity_id'] = merged['entity_id'].astype('Int64').mask(merged['entity_id'] < 0)
+        return merged
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+    """Support functions"""
+
+    def _register(self, names: pd.Series, entity_ids: pd.Series) -> list:
+        """Add the keys of names to the index. Keys already linked to an entity keep their entity"""
+        keys = _keys(names.reset_index(drop=True))
+        new_keys = []
+        for level in ['exact', 'clean', 'compact']:
+            index = self.keys[level]
+            for key, entity_id in zip(keys[level], entity_ids):
+                if key and key not in index:
+                    index[key] = int(entity_id)
+                    new_keys.append((level, key, int(entity_id)))
+        self._matcher = None
+        return new_keys
+
+    def _save(self, mapping: pd.DataFrame, new_keys: list):
+        entity_ids = set(mapping['entity_id'])
+        rows = mapping[['source', 'name', 'source_id', 'entity_id', 'method', 'score']].astype(object)
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO entities VALUES (?, ?)",
+                                  [(entity_id, self.names[entity_id]) for entity_id in entity_ids])
+            self.conn.executemany("INSERT OR IGNORE INTO entity_keys VALUES (?, ?, ?)", new_keys)
+            self.conn.executemany("INSERT OR REPLACE INTO entity_mappings VALUES (?, ?, ?, ?, ?, ?)",
+                                  rows.where(rows.notna(), None).itertuples(index=False))
+        self.mapped.update(zip(mapping['source'], mapping['name']))
+
+    def _fuzzy(self, key: str, min_score: float):
+        """Best scoring known compact key. Returns (entity_id, score) or None"""
+        if not key or not self.keys['compact']:
+            return None
+        if self._matcher is None:
+            self._matcher = NameMatcher(list(self.keys['compact']), list(self.keys['compact'].values()))
+
+        match = self._matcher.best(key, min_score)
+        return (int(match[1]), match[2]) if match is not None else None
+
+
+def _keys(names: pd.Series) -> pd.DataFrame:
+    """
+    Keys of each name: 'exact' (lower case, trimmed), 'clean' (salts, parentheses and FDA biologic suffixes removed)
+    and 'compact' (the clean key without spaces or punctuation).
+    """
+    exact = names.astype(str).str.replace('\xa0', ' ').str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)
+    unique = exact.unique()
+    clean = exact.map(dict(zip(unique, (_clean_ingredient_name(name)[0] for name in unique)))).astype(str)
+    compact = clean.str.replace(r'[^a-z0-9]', '', regex=True)
+    return pd.DataFrame({'exact': exact, 'clean': clean, 'compact': compact}, index=names.index)
+
+
+def _unmatched_keys(entity_ids: pd.api.extensions.ExtensionArray, offset: int) -> np.ndarray:
+    """Entity IDs with a distinct negative key for each missing ID, starting after offset"""
+    keys = entity_ids.to_numpy(dtype=np.int64, na_value=0)
+    missing = entity_ids.isna()
+    keys[missing] = -(offset + 1 + np.arange(missing.sum()))
+    return keys
@@ -0,0 +1,118 @@
+"""
+Declared schemas for the fetched tables. Each source lists the kind of each of its columns and every kind has one
+canonical dtype, so years, dates and names have the same dtypes whichever source they come from and tables can be
+concatenated or joined without casting them again. Dates are parsed with explicit formats, which pandas parses in a
+vectorized pass instead of inferring the format of each element.
+"""
+
+import numpy as np
+import pandas as pd
+
+__all__ = ["SCHEMAS", "CANONICAL_DTYPES", "DATE_FORMATS", "apply_schema", "parse_dates"]
+
+# dtype of each kind of column
+CANONICAL_DTYPES = {
+    # the default string dtype of pandas 3, with NaN for missing values
+    'text': pd.StringDtype(na_value=np.nan),
+    'int': 'Int64',
+    'year': 'Int64',
+    'date': 'datetime64[ns]',
+}
+
+# date formats tried in order. Dates matching none of them are left missing
+DATE_FORMATS = ('%m/%d/%Y', '%Y-%m-%d', '%B %d, %Y', '%Y-%m-%d %H:%M:%S')
+
+# column kinds of each source. Columns that are not listed are left as they are
+SCHEMAS = {
+    'fda': {
+        'Drug Name': 'text',
+        'Active Ingredient': 'text',
+        'Approval Date': 'date',
+        'Approval Year': 'year',
+        'NME/BLA': 'text',
+        'Route of Administration(1)': 'text',
+        'Orphan Drug Designation': 'text',
+        'Type': 'text',
+    },
+    'gtop': {
+        'ligandId': 'int',
+        'name': 'text',
+        'type': 'text',
+        'Year': 'year',
+    },
+    'chembl': {
+        'ChEMBL_ID': 'text',
+        'Name': 'text',
+        'Year': 'year',
+        'Type': 'text',
+    },
+}
+
+
+def apply_schema(data: pd.DataFrame, source: str) -> pd.DataFrame:
+    """
+    Cast the columns of a table to the canonical dtypes of its source's schema. Missing values stay missing.
+    :param data: pd.DataFrame
+        Table from one of the fetchers.
+    :param source: str
+        Source of the table: 'fda', 'gtop' or 'chembl'.
+    :return: pd.DataFrame
+        The table with its declared columns cast. The input is not modified.
+    """
+    if source not in SCHEMAS:
+        raise ValueError(f"Unknown source '{source}'. Choose from: {', '.join(SCHEMAS)}")
+
+    data = data.copy(deep=False)
+    for col, kind in SCHEMAS[source].items():
+        if col in data.columns:
+            data[col] = _cast(data[col], kind)
+    return data
+
+
+def parse_dates(values: pd.Series, formats: tuple = DATE_FORMATS) -> pd.Series:
+    """
+    Parse dates with explicit formats. Each distinct date string is parsed once, first with the first format, and only
+    the strings it could not parse are tried with the next formats.
+    :param values: pd.Series
+        Dates as strings or datetimes.
+    :param formats: tuple
+        strftime formats to try, in order.
+    :return: pd.Series
+        datetime64 values. Values matching none of the formats are NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype(CANONICAL_DTYPES['date'])
+
+    values = pd.Series(values)
+    # Excel cells may already be datetimes
+    if isinstance(values.dtype, pd.StringDtype):
+        is_text = values.notna().to_numpy()
+    else:
+        is_text = values.map(type).eq(str).to_numpy()
+    result = pd.to_datetime(values.where(~is_text), errors='coerce').astype(CANONICAL_DTYPES['date'])
+    result = result.to_numpy(copy=True)
+
+    # dates repeat, so each distinct string is parsed once
+    codes, uniques = pd.factorize(values[is_text].str.strip())
+    parsed_uniques = np.full(len(uniques), np.datetime64('NaT'), dtype=CANONICAL_DTYPES['date'])
+    positions, text = np.arange(len(uniques)), pd.Series(uniques, dtype=object)
+    for date_format in formats:
+        if len(positions) == 0:
+            break
+        parsed = pd.to_datetime(text, format=date_format, errors='coerce')
+        found = parsed.notna().to_numpy()
+        parsed_uniques[positions[found]] = parsed.to_numpy()[found]
+        positions, text = positions[~found], text[~found]
+
+    result[is_text] = np.where(codes >= 0, parsed_uniques[codes], np.datetime64('NaT'))
+
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def _cast(values: pd.Series, kind: str) -> pd.Series:
+    """Cast a column to the canonical dtype of its kind"""
+    if kind == 'date':
+        return parse_dates(values)
+    if kind in ('int', 'year'):
+        return pd.to_numeric(values, errors='coerce').astype(CANONICAL_DTYPES[kind])
+    return values.astype(CANONICAL_DTYPES[kind])
@@ -0,0 +1,467 @@
+"""
+Local chart server. Approval charts are served over HTTP by parameters, i.e.
+GET /chart?source=fda&kind=stacked&years=2010-2024&groups=NME,BLA&palette=viridis&format=svg. The tables are aggregated
+once when they are loaded, charts are rendered on a pool of worker processes, and the rendered bytes are kept in memory
+with an ETag, so repeated views are answered from memory, or with 304 Not Modified when the client revalidates.
+
+Endpoints:
+    /chart   source, kind, years, groups, palette, metric, title, format (png, svg or pdf), width, height, dpi
+    /table   source, years, metric, format (json or csv)
+    /health  loaded sources and cache counters
+"""
+
+import io
+import re
+import json
+import time
+import hashlib
+import warnings
+import threading
+import email.utils
+import multiprocessing
+import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Union
+from urllib.parse import urlsplit, parse_qsl
+from drug_nme.analytics import ApprovalCounts, approval_counts, _clip_years
+from drug_nme.standin import _not_modified
+
+__all__ = ["ChartServer"]
+
+# chart kinds of each source
+KINDS = {'fda': ('stacked', 'facet'), 'gtop': ('stacked', 'facet', 'bar')}
+
+IMAGE_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml', 'pdf': 'application/pdf'}
+TABLE_FORMATS = {'json': 'application/json', 'csv': 'text/csv; charset=utf-8'}
+
+# count, cumulative, share, change, growth or rolling with an optional window, i.e. rolling5
+METRIC = re.compile(r'^(count|cumulative|share|change|growth|rolling(\d*))$')
+
+
+class ChartServer:
+    def __init__(self, data: dict, host: str = '127.0.0.1', port: int = 0, workers: int = 2, cache_size: int = 256):
+        """
+        :param data: dict
+            Table of each source, 'fda' and/or 'gtop'. A table is a pd.DataFrame from a fetcher, the path of a saved
+            table (.arrow, .feather, .parquet or .csv) or an ApprovalCounts from approval_counts().
+        :param host: str
+            Interface to listen on. By default, only local connections are accepted.
+        :param port: int
+            Port to listen on. If 0, a free port is picked.
+        :param workers: int
+            Number of worker processes rendering the charts. If 0, charts are rendered in the server's threads, one
+            at a time.
+        :param cache_size: int
+            Number of rendered charts and tables kept in memory.
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.cache_size = cache_size
+
+        self.counts = {}
+        self.versions = {}
+        self.modified = {}
+
+        self._cache = OrderedDict()
+        self._pending = {}  # renders in progress, so identical requests wait for one render
+        self._stats = {'hits': 0, 'renders': 0, 'shared': 0, 'not_modified': 0}
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._pool = None
+        self._server = None
+        self._thread = None
+
+        for source, table in data.items():
+            self.update(source, table)
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Start the worker processes and the server in a background thread."""
+        self._get_pool()
+        self._server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name='drug_nme-charts')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and the worker processes."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def serve_forever(self):
+        """Start the server and block until interrupted, i.e. with Ctrl+C."""
+        self.start()
+        print(f"Serving charts on {self.url}")
+        try:
+            while self._thread.is_alive():
+                self._thread.join(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def update(self, source: str, data: Union[pd.DataFrame, str, ApprovalCounts]):
+        """
+        Load a new table for a source, i.e. from a RefreshDaemon listener. The charts and tables cached for the source
+        are dropped.
+        :param source: str
+            Source of the table, 'fda' or 'gtop'.
+        :param data: Union[pd.DataFrame, str, ApprovalCounts]
+            The table, the path of a saved table or its counts.
+        """
+        if source not in KINDS:
+            raise ValueError(f"Unknown source '{source}'. Choose from: {', '.join(KINDS)}")
+        counts = data if isinstance(data, ApprovalCounts) else approval_counts(_read_table(data), source=source)
+
+        with self._lock:
+            self.counts[source] = counts
+            self.versions[source] = self.versions.get(source, 0) + 1
+            self.modified[source] = int(time.time())
+            for key in [key for key in self._cache if key[1] == source]:
+                del self._cache[key]
+
+    def chart(self, source: str = 'fda', kind: str = 'stacked', years: Optional[tuple] = None,
+              groups: Optional[list] = None, palette: Optional[Union[str, list]] = None, metric: str = 'count',
+              title: Optional[str] = None, image_format: str = 'png', figsize: Optional[tuple] = None,
+              dpi: int = 100) -> tuple:
+        """
+        Render a chart, or take it from the cache.
+        :param source: str
+            Source of the chart, 'fda' or 'gtop'.
+        :param kind: str
+            Kind of chart: 'stacked' or 'facet', or 'bar' for the Guide to Pharmacology.
+        :param years: tuple
+            First and last year to plot. If None, all years are plotted.
+        :param groups: list
+            Categories to plot, i.e. ['NME', 'BLA'] or drug types. If None, the default of the plot is used.
+        :param palette: Union[str, list]
+            Color palette name, a color or a list of colors. Colors are reused if there are more groups than colors.
+        :param metric: str
+            Values to plot: 'count', 'cumulative', 'share', 'change', 'growth' or 'rolling' with a window, i.e.
+            'rolling5'.
+        :param title: str
+            Title of the chart.
+        :param image_format: str
+            'png', 'svg' or 'pdf'.
+        :param figsize: tuple
+            Size of the figure in inches. If None, the default of the plot is used.
+        :param dpi: int
+            Resolution of png charts.
+        :return: tuple
+            The rendered bytes and their ETag.
+        """
+        counts = self._get_counts(source)
+        if kind not in KINDS[source]:
+            raise ValueError(f"Unknown kind '{kind}' for {source}. Choose from: {', '.join(KINDS[source])}")
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown format '{image_format}'. Choose from: {', '.join(IMAGE_FORMATS)}")
+        unknown = [group for group in groups or [] if group not in counts.categories]
+        if unknown:
+            raise ValueError(f"Unknown groups {unknown}. Choose from: {', '.join(counts.categories)}")
+        _check_years(counts, years)
+
+        palette = tuple(palette) if isinstance(palette, list) else palette
+        key = ('chart', source, self.versions[source], kind, years, tuple(groups) if groups else None, palette,
+               metric, title, image_format, figsize, dpi)
+        return self._cached(key, lambda: self._render(_metric(counts, metric, years), source, kind,
+                                                      list(groups) if groups else None, palette, title,
+                                                      image_format, figsize, dpi))
+
+    def table(self, source: str = 'fda', years: Optional[tuple] = None, metric: str = 'count',
+              table_format: str = 'json') -> tuple:
+        """
+        Aggregated table of a source, or take it from the cache.
+        :param source: str
+            Source of the table, 'fda' or 'gtop'.
+        :param years: tuple
+            First and last year to keep. If None, all years are kept.
+        :param metric: str
+            Values of the table, as in chart().
+        :param table_format: str
+            'json' (a list of records) or 'csv'.
+        :return: tuple
+            The table as bytes and its ETag.
+        """
+        counts = self._get_counts(source)
+        if table_format not in TABLE_FORMATS:
+            raise ValueError(f"Unknown format '{table_format}'. Choose from: {', '.join(TABLE_FORMATS)}")
+        _check_years(counts, years)
+
+        def build():
+            frame = _metric(counts, metric, years).to_frame()
+            if table_format == 'csv':
+                return frame.to_csv().encode('utf-8')
+            return frame.reset_index().to_json(orient='records').encode('utf-8')
+
+        return self._cached(('table', source, self.versions[source], years, metric, table_format), build)
+
+    def stats(self) -> dict:
+        """Counters: 'hits' served from memory, 'renders', 'shared' renders waited for and 'not_modified' (304)."""
+        with self._lock:
+            return {**self._stats, 'cached': len(self._cache)}
+
+    """Support functions"""
+
+    def _get_counts(self, source: str) -> ApprovalCounts:
+        with self._lock:
+            counts = self.counts.get(source)
+        if counts is None:
+            raise ValueError(f"No data loaded for '{source}'. Loaded: {', '.join(self.counts) or 'none'}")
+        return counts
+
+    def _cached(self, key: tuple, build) -> tuple:
+        """Cached bytes and ETag for a key. Only the first of concurrent requests for a key builds it"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+                self._stats['renders'] += 1
+            else:
+                self._stats['shared'] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            body = build()
+            entry = (body, f'"{hashlib.sha256(body).hexdigest()[:16]}"')
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._pending[key]
+            # a table loaded while rendering makes the result stale
+            if key[2] == self.versions.get(key[1]):
+                self._cache[key] = entry
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        future.set_result(entry)
+        return entry
+
+    def _render(self, *args) -> bytes:
+        """Render a chart on the worker pool, or in this thread without workers"""
+        pool = self._get_pool()
+        if pool is None:
+            # pyplot is not thread-safe
+            with self._render_lock:
+                return _render_chart(*args)
+        try:
+            return pool.submit(_render_chart, *args).result()
+        except BrokenProcessPool:
+            # a worker died, i.e. killed for memory. The next render starts a new pool
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False)
+            raise
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        with self._lock:
+            if self._pool is None and self.workers > 0:
+                # spawned workers, as forking a process with running threads is unsafe
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                # import matplotlib and the plots in every worker before the first request
+                for _ in range(self.workers):
+                    self._pool.submit(_warm_up)
+            return self._pool
+
+    def _respond(self, path: str, query: dict) -> tuple:
+        """Body, ETag, content type and last modification time for a request"""
+        if path in ('/', '/health'):
+            with self._lock:
+                sources = {source: {'version': self.versions[source], 'categories': counts.categories,
+                                    'years': [int(counts.years[0]), int(counts.years[-1])] if len(counts.years) else []}
+                           for source, counts in self.counts.items()}
+            body = json.dumps({'sources': sources, 'cache': self.stats()}).encode('utf-8')
+            return body, None, 'application/json', None
+
+        source = query.get('source', 'fda')
+        if path == '/chart':
+            image_format = query.get('format', 'png')
+            body, etag = self.chart(**_chart_params(query))
+            return body, etag, IMAGE_FORMATS[image_format], self.modified[source]
+        if path == '/table':
+            table_format = query.get('format', 'json')
+            body, etag = self.table(source, _parse_years(query.get('years')), query.get('metric', 'count'),
+                                    table_format)
+            return body, etag, TABLE_FORMATS[table_format], self.modified[source]
+        raise LookupError(path)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+
+def _make_handler(server: ChartServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            try:
+                body, etag, content_type, modified = server._respond(parts.path, dict(parse_qsl(parts.query)))
+            except LookupError:
+                return self._send(404, b'Not found', 'text/plain')
+            except ValueError as e:
+                return self._send(400, str(e).encode('utf-8'), 'text/plain')
+            except Exception as e:
+                print(f"Render Error: {e}")
+                return self._send(500, b'Render error', 'text/plain')
+
+            headers = {}
+            if etag is not None:
+                # clients revalidate every time, and get a 304 while the chart is unchanged
+                headers = {'ETag': etag, 'Cache-Control': 'no-cache',
+                           'Last-Modified': email.utils.formatdate(modified, usegmt=True)}
+                if _not_modified(self.headers, etag, modified):
+                    server._count('not_modified')
+                    return self._send(304, b'', content_type, headers)
+            self._send(200, body, content_type, headers)
+
+        def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # keep test output clean
+
+    return Handler
+
+
+def _render_chart(counts: ApprovalCounts, source: str, kind: str, groups: Optional[list], palette, title: str,
+                  image_format: str, figsize: Optional[tuple], dpi: int) -> bytes:
+    """Render a chart to bytes. Runs in the worker processes"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from drug_nme.plot import Plot, FDAPlot
+
+    palette = list(palette) if isinstance(palette, tuple) else palette
+    if isinstance(palette, str) and matplotlib.colors.is_color_like(palette):
+        # a single color, not a palette name
+        palette = [palette]
+    options = {'title': title, 'palette': palette}
+    if figsize is not None:
+        options['figsize'] = figsize
+
+    with warnings.catch_warnings():
+        # plt.show() warns on the Agg backend
+        warnings.simplefilter('ignore', UserWarning)
+        if source == 'fda':
+            getattr(FDAPlot(counts), kind)(cols=groups, **options)
+        else:
+            plot = Plot(counts)
+            data = plot.df if not groups else plot.df[plot.df['type'].isin(groups)]
+            getattr(plot, kind)(data=data, y=counts.metric, **options)
+
+        buffer = io.BytesIO()
+        plt.gcf().savefig(buffer, format=image_format, dpi=dpi)
+    plt.close('all')
+    return buffer.getvalue()
+
+
+def _warm_up():
+    import matplotlib
+    matplotlib.use('Agg')
+    import drug_nme.plot  # noqa: F401
+
+
+def _metric(counts: ApprovalCounts, metric: str, years: Optional[tuple]) -> ApprovalCounts:
+    """A metric of the counts, computed over all years and then clipped, so rolling and cumulative values keep their
+    history"""
+    match = METRIC.match(metric or 'count')
+    if match is None:
+        raise ValueError(f"Unknown metric '{metric}'. Choose from: count, cumulative, share, change, growth, rolling")
+    if match.group(1) == 'count':
+        result = counts
+    elif match.group(2) is not None:
+        result = counts.rolling(int(match.group(2) or 5))
+    else:
+        result = getattr(counts, match.group(1))()
+    return _clip_years(result, years)
+
+
+def _check_years(counts: ApprovalCounts, years: Optional[tuple]):
+    """Raise a ValueError if no loaded year is in the range, as there is nothing to plot"""
+    if not len(counts.years):
+        raise ValueError("The loaded table has no approval years.")
+    if years is not None and not ((counts.years >= years[0]) & (counts.years <= years[1])).any():
+        raise ValueError(f"No approvals in {years[0]}-{years[1]}. "
+                         f"The data covers {counts.years[0]}-{counts.years[-1]}.")
+
+
+def _chart_params(query: dict) -> dict:
+    """Keyword arguments of ChartServer.chart() from the query parameters of a request"""
+    params = {'source': query.get('source', 'fda'), 'kind': query.get('kind', 'stacked'),
+              'years': _parse_years(query.get('years')), 'metric': query.get('metric', 'count'),
+              'title': query.get('title'), 'image_format': query.get('format', 'png')}
+    if query.get('groups'):
+        params['groups'] = [group.strip() for group in query['groups'].split(',')]
+    if query.get('palette'):
+        palette = [color.strip() for color in query['palette'].split(',')]
+        params['palette'] = palette[0] if len(palette) == 1 else palette
+    try:
+        if query.get('width') or query.get('height'):
+            params['figsize'] = (float(query.get('width', 10)), float(query.get('height', 5)))
+        if query.get('dpi'):
+            params['dpi'] = min(int(query['dpi']), 600)
+    except ValueError:
+        raise ValueError("width, height and dpi must be numbers")
+    return params
+
+
+def _parse_years(value: Optional[str]) -> Optional[tuple]:
+    """'2010-2020' or '2015' as a (first, last) tuple"""
+    if not value:
+        return None
+    match = re.fullmatch(r'\s*(\d{4})\s*(?:-\s*(\d{4})\s*)?', value)
+    if match is None:
+        raise ValueError(f"Invalid years '{value}'. Use i.e. 2010-2020 or 2015.")
+    return int(match.group(1)), int(match.group(2) or match.group(1))
+
+
+def _read_table(data: Union[pd.DataFrame, str]) -> pd.DataFrame:
+    """A table, or a table read from a saved file"""
+    if isinstance(data, pd.DataFrame):
+        return data
+    if data.endswith(('.arrow', '.feather')):
+        from drug_nme.ipc import read_arrow
+        return read_arrow(data)
+    if data.endswith('.parquet'):
+        return pd.read_parquet(data)
+    return pd.read_csv(data)
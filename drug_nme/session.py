@@ -0,0 +1,135 @@
+"""
+Shared HTTP sessions and ChEMBL clients for the fetchers. A single requests.Session with a sized connection pool is
+reused for all requests, so connections are kept alive between calls. ChEMBL clients are created once per thread.
+"""
+
+import copy
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+__all__ = ["ClientManager", "get_client_manager"]
+
+
+class ClientManager:
+    def __init__(self, pool_size: int = 10):
+        """
+        :param pool_size: int
+            Number of connections kept alive per host. Should be at least the number of worker threads using it. The
+            fetchers grow it to their max_workers with reserve().
+        """
+        self.pool_size = pool_size
+        self._session = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._chembl_clients = 0
+        # connection counts of adapters replaced by reserve()
+        self._retired = {'requests': 0, 'connections': 0}
+
+    def session(self) -> requests.Session:
+        """
+        Get the shared requests.Session.
+        """
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+                self._mount()
+        return self._session
+
+    def reserve(self, workers: int):
+        """
+        Grow the connection pool to at least a number of worker threads. With fewer pooled connections than threads,
+        the extra connections are closed after each request instead of being reused.
+        :param workers: int
+            Number of threads sending requests through this manager at once.
+        """
+        with self._lock:
+            if workers <= self.pool_size:
+                return
+            self.pool_size = workers
+            if self._session is not None:
+                requests_sent, connections = self._pool_counts()
+                self._retired = {'requests': requests_sent, 'connections': connections}
+                self._mount()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Send a GET request with the shared session.
+        :param url: str
+            Link for the request.
+        :param kwargs:
+            Additional keyword arguments passed to requests.Session.get (i.e. headers or stream).
+        """
+        return self.session().get(url, **kwargs)
+
+    def chembl(self, resource: str = 'molecule'):
+        """
+        Get the ChEMBL client for a resource (i.e. 'molecule') for the current thread. Clients are created once per
+        thread and reused.
+        :param resource: str
+            Name of the ChEMBL resource.
+        """
+        clients = getattr(self._local, 'chembl', None)
+        if clients is None:
+            clients = self._local.chembl = {}
+
+        if resource not in clients:
+            # the ChEMBL client downloads its schema on import, so it is only imported when first needed
+            from chembl_webresource_client.new_client import new_client
+            clients[resource] = copy.deepcopy(getattr(new_client, resource))
+            with self._lock:
+                self._chembl_clients += 1
+
+        return clients[resource]
+
+    def stats(self) -> dict:
+        """
+        Connection reuse statistics for the shared session. 'requests' is the number of requests sent, 'connections' the
+        number of new connections opened and 'reused' the number of requests sent over an already open connection.
+        """
+        with self._lock:
+            requests_sent, connections = self._pool_counts()
+
+        return {
+            'requests': requests_sent,
+            'connections': connections,
+            'reused': max(requests_sent - connections, 0),
+            'chembl_clients': self._chembl_clients,
+        }
+
+    def close(self):
+        """Close the shared session and its connections."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+                self._retired = {'requests': 0, 'connections': 0}
+
+    """Support functions"""
+
+    def _mount(self):
+        """Mount a connection pool of pool_size on the session. Call with _lock held"""
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+    def _pool_counts(self) -> tuple:
+        """Requests sent and connections opened by the session, including replaced pools. Call with _lock held"""
+        requests_sent, connections = self._retired['requests'], self._retired['connections']
+        if self._session is not None:
+            for adapter in set(self._session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools[key]
+                    connections += pool.num_connections
+                    requests_sent += pool.num_requests
+        return requests_sent, connections
+
+
+# default manager shared by all fetchers
+_default_manager = ClientManager()
+
+
+def get_client_manager() -> ClientManager:
+    """Get the default ClientManager shared by all fetchers."""
+    return _default_manager
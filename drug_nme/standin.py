@@ -0,0 +1,375 @@
+"""
+Local stand-in server for the remote sources. Serves recorded or synthetic responses for the FDA pages, the CDER
+compilation file, Guide to Pharmacology, UniProt and ChEMBL, so the fetchers can be tested and benchmarked offline.
+Latency and errors can be injected to mimic a slow or overloaded service. Responses carry an ETag and Last-Modified
+header and conditional requests are answered with 304 Not Modified, so pollers can be tested against it.
+"""
+
+import os
+import io
+import json
+import time
+import random
+import hashlib
+import datetime
+import threading
+import email.utils
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Union
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from drug_nme.matcher import CHEMBL_NAME_FIELDS
+
+__all__ = ["StandInServer", "make_fixtures", "record_fixtures"]
+
+# name of the index file in a fixture directory
+INDEX = 'index.json'
+
+
+class StandInServer:
+    def __init__(self, fixtures: str, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, seed: int = None):
+        """
+        :param fixtures: str
+            Fixture directory made by make_fixtures() or record_fixtures().
+        :param latency: float
+            Delay in seconds added to every response.
+        :param jitter: float
+            Random extra delay in seconds, between 0 and jitter, added to every response.
+        :param error_rate: float
+            Fraction of requests answered with error_status instead of the fixture.
+        :param error_status: int
+            HTTP status code for injected errors.
+        :param seed: int
+            Seed for the latency and error randomness.
+        """
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+
+        with open(os.path.join(fixtures, INDEX)) as file:
+            self.index = json.load(file)
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def urls(self) -> dict:
+        """
+        Base URLs to point the fetchers at the server, i.e. FDADataFetcher(landing=urls['landing'],
+        new_drug_approvals=urls['new_drug_approvals'], chembl_url=urls['chembl_url']).
+        """
+        return {
+            'landing': f"{self.url}/fda/landing",
+            'new_drug_approvals': f"{self.url}/fda/novel-drug-approvals",
+            'ligand_url': f"{self.url}/gtop/ligands?type=Approved",
+            'gtop_url': f"{self.url}/gtop",
+            'uniprot_url': f"{self.url}/uniprot/",
+            'chembl_url': f"{self.url}/chembl",
+        }
+
+    def start(self):
+        """Start the server on a free local port in a background thread."""
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def update(self, path: str, body: Union[str, bytes], query: str = '', content_type: str = None):
+        """
+        Replace or add the fixture for a request while the server runs, i.e. to publish a new approval. The fixture
+        file in the fixture directory is overwritten.
+        :param path: str
+            Request path, i.e. '/gtop/ligands'.
+        :param body: Union[str, bytes]
+            New response body.
+        :param query: str
+            Query string, i.e. 'type=Approved'.
+        :param content_type: str
+            Content type. If None, the type of the fixture being replaced is kept.
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        key = _request_key(path, query)
+        filename = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        with open(os.path.join(self.fixtures, filename), 'wb') as file:
+            file.write(body)
+
+        with self._lock:
+            entry = dict(self.index.get(key, {'status': 200, 'content_type': 'application/octet-stream'}))
+            entry['file'] = filename
+            if content_type is not None:
+                entry['content_type'] = content_type
+            self.index[key] = entry
+
+    """Support functions"""
+
+    def _lookup(self, path: str, query: str):
+        """Find the fixture for a request. Falls back to the fixture for the path without query, if any."""
+        entry = self.index.get(_request_key(path, query))
+        if entry is None:
+            entry = self.index.get(_request_key(path, ''))
+        return entry
+
+    def _delay_and_error(self):
+        """Draw the injected delay and whether the request fails"""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+        return delay, fail
+
+
+def _make_handler(standin: StandInServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def do_GET(self):
+            delay, fail = standin._delay_and_error()
+            if delay:
+                time.sleep(delay)
+
+            parts = urlsplit(self.path)
+            entry = standin._lookup(parts.path, parts.query)
+
+            if fail:
+                return self._send(standin.error_status, b'Injected error', 'text/plain')
+            if entry is None:
+                return self._send(404, b'Not found', 'text/plain')
+
+            path = os.path.join(standin.fixtures, entry['file'])
+            with open(path, 'rb') as file:
+                body = file.read()
+
+            # validators for conditional requests
+            modified = int(os.path.getmtime(path))
+            headers = {'ETag': f'"{hashlib.sha256(body).hexdigest()[:16]}"',
+                       'Last-Modified': email.utils.formatdate(modified, usegmt=True)}
+            if _not_modified(self.headers, headers['ETag'], modified):
+                return self._send(304, b'', entry.get('content_type', 'application/octet-stream'), headers)
+
+            self._send(entry.get('status', 200), body, entry.get('content_type', 'application/octet-stream'), headers)
+
+        def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # keep test and benchmark output clean
+
+    return Handler
+
+
+def make_fixtures(directory: str, n_drugs: int = 200, n_targets: int = 5, seed: int = 0):
+    """
+    Write synthetic fixtures for every source into a directory. The FDA fixtures are dated relative to the current
+    year, so FDADataFetcher.get_data() finds a compilation file and the missing yearly pages.
+    :param directory: str
+        Output directory.
+    :param n_drugs: int
+        Number of drugs in the compilation file and the Guide to Pharmacology ligand list.
+    :param n_targets: int
+        Number of UniProt targets. They are named P00000, P00001, etc.
+    :param seed: int
+        Seed for the synthetic data.
+    """
+    rng = random.Random(seed)
+    current_year = datetime.date.today().year
+    last_year = current_year - 1
+    index = {}
+
+    def add(path, query, body, content_type, status=200):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        key = _request_key(path, query)
+        filename = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        with open(os.path.join(directory, filename), 'wb') as file:
+            file.write(body)
+        index[key] = {'file': filename, 'status': status, 'content_type': content_type}
+
+    os.makedirs(directory, exist_ok=True)
+    stems = ['tinib', 'mab', 'cept', 'parin', 'vir', 'olol', 'statin', 'ase', 'afil', 'sartan']
+    salts = ['', '', '', ' hydrochloride', ' sodium', ' mesylate']
+    names = [f"{_syllables(rng)}{rng.choice(stems)}" for _ in range(n_drugs)]
+
+    # FDA landing page and compilation file
+    add('/fda/landing', '', f'<html><body><a href="/fda/compilation.xlsx">Compilation of CDER NME and New Biologic '
+                            f'Approvals 1985-{last_year}</a></body></html>', 'text/html')
+    compilation = pd.DataFrame({
+        'Proprietary  Name': [name.upper()[:8] for name in names],
+        'Active Ingredient/Moiety': [name + rng.choice(salts) for name in names],
+        'NDA/BLA': ['BLA' if name.endswith(('mab', 'cept', 'ase')) else 'NDA' for name in names],
+        'Route of Administration(1)': [rng.choice(['Oral', 'Intravenous', 'Subcutaneous']) for _ in names],
+        'FDA Approval Date': [f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/{1985 + i % (last_year - 1984)}"
+                              for i in range(n_drugs)],
+        'Approval Year': [1985 + i % (last_year - 1984) for i in range(n_drugs)],
+        'Orphan Drug Designation': [rng.choice(['Yes', 'No']) for _ in names],
+        'Unused Column': [''] * n_drugs,
+    })
+    buffer = io.BytesIO()
+    compilation.to_excel(buffer, index=False)
+    add('/fda/compilation.xlsx', '', buffer.getvalue(),
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+    # Novel Drug Approvals page for the current year
+    rows = ''.join(f'<tr><td>{i + 1}</td><td><a href="/drug/{i}">{name.upper()[:8]}</a></td><td>{name}</td>'
+                   f'<td>{rng.randint(1, 12)}/{rng.randint(1, 28)}/{current_year}</td><td>To treat a disease</td></tr>'
+                   for i, name in enumerate(names[:10]))
+    add(f'/fda/novel-drug-approvals-{current_year}', '',
+        f'<html><body><table><tr><th>No.</th><th>Drug  Name</th><th>Active Ingredient</th><th>Date</th>'
+        f'<th>FDA-approved use on approval date*</th></tr>{rows}</table></body></html>', 'text/html')
+
+    # Guide to Pharmacology ligands
+    ligands = []
+    for i, name in enumerate(names):
+        year = 1985 + i % (last_year - 1984)
+        source = rng.choice([f"FDA ({year})", f"FDA ({year}), EMA ({year + 1})", f"EMA ({year})", ""])
+        ligands.append({
+            'ligandId': i, 'name': name, 'abbreviation': '', 'inn': name, 'type': rng.choice(
+                ['Synthetic organic', 'Peptide', 'Antibody', 'Natural product']), 'species': None,
+            'radioactive': False, 'labelled': False, 'approved': True, 'withdrawn': False, 'whoEssential': False,
+            'immuno': False, 'malaria': False, 'antibacterial': False, 'approvalSource': source, 'subunitIds': [],
+            'complexIds': [], 'prodrugIds': [], 'activeDrugIds': []})
+    add('/gtop/ligands', 'type=Approved', json.dumps(ligands), 'application/json')
+
+    # Guide to Pharmacology targets and UniProt entries
+    for i in range(n_targets):
+        accession = f"P{i:05d}"
+        gene = f"GENE{i}"
+        abbreviation = gene if i % 2 else ''  # some targets need the UniProt fallback
+        add('/gtop/targets', f'accession={accession}', json.dumps(
+            [{'targetId': 1000 + i, 'type': rng.choice(['GPCR', 'Enzyme', 'Kinase']), 'abbreviation': abbreviation}]),
+            'application/json')
+        add(f'/gtop/targets/{1000 + i}/databaseLinks', 'species=Human', json.dumps(
+            [{'accession': accession, 'database': 'UniProtKB', 'url': '', 'species': 'Human'},
+             {'accession': f"ENSG{i:011d}", 'database': 'Ensembl Gene', 'url': '', 'species': 'Human'}]),
+            'application/json')
+        add(f'/uniprot/{accession}', '', json.dumps({'genes': [{'geneName': {'value': gene}}]}), 'application/json')
+
+    # ChEMBL molecule type lookups by exact name. Unknown names fall back to an empty result
+    def molecule_type(name):
+        return 'Antibody' if name.endswith('mab') else 'Protein' if name.endswith(('cept', 'ase')) else 'Small molecule'
+
+    for name in names:
+        add('/chembl/molecule.json', urlencode({'pref_name__iexact': name, 'only': 'molecule_type', 'limit': 1}),
+            json.dumps({'molecules': [{'molecule_type': molecule_type(name)}]}), 'application/json')
+    add('/chembl/molecule.json', '', json.dumps({'molecules': [], 'page_meta': {'total_count': 0, 'next': None}}),
+        'application/json')
+
+    # ChEMBL name and synonym list for the offline name matcher
+    molecules = [{'molecule_chembl_id': f"CHEMBL{i}", 'pref_name': name.upper(), 'molecule_type': molecule_type(name),
+                  'molecule_synonyms': [{'molecule_synonym': name.upper()[:8]}]} for i, name in enumerate(names)]
+    add('/chembl/molecule.json', urlencode({'max_phase__gte': 1, 'only': CHEMBL_NAME_FIELDS, 'limit': 1000,
+                                            'offset': 0}),
+        json.dumps({'molecules': molecules, 'page_meta': {'total_count': len(molecules), 'next': None}}),
+        'application/json')
+
+    # ChEMBL approved drugs, for all years and per year. Every 7th drug is withdrawn and one has a non CDER type
+    approved = [{'molecule_chembl_id': f"CHEMBL{i}", 'pref_name': name.upper(), 'first_approval': 1985 + i % (
+        last_year - 1984), 'molecule_type': molecule_type(name), 'max_phase': 4, 'withdrawn_flag': i % 7 == 6}
+                for i, name in enumerate(names)]
+    approved.append({'molecule_chembl_id': f"CHEMBL{n_drugs}", 'pref_name': 'CELL THERAPY', 'first_approval': 1985,
+                     'molecule_type': 'Cell', 'max_phase': 4, 'withdrawn_flag': False})
+    for year in [None, *sorted({molecule['first_approval'] for molecule in approved})]:
+        filters = {'max_phase': 4} if year is None else {'max_phase': 4, 'first_approval': year}
+        page = [molecule for molecule in approved if year in (None, molecule['first_approval'])]
+        add('/chembl/molecule.json', urlencode({**filters, 'limit': 1000, 'offset': 0}),
+            json.dumps({'molecules': page, 'page_meta': {'total_count': len(page), 'next': None}}), 'application/json')
+
+    with open(os.path.join(directory, INDEX), 'w') as file:
+        json.dump(index, file, indent=1)
+
+    return directory
+
+
+def record_fixtures(urls: dict, directory: str, session=None):
+    """
+    Record live responses into a fixture directory for replay with StandInServer. Each recorded URL is served at the
+    path given as its key, i.e. {'/gtop/ligands?type=Approved': ligand_url}.
+    :param urls: dict
+        Mapping of stand-in path (with query) to the live URL to record.
+    :param directory: str
+        Output directory. Existing recordings in its index are kept.
+    :param session: requests.Session
+        Session used for recording. If None, the shared ClientManager session is used.
+    """
+    from drug_nme.session import get_client_manager
+    from drug_nme.utils import HEADERS
+
+    session = session or get_client_manager().session()
+    os.makedirs(directory, exist_ok=True)
+
+    index_path = os.path.join(directory, INDEX)
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as file:
+            index = json.load(file)
+
+    for path, url in urls.items():
+        response = session.get(url, headers=HEADERS)
+        parts = urlsplit(path)
+        key = _request_key(parts.path, parts.query)
+        filename = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        with open(os.path.join(directory, filename), 'wb') as file:
+            file.write(response.content)
+        index[key] = {'file': filename, 'status': response.status_code,
+                      'content_type': response.headers.get('Content-Type', 'application/octet-stream')}
+
+    with open(index_path, 'w') as file:
+        json.dump(index, file, indent=1)
+
+    return directory
+
+
+def _not_modified(request_headers, etag: str, modified: int) -> bool:
+    """Whether a conditional request can be answered with 304. If-None-Match takes priority over If-Modified-Since"""
+    if_none_match = request_headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+    if_modified_since = request_headers.get('If-Modified-Since')
+    if if_modified_since is not None:
+        try:
+            return modified <= email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _request_key(path: str, query: str) -> str:
+    """Normalize a request so the order of the query parameters does not matter"""
+    params = sorted(parse_qsl(query, keep_blank_values=True))
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+def _syllables(rng: random.Random) -> str:
+    return ''.join(rng.choice(['ba', 'ce', 'di', 'lo', 'mu', 'ra', 'si', 'to', 've', 'zo']) for _ in range(3))
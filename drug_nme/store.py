@@ -0,0 +1,271 @@
+"""
+Local SQLite store for the fetched data. FDA approvals, Guide to Pharmacology ligands, ChEMBL molecules and targets are
+loaded into indexed tables, queried with SQL and summarized by prepared views. A store saved to a file persists
+between sessions.
+"""
+
+import sqlite3
+import pandas as pd
+from typing import Optional, Union
+from drug_nme.fetch import _clean_ingredient_name
+
+__all__ = ["DrugStore"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fda_approvals (
+    drug_name TEXT,
+    active_ingredient TEXT,
+    norm_name TEXT,
+    approval_date TEXT,
+    year INTEGER,
+    application TEXT,
+    type TEXT
+);
+CREATE INDEX IF NOT EXISTS fda_approvals_year ON fda_approvals (year);
+CREATE INDEX IF NOT EXISTS fda_approvals_name ON fda_approvals (norm_name);
+CREATE INDEX IF NOT EXISTS fda_approvals_type ON fda_approvals (type);
+
+CREATE TABLE IF NOT EXISTS gtop_approvals (
+    ligand_id INTEGER,
+    name TEXT,
+    norm_name TEXT,
+    type TEXT,
+    agency TEXT,
+    year INTEGER
+);
+CREATE INDEX IF NOT EXISTS gtop_approvals_year ON gtop_approvals (year);
+CREATE INDEX IF NOT EXISTS gtop_approvals_name ON gtop_approvals (norm_name);
+CREATE INDEX IF NOT EXISTS gtop_approvals_type ON gtop_approvals (type);
+CREATE INDEX IF NOT EXISTS gtop_approvals_agency ON gtop_approvals (agency, year);
+
+CREATE TABLE IF NOT EXISTS chembl_molecules (
+    chembl_id TEXT,
+    name TEXT,
+    norm_name TEXT,
+    year INTEGER,
+    type TEXT
+);
+CREATE INDEX IF NOT EXISTS chembl_molecules_year ON chembl_molecules (year);
+CREATE INDEX IF NOT EXISTS chembl_molecules_name ON chembl_molecules (norm_name);
+CREATE INDEX IF NOT EXISTS chembl_molecules_type ON chembl_molecules (type);
+
+CREATE TABLE IF NOT EXISTS targets (
+    target_id INTEGER,
+    accession TEXT,
+    source_database TEXT,
+    protein_type TEXT,
+    protein_target TEXT
+);
+CREATE INDEX IF NOT EXISTS targets_id ON targets (target_id);
+CREATE INDEX IF NOT EXISTS targets_accession ON targets (accession);
+CREATE INDEX IF NOT EXISTS targets_gene ON targets (protein_target);
+
+CREATE VIEW IF NOT EXISTS approvals AS
+    SELECT 'fda' AS source, 'FDA' AS agency, active_ingredient AS name, norm_name, year, type, application
+    FROM fda_approvals
+    UNION ALL
+    SELECT 'gtop', agency, name, norm_name, year, type, NULL FROM gtop_approvals
+    UNION ALL
+    SELECT 'chembl', NULL, name, norm_name, year, type, NULL FROM chembl_molecules;
+
+CREATE VIEW IF NOT EXISTS approvals_per_year_by_type AS
+    SELECT source, year, type, COUNT(*) AS count FROM approvals GROUP BY source, year, type;
+
+CREATE VIEW IF NOT EXISTS approvals_per_year_by_agency AS
+    SELECT agency, year, COUNT(*) AS count FROM gtop_approvals GROUP BY agency, year;
+
+CREATE VIEW IF NOT EXISTS fda_approvals_per_year AS
+    SELECT year, application, COUNT(*) AS count FROM fda_approvals GROUP BY year, application;
+
+CREATE VIEW IF NOT EXISTS drugs_across_sources AS
+    SELECT norm_name, GROUP_CONCAT(DISTINCT source) AS sources, COUNT(DISTINCT source) AS n_sources,
+           MIN(year) AS first_year
+    FROM approvals GROUP BY norm_name;
+"""
+
+# columns of the Guide to Pharmacology table that are not agency columns
+GTOP_COLUMNS = ['ligandId', 'name', 'type', 'approved', 'withdrawn', 'whoEssential', 'Year']
+
+
+class DrugStore:
+    def __init__(self, path: str = ':memory:'):
+        """
+        :param path: str
+            Path to the SQLite database file. It is created if it does not exist. By default, the store is kept in
+            memory.
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        if path != ':memory:':
+            # readers are not blocked while data is written
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add_fda(self, data: pd.DataFrame, replace: bool = True):
+        """
+        Load a table from FDADataFetcher.get_data() or add_types(). The 'Type' column is optional.
+        :param data: pd.DataFrame
+            FDA approvals.
+        :param replace: bool
+            Whether to replace the rows already stored. If False, the rows are appended.
+        """
+        table = pd.DataFrame({
+            'drug_name': data['Drug Name'],
+            'active_ingredient': data['Active Ingredient'],
+            'norm_name': _normalize_names(data['Active Ingredient']),
+            'approval_date': pd.to_datetime(data['Approval Date'], format='%m/%d/%Y', errors='coerce').dt.strftime(
+                '%Y-%m-%d'),
+            'year': data['Approval Year'],
+            'application': data['NME/BLA'],
+            'type': data['Type'] if 'Type' in data.columns else None,
+        })
+        self._write('fda_approvals', table, replace)
+
+    def add_gtop(self, data: pd.DataFrame, agency: Optional[Union[str, list]] = None, replace: bool = True):
+        """
+        Load a table from PharmacologyDataFetcher.get_data(). Each agency column becomes a row per approving agency.
+        :param data: pd.DataFrame
+            Guide to Pharmacology ligands.
+        :param agency: Union[str, list]
+            Agency columns to load, i.e. ['FDA', 'EMA']. If None, the agency columns are found from the table.
+        :param replace: bool
+            Whether to replace the rows already stored. If False, the rows are appended.
+        """
+        if agency is None:
+            agency = [col for col in data.columns if col not in GTOP_COLUMNS and _agency_rows(data, col).any()]
+        elif isinstance(agency, str):
+            agency = [agency]
+
+        tables = []
+        for name in agency:
+            approved = data[_agency_rows(data, name)]
+            tables.append(pd.DataFrame({
+                'ligand_id': approved['ligandId'],
+                'name': approved['name'],
+                'norm_name': _normalize_names(approved['name']),
+                'type': approved['type'],
+                'agency': name,
+                'year': approved['Year'],
+            }))
+        if not tables:
+            tables = [pd.DataFrame(columns=['ligand_id', 'name', 'norm_name', 'type', 'agency', 'year'])]
+        self._write('gtop_approvals', pd.concat(tables, ignore_index=True), replace)
+
+    def add_chembl(self, data: pd.DataFrame, replace: bool = True):
+        """
+        Load a table from _ChemblDataFetcher.get_approved_drugs().
+        :param data: pd.DataFrame
+            ChEMBL approved drugs.
+        :param replace: bool
+            Whether to replace the rows already stored. If False, the rows are appended.
+        """
+        table = pd.DataFrame({
+            'chembl_id': data['ChEMBL_ID'],
+            'name': data['Name'],
+            'norm_name': _normalize_names(data['Name']),
+            'year': data['Year'] if 'Year' in data.columns else None,
+            'type': data['Type'] if 'Type' in data.columns else None,
+        })
+        self._write('chembl_molecules', table, replace)
+
+    def add_targets(self, data: pd.DataFrame, replace: bool = True):
+        """
+        Load a table from Target.get_data().
+        :param data: pd.DataFrame
+            Target database links.
+        :param replace: bool
+            Whether to replace the rows already stored. If False, the rows are appended.
+        """
+        table = data[['target_id', 'accession', 'source_database', 'protein_type', 'protein_target']]
+        self._write('targets', table, replace)
+
+    def query(self, sql: str, params: Union[tuple, dict] = None) -> pd.DataFrame:
+        """
+        Run a SQL query and return the result as a pd.DataFrame. Use ? or :name placeholders for values.
+        :param sql: str
+            SQL query, i.e. "SELECT * FROM approvals WHERE year >= ?".
+        :param params: Union[tuple, dict]
+            Values for the placeholders.
+        """
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def view(self, name: str = 'approvals_per_year_by_type', **filters) -> pd.DataFrame:
+        """
+        Read a prepared view: 'approvals', 'approvals_per_year_by_type', 'approvals_per_year_by_agency',
+        'fda_approvals_per_year' or 'drugs_across_sources'.
+        :param name: str
+            Name of the view.
+        :param filters:
+            Column values to filter on, i.e. source='fda'. Only columns of the view are accepted.
+        """
+        if name not in self.views():
+            raise ValueError(f"Unknown view '{name}'. Choose from: {', '.join(self.views())}")
+
+        # the view and column names are put in the SQL, so only known names are allowed
+        columns = [row[1] for row in self.conn.execute(f'PRAGMA table_info("{name}")')]
+        unknown = [col for col in filters if col not in columns]
+        if unknown:
+            raise ValueError(f"Unknown column(s) {', '.join(map(repr, unknown))} for view '{name}'. "
+                             f"Choose from: {', '.join(columns)}")
+
+        sql = f'SELECT * FROM "{name}"'
+        if filters:
+            sql += " WHERE " + " AND ".join(f'"{col}" = ?' for col in filters)
+        return self.query(sql, tuple(filters.values()))
+
+    def lookup(self, name: str) -> pd.DataFrame:
+        """
+        Find a drug in all sources by name. The name is normalized the same way as the stored names.
+        :param name: str
+            Drug or active ingredient name.
+        """
+        return self.query("SELECT * FROM approvals WHERE norm_name = ?", (_normalize_name(name),))
+
+    def tables(self) -> list:
+        """Names of the stored tables."""
+        return self._names('table')
+
+    def views(self) -> list:
+        """Names of the prepared views."""
+        return self._names('view')
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+    """Support functions"""
+
+    def _write(self, table: str, data: pd.DataFrame, replace: bool):
+        """Write rows to a table in a single transaction"""
+        with self.conn:
+            if replace:
+                self.conn.execute(f"DELETE FROM {table}")
+            data.to_sql(table, self.conn, if_exists='append', index=False)
+
+    def _names(self, kind: str) -> list:
+        rows = self.conn.execute("SELECT name FROM sqlite_master WHERE type = ? ORDER BY name", (kind,)).fetchall()
+        return [row[0] for row in rows]
+
+
+def _agency_rows(data: pd.DataFrame, agency: str) -> pd.Series:
+    """Rows of a Guide to Pharmacology table approved by an agency. Agency values may carry trailing spaces"""
+    return data[agency].astype(str).str.strip() == agency
+
+
+def _normalize_name(name):
+    """Normalize a drug name for matching across sources. Salts, parentheses and FDA biologic suffixes are removed"""
+    if pd.isna(name) or not isinstance(name, str):
+        return None
+    return _clean_ingredient_name(name)[0]
+
+
+def _normalize_names(names: pd.Series) -> pd.Series:
+    """Normalize a column of names, cleaning each distinct name once"""
+    unique = names.dropna().unique()
+    return names.map(dict(zip(unique, map(_normalize_name, unique))))
@@ -2,24 +2,47 @@
 Get target-specific information. Information is assessed from the Guide to Pharmacology API
 """
 
-import requests
 import pandas as pd
 from tqdm import tqdm
 from typing import Union, Optional
+from drug_nme.aio import get_async_client, _gather_with_progress
+from drug_nme.session import ClientManager, get_client_manager
+from drug_nme.concurrency import get_limiter
+from drug_nme.cache import DiskCache, get_cache, cached_get, acached_get
+from drug_nme.metrics import stage, show_progress
+from concurrent.futures import ThreadPoolExecutor
 from drug_nme.utils import GtoP, uniprot_query
 
 __all__ = ["Target"]
 
 
 class Target:
-    def __init__(self, uniprot_id: Optional[Union[str, list]] = None):
+    def __init__(self, uniprot_id: Optional[Union[str, list]] = None, manager: ClientManager = None,
+                 max_workers: int = 4, gtop_url: str = None, uniprot_url: str = None, cache: DiskCache = None):
         """
         uniprot_id: Union[str, list]
             Set the UniprotID for target query.
+        manager: ClientManager
+            Manager for the HTTP sessions. If None, the shared default manager is used. Its connection pool is grown to
+            max_workers.
+        max_workers: int
+            Number of threads used to query targets in get_data(). The number of concurrent requests is adapted to
+            each service within this limit.
+        gtop_url: str
+            Base URL of the Guide to Pharmacology API. If None, it will default to the Guide to Pharmacology site.
+        uniprot_url: str
+            Base URL of the UniProt entries. If None, it will default to the UniProt REST API.
+        cache: DiskCache
+            Cache shared with other processes for the target responses. If None, the default cache is used, if set.
         """
+        self.manager = manager or get_client_manager()
+        self.max_workers = max_workers
+        self.manager.reserve(max_workers)
         # set link to Guide To Pharmacology
-        self.GTOPDB = GtoP
+        self.GTOPDB = gtop_url or GtoP
+        self.uniprot_query = uniprot_url or uniprot_query
         self.uniprot = uniprot_id
+        self.cache = cache if cache is not None else get_cache()
 
     def get_data(self, uniprot_id: Optional[Union[str, list]] = None):
         """
@@ -39,24 +62,42 @@ class Target:
         if isinstance(uniprot_id, str):
             uniprot_id = [uniprot_id]
 
-        dfs = []
-        for uni_id in tqdm(uniprot_id, desc=f'Getting Target Data'):
-            target_id, target_type, target_name = self._get_target_id_by_uniprot_id(uni_id)
+        # multi threading
+        with stage('download', 'gtop', rows_in=len(uniprot_id),
+                   limiters=(get_limiter('gtop'), get_limiter('uniprot'))) as s:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                dfs = list(tqdm(executor.map(self._get_target_data, uniprot_id), total=len(uniprot_id),
+                                desc=f'Getting Target Data', disable=not show_progress()))
 
-            # if there is no target_name
-            if target_name == "" or target_name is None:
-                target_name = self.get_gene_id(uni_id, pbar=False)
-                target_name = next(iter(target_name.values()))  # extract value/target_name from dict
-                # print('New target name:', target_name)
+            # combine dataframes
+            data = pd.concat(dfs, ignore_index=True)
+            s.output(data)
 
-            # # for troubleshooting
-            # print(f"Target Name: {target_name}")
+        return data
 
-            pull_data = self._get_data_by_target_id(target_id, target_type, target_name)
-            dfs.append(pull_data)
+    async def aget_data(self, uniprot_id: Optional[Union[str, list]] = None, max_concurrency: int = 10):
+        """
+        Async version of get_data(). Targets are queried concurrently with the shared async HTTP client, within each
+        service's concurrency limit and through the cache if one is set.
+        :param uniprot_id: Union[str, list]
+            Get gene id for a protein by their Uniprot ID.
+        :param max_concurrency: int
+            Maximum number of targets queried at once.
+        """
+        if uniprot_id is None:
+            uniprot_id = self.uniprot
+        if self.uniprot is None and uniprot_id is None:
+            raise AttributeError("You must specify a target Uniprot ID!")
 
-            # combine dataframes
-        data = pd.concat(dfs, ignore_index=True)
+        if isinstance(uniprot_id, str):
+            uniprot_id = [uniprot_id]
+
+        with stage('download', 'gtop', rows_in=len(uniprot_id),
+                   limiters=(get_limiter('gtop'), get_limiter('uniprot'))) as s:
+            dfs = await _gather_with_progress([self._aget_target_data(uni_id) for uni_id in uniprot_id],
+                                              desc='Getting Target Data', limit=max_concurrency)
+            data = pd.concat(dfs, ignore_index=True)
+            s.output(data)
 
         return data
 
@@ -78,65 +119,122 @@ class Target:
             uniprot_id = [uniprot_id]
 
         id_dict = {}
-        for uni_id in tqdm(uniprot_id, desc=f'Getting Target Gene ID', disable=not pbar):
+        for uni_id in tqdm(uniprot_id, desc=f'Getting Target Gene ID', disable=not pbar or not show_progress()):
             # query uniprot rest
-            url = uniprot_query + f"{uni_id}"
-            response = requests.get(url)
+            url = self.uniprot_query + f"{uni_id}"
+            response = self._get(url, 'uniprot')
 
             # pul data
             if response.status_code == 200:
-                data = response.json()
                 # get gene name
-                gene_name = data.get("genes", [{}])[0].get("geneName", {}).get("value", None)
-                id_dict[uni_id] = gene_name
+                id_dict[uni_id] = _parse_gene_name(response.json())
             elif response.status_code == 400:
                 print(f"Error: Failed to get data for Uniprot ID: {uni_id}!!")
         return id_dict
 
     """Support functions"""
 
+    def _get_target_data(self, uniprot_id):
+        """
+        Run the get_data() steps for a single Uniprot ID.
+        """
+        target_id, target_type, target_name = self._get_target_id_by_uniprot_id(uniprot_id)
+
+        # if there is no target_name
+        if target_name == "" or target_name is None:
+            target_name = self.get_gene_id(uniprot_id, pbar=False)
+            target_name = next(iter(target_name.values()), None)  # extract value/target_name from dict
+
+        return self._get_data_by_target_id(target_id, target_type, target_name)
+
     def _get_target_id_by_uniprot_id(self, uniprot_id):
         """
         Pull data from Guide to Pharmacology API using Uniprot ID
         """
         # default database is UniProt, so we can query by UniProt ID like this
         url = f"{self.GTOPDB}/targets?accession={uniprot_id}"
-        response = requests.get(url)
-        status_code = response.status_code
-        target_data = response.json()  # target_data is list
+        response = self._get(url, 'gtop')
+        return _parse_target(response.status_code, response.json())
 
-        if status_code == 200 and len(target_data) > 0:
-            only_item = target_data[0]
-            target_id = only_item["targetId"]
-            target_type = only_item["type"]
+    def _get_data_by_target_id(self, target_id, target_type, target_name):
+        """
+        Get data from Guide to Pharmacology API and place it in a dataframe.
+        """
+        url = f"{self.GTOPDB}/targets/{target_id}/databaseLinks?species=Human"
+        response = self._get(url, 'gtop')
+        return _parse_database_links(response.status_code, response.json(), target_id, target_type, target_name)
 
-            # get fallback
-            target_name = only_item.get("abbreviation", "")
+    def _get(self, url: str, service: str):
+        """
+        GET a URL within the service's concurrency limit, through the cache if one is set.
+        """
+        return cached_get(url, lambda link: get_limiter(service).call(self.manager.get, link), self.cache)
 
-            return target_id, target_type, target_name
+    async def _aget_target_data(self, uniprot_id):
+        """
+        Async version of the get_data() steps for a single Uniprot ID.
+        """
+        response = await self._aget(f"{self.GTOPDB}/targets?accession={uniprot_id}", 'gtop')
+        target_id, target_type, target_name = _parse_target(response.status_code, response.json())
 
-        return None
+        # if there is no target_name
+        if target_name == "" or target_name is None:
+            response = await self._aget(self.uniprot_query + f"{uniprot_id}", 'uniprot')
+            if response.status_code == 200:
+                target_name = _parse_gene_name(response.json())
 
-    def _get_data_by_target_id(self, target_id, target_type, target_name):
+        response = await self._aget(f"{self.GTOPDB}/targets/{target_id}/databaseLinks?species=Human", 'gtop')
+        return _parse_database_links(response.status_code, response.json(), target_id, target_type, target_name)
+
+    async def _aget(self, url: str, service: str):
         """
-        Get data from Guide to Pharmacology API and place it in a dataframe.
+        Async version of _get(), with the shared async HTTP client.
         """
-        url = f"{self.GTOPDB}/targets/{target_id}/databaseLinks?species=Human"
-        response = requests.get(url)
-        status_code = response.status_code
-        db_data = response.json()
-
-        if status_code == 200:
-            # convert JSON to dataframe
-            df = pd.DataFrame(db_data)
-            df["target_id"] = target_id
-            df["protein_type"] = target_type
-            df["protein_target"] = target_name
-            df.drop(columns=["url", "species"], inplace=True)
-            df.rename(columns={"database": "source_database"}, inplace=True)
-            return df
-
-        return None
+        return await acached_get(url, lambda link: get_limiter(service).acall(get_async_client().get, link), self.cache)
+
+
+"""Support functions to parse the API responses"""
+
+
+def _parse_target(status_code, target_data):
+    """
+    Get the target id, type and name from the Guide to Pharmacology targets response.
+    """
+    if status_code == 200 and len(target_data) > 0:
+        only_item = target_data[0]
+        target_id = only_item["targetId"]
+        target_type = only_item["type"]
+
+        # get fallback
+        target_name = only_item.get("abbreviation", "")
+
+        return target_id, target_type, target_name
+
+    return None
+
+
+def _parse_database_links(status_code, db_data, target_id, target_type, target_name):
+    """
+    Convert the Guide to Pharmacology databaseLinks response into a pd.DataFrame.
+    """
+    if status_code == 200:
+        # convert JSON to dataframe
+        df = pd.DataFrame(db_data)
+        df["target_id"] = target_id
+        df["protein_type"] = target_type
+        df["protein_target"] = target_name
+        df.drop(columns=["url", "species"], inplace=True)
+        df.rename(columns={"database": "source_database"}, inplace=True)
+        return df
+
+    return None
+
+
+def _parse_gene_name(data):
+    """
+    Get the gene name from a UniProt entry.
+    """
+    return data.get("genes", [{}])[0].get("geneName", {}).get("value", None)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+"""
+Offline ChEMBL molecule types. A ChEMBL dump or export is reduced to a lookup of name/synonym -> molecule_type, saved
+as sorted arrays of 64-bit name hashes and type codes. The arrays are memory-mapped when loaded, so loading is
+near-instant and worker processes share one copy of the table through the page cache.
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import numpy as np
+import pandas as pd
+from typing import Union
+
+__all__ = ["MoleculeTypeTable"]
+
+# names and types from a ChEMBL SQLite dump. Preferred names take priority over synonyms
+CHEMBL_DUMP_QUERY = """
+SELECT pref_name AS name, molecule_type, 0 AS priority FROM molecule_dictionary WHERE pref_name IS NOT NULL
+UNION ALL
+SELECT s.synonyms, d.molecule_type, 1 FROM molecule_synonyms s JOIN molecule_dictionary d ON s.molregno = d.molregno
+"""
+
+META = 'meta.json'
+
+
+class MoleculeTypeTable:
+    def __init__(self, path: str):
+        """
+        Load a table saved by MoleculeTypeTable.build(). The arrays are memory-mapped, not read.
+        :param path: str
+            Directory of the table.
+        """
+        self.path = path
+        with open(os.path.join(path, META)) as file:
+            self.meta = json.load(file)
+        self.types = self.meta['types']
+        self._hashes = np.load(os.path.join(path, 'hashes.npy'), mmap_mode='r')
+        self._codes = np.load(os.path.join(path, 'codes.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, name: str):
+        return self.get(name) is not None
+
+    @classmethod
+    def build(cls, source: Union[str, pd.DataFrame], path: str, name_col: str = 'name',
+              type_col: str = 'molecule_type') -> 'MoleculeTypeTable':
+        """
+        Build a table from a ChEMBL dump or export and save it to a directory.
+        :param source: Union[str, pd.DataFrame]
+            A ChEMBL SQLite dump (.db), a CSV/TSV or parquet export, or a pd.DataFrame (i.e. from cache_chembl_names())
+            with a name and a molecule type column. Earlier rows take priority when a name has several types.
+        :param path: str
+            Output directory.
+        :param name_col: str
+            Column with the names and synonyms in an export or pd.DataFrame.
+        :param type_col: str
+            Column with the molecule types in an export or pd.DataFrame.
+        """
+        data = _read_source(source, name_col, type_col)
+        data = data.dropna()
+
+        keys = data['name'].astype(str).map(_normalize)
+        hashes = _hash(keys.tolist())
+        types, codes = np.unique(data['molecule_type'].astype(str).to_numpy(), return_inverse=True)
+        if len(types) > 255:
+            raise ValueError(f"Too many molecule types ({len(types)}). At most 255 are supported.")
+
+        # sort by hash, keeping the first row for each name
+        order = np.argsort(hashes, kind='stable')
+        hashes, codes = hashes[order], codes[order].astype(np.uint8)
+        first = np.ones(len(hashes), dtype=bool)
+        first[1:] = hashes[1:] != hashes[:-1]
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'hashes.npy'), hashes[first])
+        np.save(os.path.join(path, 'codes.npy'), codes[first])
+        meta = {'types': types.tolist(), 'rows': int(first.sum())}
+        with open(os.path.join(path, META), 'w') as file:
+            json.dump(meta, file, indent=1)
+
+        return cls(path)
+
+    def get(self, name: str):
+        """
+        Molecule type of a name or synonym, or None if it is not in the table. Case and spacing are ignored.
+        :param name: str
+            Drug name.
+        """
+        if len(self._hashes) == 0:
+            return None
+        key = _hash_name(_normalize(name))
+        position = int(np.searchsorted(self._hashes, key))
+        if position < len(self._hashes) and self._hashes[position] == key:
+            return self.types[self._codes[position]]
+        return None
+
+    def lookup(self, names: pd.Series) -> pd.Series:
+        """
+        Molecule types of many names. Names not in the table are None.
+        :param names: pd.Series
+            Drug names.
+        """
+        names = pd.Series(names)
+        valid = names.notna().to_numpy()
+        codes = np.full(len(names), -1)
+        codes[valid] = self._find(_hash(names[valid].astype(str).map(_normalize).tolist()))
+        # code -1 picks the trailing None
+        types = np.array(self.types + [None], dtype=object)
+        return pd.Series(types[codes], index=names.index, dtype=object)
+
+    """Support functions"""
+
+    def _find(self, hashes: np.ndarray) -> np.ndarray:
+        """Type codes of the hashes with a binary search, -1 where not found"""
+        if len(self._hashes) == 0:
+            return np.full(len(hashes), -1)
+        positions = np.searchsorted(self._hashes, hashes)
+        positions = np.minimum(positions, len(self._hashes) - 1)
+        found = self._hashes[positions] == hashes
+        return np.where(found, self._codes[positions].astype(int), -1)
+
+
+def _read_source(source, name_col: str, type_col: str) -> pd.DataFrame:
+    """Read the names and molecule types from a dump, export or pd.DataFrame"""
+    if isinstance(source, pd.DataFrame):
+        data = source[[name_col, type_col]]
+    elif source.endswith(('.db', '.sqlite')):
+        with sqlite3.connect(source) as conn:
+            data = pd.read_sql_query(CHEMBL_DUMP_QUERY, conn)
+        return data.sort_values('priority', kind='stable')[['name', 'molecule_type']]
+    elif source.endswith('.parquet'):
+        data = pd.read_parquet(source, columns=[name_col, type_col])
+    else:
+        data = pd.read_csv(source, sep='\t' if source.endswith(('.tsv', '.txt')) else ',', usecols=[name_col, type_col])
+    return data.rename(columns={name_col: 'name', type_col: 'molecule_type'})
+
+
+def _normalize(name: str) -> str:
+    """Lower case the name and collapse whitespace"""
+    return ' '.join(name.replace('\xa0', ' ').lower().split())
+
+
+def _hash_name(key: str) -> np.uint64:
+    """64-bit hash of a normalized name. blake2b is stable across processes and versions, unlike hash()"""
+    return np.uint64(int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little'))
+
+
+def _hash(keys: list) -> np.ndarray:
+    """64-bit hashes of normalized names"""
+    return np.fromiter((_hash_name(key) for key in keys), dtype=np.uint64, count=len(keys))
@@ -7,6 +7,9 @@ ligand_url = 'https://www.guidetopharmacology.org/services/ligands?type=Approved
 # pull data from GTP
 GtoP = 'https://www.guidetopharmacology.org/services/'
 
+# pull data from ChEMBL
+CHEMBL_API = 'https://www.ebi.ac.uk/chembl/api/data'
+
 # pull data from uniprot
 uniprot_query = 'https://rest.uniprot.org/uniprotkb/'
 
@@ -19,6 +22,9 @@ HEADERS = {
 }
 COL_TO_KEEP = ["Proprietary  Name", "Active Ingredient/Moiety", "NDA/BLA", "Route of Administration(1)",
                "FDA Approval Date", "Approval Year", "Orphan Drug Designation"]
+# declared types of the text columns read from the compilation file. Dates and years are left to the Excel parser
+COL_DTYPES = {"Proprietary  Name": str, "Active Ingredient/Moiety": str, "NDA/BLA": str,
+              "Route of Administration(1)": str, "Orphan Drug Designation": str}
 NAMED_COLS = {'Proprietary  Name': 'Drug Name', 'Active Ingredient/Moiety': 'Active Ingredient',
               'FDA Approval Date': 'Approval Date', }
 
@@ -0,0 +1,272 @@
+"""
+Resident refresh daemon. The FDA landing page, the CDER compilation file, the recent Novel Drug Approvals pages and the
+Guide to Pharmacology ligands are polled on a schedule with conditional requests (ETag / Last-Modified), so unchanged
+sources cost a 304 response. When a source changes, only its downstream steps are rerun: the new active ingredients are
+typed, the plot tables re-aggregated and the charts of that source re-rendered.
+"""
+
+import os
+import json
+import hashlib
+import datetime
+import threading
+import requests
+import pandas as pd
+from typing import Callable, Optional, Union
+from drug_nme.session import ClientManager, get_client_manager
+from drug_nme.concurrency import get_limiter
+from drug_nme.metrics import stage, error
+from drug_nme.diff import diff, update_snapshot
+from drug_nme.fetch import (FDADataFetcher, _find_compilation_url, _read_compilation, _combine_fda_approval_pages,
+                            _process_ligands, _check_agency_input)
+from drug_nme.utils import ligand_url, FDA_LANDING, DRUGS_FDA, HEADERS
+
+__all__ = ["RefreshDaemon"]
+
+SOURCES = ('fda', 'gtop')
+
+
+class RefreshDaemon:
+    def __init__(self, interval: float = 3600, sources: Union[str, list] = SOURCES, landing: str = None,
+                 new_drug_approvals: str = None, ligand: str = None, agency: Union[str, list] = 'FDA',
+                 manager: ClientManager = None, fetcher: FDADataFetcher = None, state_dir: Optional[str] = None):
+        """
+        :param interval: float
+            Seconds between polls.
+        :param sources: Union[str, list]
+            Sources to poll: 'fda', 'gtop' or both.
+        :param landing: str
+            URL of the CDER NME compilation page. If None, it will default to the FDA site.
+        :param new_drug_approvals: str
+            Base URL of the yearly Novel Drug Approvals pages. If None, it will default to the FDA site.
+        :param ligand: str
+            URL of the Guide to Pharmacology approved ligands. If None, it will default to the Guide to Pharmacology
+            API.
+        :param agency: Union[str, list]
+            Agency or list of agencies for the Guide to Pharmacology data.
+        :param manager: ClientManager
+            Manager for the HTTP sessions. If None, the shared default manager is used.
+        :param fetcher: FDADataFetcher
+            Fetcher used to type the new active ingredients, i.e. one with a type_table or chembl_url. If None, a
+            default FDADataFetcher is used.
+        :param state_dir: str
+            Directory for the source snapshots and the change feed (changes.jsonl), so changes are found across
+            restarts. If None, the snapshots are kept in memory.
+        """
+        self.interval = interval
+        self.sources = [sources] if isinstance(sources, str) else list(sources)
+        self.landing = landing or FDA_LANDING
+        self.new_drug_approvals = new_drug_approvals or DRUGS_FDA
+        self.ligand = ligand or ligand_url
+        self.agency = [_check_agency_input(name) for name in ([agency] if isinstance(agency, str) else agency)]
+        self.manager = manager or get_client_manager()
+        self.fetcher = fetcher or FDADataFetcher(manager=self.manager)
+        self.state_dir = state_dir
+
+        # latest table, plot and rendered charts of each source
+        self.data = {}
+        self.plots = {}
+        self.charts = {}
+
+        self._resources = {}  # validators and last body of each polled URL
+        self._compilation = None  # decoded compilation table and the years missing from it
+        self._types = {}  # molecule type of each active ingredient typed so far
+        self._renderers = {}
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def add_chart(self, name: str, source: str, render: Callable):
+        """
+        Register a chart that is re-rendered when its source changes. The result is kept in self.charts[name].
+        :param name: str
+            Name of the chart.
+        :param source: str
+            Source of the chart, 'fda' or 'gtop'.
+        :param render: Callable
+            Function taking the source's plot object (FDAPlot or Plot), i.e. lambda plot: plot.stacked().
+        """
+        self._renderers[name] = (source, render)
+        if source in self.plots:
+            self.charts[name] = render(self.plots[source])
+        return self
+
+    def add_listener(self, callback: Callable):
+        """
+        Register a callback called after a source changed, with a dict holding the 'source', its 'changes'
+        (SnapshotDiff), 'data' and 'plot'.
+        :param callback: Callable
+            Function taking the event dict.
+        """
+        self._listeners.append(callback)
+        return callback
+
+    def poll(self) -> dict:
+        """
+        Poll each source once and rerun the downstream steps of the sources that changed.
+        :return: dict
+            The SnapshotDiff of each changed source.
+        """
+        changed = {}
+        for source in self.sources:
+            try:
+                data = self._poll_fda() if source == 'fda' else self._poll_gtop()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Poll Error ({source}): {e}")
+                error('poll', source, str(e))
+                continue
+            if data is not None:
+                changes = self._refresh(source, data)
+                if changes:
+                    changed[source] = changes
+        return changed
+
+    def run(self, iterations: Optional[int] = None):
+        """
+        Poll every interval until stop() is called.
+        :param iterations: int
+            Number of polls before returning. If None, polls until stopped.
+        """
+        count = 0
+        while not self._stop.is_set():
+            self.poll()
+            count += 1
+            if iterations is not None and count >= iterations:
+                break
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Run the daemon in a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True, name='drug_nme-refresh')
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the daemon after the current poll.
+        :param timeout: float
+            Seconds to wait for the current poll to finish.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    """Support functions"""
+
+    def _poll_fda(self) -> Optional[pd.DataFrame]:
+        """Poll the FDA sources. Returns the rebuilt table if the compilation file or a yearly page changed"""
+        current_year = datetime.date.today().year
+        with stage('poll', 'fda', limiters=(get_limiter('fda'),)) as s:
+            landing, _ = self._get(self.landing, 'fda', s)
+            file_url = _find_compilation_url(landing['body'], current_year, self.landing)
+            if file_url is None:
+                raise ValueError("Compilation file not found")
+
+            compilation, changed = self._get(file_url, 'fda', s)
+            if changed or self._compilation is None:
+                df, missing_years, _ = _read_compilation(compilation['body'], current_year, file_url,
+                                                         self.fetcher.cache_dir)
+                self._compilation = (df, missing_years)
+            df, missing_years = self._compilation
+
+            pages = []
+            for year in missing_years:
+                page, page_changed = self._get(f"{self.new_drug_approvals}-{year}", 'fda', s)
+                pages.append((year, page['status'], page['body'].decode('utf-8', errors='replace')))
+                changed = changed or page_changed
+
+        if not changed and 'fda' in self.data:
+            return None
+
+        df2 = _combine_fda_approval_pages(pages) if pages else None
+        return pd.concat([df2, df], ignore_index=True)
+
+    def _poll_gtop(self) -> Optional[pd.DataFrame]:
+        """Poll the Guide to Pharmacology ligands. Returns the new table if they changed"""
+        with stage('poll', 'gtop', limiters=(get_limiter('gtop'),)) as s:
+            ligands, changed = self._get(self.ligand, 'gtop', s)
+
+        if not changed and 'gtop' in self.data:
+            return None
+
+        with stage('parse', 'gtop') as s:
+            data = _process_ligands(json.loads(ligands['body']), self.agency)
+            s.output(data)
+        return data
+
+    def _get(self, url: str, service: str, s) -> tuple:
+        """
+        Conditional GET of a URL. Returns the cached resource and whether it changed. Servers without validators are
+        compared by a hash of the body.
+        """
+        cached = self._resources.get(url)
+        headers = dict(HEADERS)
+        if cached is not None:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = get_limiter(service).call(self.manager.get, url, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            s.add(not_modified=1)
+            return cached, False
+
+        body = response.content
+        s.add(bytes=len(body))
+        resource = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'),
+                    'status': response.status_code, 'hash': hashlib.sha256(body).hexdigest(), 'body': body}
+        self._resources[url] = resource
+
+        changed = cached is None or (cached['hash'], cached['status']) != (resource['hash'], resource['status'])
+        return resource, changed
+
+    def _refresh(self, source: str, data: pd.DataFrame):
+        """Diff a changed source and rerun its downstream steps"""
+        if self.state_dir is not None:
+            os.makedirs(self.state_dir, exist_ok=True)
+            changes = update_snapshot(data, os.path.join(self.state_dir, f"{source}.parquet"), source=source)
+        else:
+            previous = self.data.get(source, data.iloc[:0])
+            changes = diff(previous.drop(columns='Type', errors='ignore'), data, source=source)
+
+        if not changes and source in self.data:
+            return changes
+
+        if source == 'fda':
+            data = self._add_types(data)
+
+        from drug_nme.plot import Plot, FDAPlot
+        self.data[source] = data
+        self.plots[source] = FDAPlot(data) if source == 'fda' else Plot(data, sort_col=['Year', 'type'])
+        for name, (chart_source, render) in self._renderers.items():
+            if chart_source == source:
+                self.charts[name] = render(self.plots[source])
+
+        if self.state_dir is not None and changes:
+            changes.to_jsonl(os.path.join(self.state_dir, 'changes.jsonl'))
+        for callback in list(self._listeners):
+            callback({'source': source, 'changes': changes, 'data': data, 'plot': self.plots[source]})
+
+        return changes
+
+    def _add_types(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Type the active ingredients not typed before. Failed lookups are retried on the next change"""
+        names = pd.Series(data['Active Ingredient'].dropna().unique())
+        new_names = names[~names.isin(list(self._types))]
+        if len(new_names):
+            typed = self.fetcher.add_types(pd.DataFrame({'Active Ingredient': new_names}))
+            self._types.update({name: molecule_type for name, molecule_type
+                                in zip(typed['Active Ingredient'], typed['Type']) if pd.notna(molecule_type)})
+
+        data = data.copy()
+        data['Type'] = data['Active Ingredient'].map(self._types)
+        return data
@@ -3,3 +3,4 @@ Custom scripts not part of drug_nme. Used to scrape information from PDF for oth
 """
 
 from .scrape import *
+from .batch import *
@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from glob import glob
+from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, Union
+from .scrape import _resolve_pages, _read_page_tables, _format_tables, _unique_columns
+
+__all__ = ["BatchScaper"]
+
+
+class BatchScaper:
+    def __init__(self, directory: str, cache_dir: Optional[str] = None, pattern: str = '*.pdf'):
+        """
+        Scrape tables from a directory of PDFs. Extracted tables are cached by the PDF content, page and extraction
+        settings, so unchanged pages are never parsed twice, whatever page range they are requested with.
+        :param directory: str
+            Directory containing the PDF files. Subdirectories are included.
+        :param cache_dir: Optional[str]
+            Directory for the table cache. If None, it will default to a '.scrape_cache' folder inside the directory.
+        :param pattern: str
+            Glob pattern to match the PDF files.
+        """
+        self.directory = directory
+        self.cache_dir = cache_dir or os.path.join(directory, '.scrape_cache')
+        self.pattern = pattern
+
+    def ingest(self, output: Optional[str] = None, pages: Union[str, list] = 'all', headers: Optional[list] = None,
+               drop_last: bool = False, workers: Optional[int] = None, **kwargs) -> pd.DataFrame:
+        """
+        Scrape all tables from every PDF in the directory. Only (file, page) pairs missing from the cache are parsed,
+        and they are spread over a process pool.
+        :param output: Optional[str]
+            Filepath to save the combined table as a parquet file.
+        :param pages: Union[str, list]
+            Pages to scrape from each PDF. Can be a camelot page string, 'all' or a list of page numbers.
+        :param headers: Optional[list]
+            A list of table headers. If None, the header row of the first table found is used for all tables.
+        :param drop_last: bool
+            Whether to drop the last row of each table.
+        :param workers: Optional[int]
+            Number of worker processes. If None, it will default to the number of CPUs.
+        :param kwargs:
+            Additional keyword arguments passed to camelot.read_pdf (i.e. flavor='stream').
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # tables are keyed by page, so only the page lists depend on the requested pages
+        settings = _settings_key(kwargs)
+        pages_key = _settings_key({'pages': pages})
+        manifest = self._load_manifest()
+
+        # build (file, page) work items
+        items, pending = [], []
+        for pdf in sorted(glob(os.path.join(self.directory, '**', self.pattern), recursive=True)):
+            digest = _file_hash(pdf)
+
+            # page lists are cached too, so unchanged PDFs are not opened at all
+            page_key = f"{digest}_{pages_key}"
+            if page_key not in manifest:
+                manifest[page_key] = _resolve_pages(pdf, pages)
+
+            for page in manifest[page_key]:
+                cache_path = self._cache_path(digest, page, settings)
+                items.append((pdf, page, cache_path))
+                if not os.path.exists(cache_path):
+                    pending.append((pdf, page, cache_path))
+
+        self._save_manifest(manifest)
+
+        # parse missing pages
+        if pending:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                jobs = {executor.submit(_read_page_tables, pdf, page, kwargs): cache_path
+                        for pdf, page, cache_path in pending}
+                for job in tqdm(as_completed(jobs), total=len(jobs), desc='Scraping PDF Pages'):
+                    _atomic_pickle(job.result(), jobs[job])
+
+        # combine tables in (file, page) order
+        frames = []
+        for pdf, page, cache_path in items:
+            df, headers = _format_tables(pd.read_pickle(cache_path), headers, drop_last, page, ('page', 'source'))
+            if df is not None:
+                frames.append(df.assign(source=os.path.relpath(pdf, self.directory)))
+
+        if frames:
+            data = pd.concat(frames, ignore_index=True)
+        else:
+            data = pd.DataFrame(columns=_unique_columns(headers or [], ('page', 'source')))
+
+        if output:
+            data.to_parquet(output, index=False)
+
+        return data
+
+    """Support functions"""
+
+    def _cache_path(self, digest: str, page: int, settings: str):
+        return os.path.join(self.cache_dir, f"{digest}_{page}_{settings}.pkl")
+
+    def _load_manifest(self):
+        path = os.path.join(self.cache_dir, 'manifest.json')
+        if not os.path.exists(path):
+            return {}
+        with open(path) as file:
+            return json.load(file)
+
+    def _save_manifest(self, manifest: dict):
+        path = os.path.join(self.cache_dir, 'manifest.json')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(manifest, file)
+        os.replace(tmp_path, path)
+
+
+def _file_hash(path: str):
+    """Hash the content of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _settings_key(settings: dict):
+    """Hash the extraction settings"""
+    settings = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(settings.encode('utf-8')).hexdigest()[:8]
+
+
+def _atomic_pickle(obj, path: str):
+    """Write to a temporary file first, so an interrupted run never leaves a partial cache entry"""
+    tmp_path = f"{path}.tmp"
+    pd.to_pickle(obj, tmp_path)
+    os.replace(tmp_path, path)
@@ -1,5 +1,8 @@
 import camelot
-from typing import Optional
+import pandas as pd
+from camelot.handlers import PDFHandler
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional, Union
 
 __all__ = ["Scaper"]
 
@@ -39,6 +42,111 @@ class Scaper:
 
         return df
 
+    def iter_pages(self, pages: Union[str, list] = 'all', headers: Optional[list] = None, drop_last: bool = False,
+                   workers: Optional[int] = None, **kwargs) -> Iterator[pd.DataFrame]:
+        """
+        Scrape every table from a range of PDF pages. Pages are spread over a process pool and a DataFrame is yielded
+        for each page, in page order, as soon as it is ready.
+        :param pages: Union[str, list]
+            Pages to scrape. Can be a camelot page string (i.e. '1,3-5' or '2-end'), 'all' or a list of page numbers.
+        :param headers: Optional[list]
+            A list of table headers. If None, the header row of the first table found is used for all pages.
+        :param drop_last: bool
+            Whether to drop the last row of each table.
+        :param workers: Optional[int]
+            Number of worker processes. If None, it will default to the number of CPUs.
+        :param kwargs:
+            Additional keyword arguments passed to camelot.read_pdf (i.e. flavor='stream').
+        """
+        page_list = _resolve_pages(self.pdf, pages)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            jobs = [executor.submit(_read_page_tables, self.pdf, page, kwargs) for page in page_list]
+
+            try:
+                for page, job in zip(page_list, jobs):
+                    df, headers = _format_tables(job.result(), headers, drop_last, page)
+                    if df is not None:
+                        yield df
+            finally:
+                # free queued pages if the caller stops early
+                for job in jobs:
+                    job.cancel()
+
+    def scrape_pages(self, pages: Union[str, list] = 'all', headers: Optional[list] = None, drop_last: bool = False,
+                     workers: Optional[int] = None, **kwargs) -> pd.DataFrame:
+        """
+        Scrape every table from a range of PDF pages into a single table. See iter_pages() for the parameters.
+        """
+        frames = self.iter_pages(pages=pages, headers=headers, drop_last=drop_last, workers=workers, **kwargs)
+
+        try:
+            return pd.concat(frames, ignore_index=True)
+        except ValueError:
+            # no tables found
+            return pd.DataFrame(columns=_unique_columns(headers or [], ('page',)))
+
+
+"""Support functions for the multi-page scraper"""
+
+
+def _resolve_pages(pdf: str, pages: Union[str, list]) -> list:
+    """Expand a camelot page string into a list of page numbers"""
+    if isinstance(pages, (list, tuple, range)):
+        return [int(page) for page in pages]
+    return PDFHandler(pdf, pages=str(pages)).pages
+
+
+def _read_page_tables(pdf: str, page: int, kwargs: dict) -> list:
+    """Read all tables from a single PDF page"""
+    tables = camelot.read_pdf(pdf, pages=str(page), **kwargs)
+    return [table.df for table in tables]
+
+
+def _format_tables(tables: list, headers: Optional[list], drop_last: bool, page: int, reserved: tuple = ('page',)):
+    """
+    Set headers on the raw camelot tables of a page and combine them. If headers is None, the header row of the first
+    table is used. Blank and repeated headers, and headers named like the reserved columns added by the scraper, are
+    renamed. Returns the page table (or None) and the headers, so they can be reused on the following pages.
+    """
+    page_tables = []
+    for df in tables:
+        # first row of each camelot table holds the header strings
+        if headers is None:
+            headers = list(df.iloc[0])
+        if len(df.columns) != len(headers):
+            print(f"Skipping table on page {page}: expected {len(headers)} columns, got {len(df.columns)}")
+            continue
+
+        df = df.iloc[1:]
+        df.columns = _unique_columns(headers, reserved)
+
+        # drop last row
+        if drop_last:
+            df = df.iloc[:-1]
+
+        page_tables.append(df)
+
+    if not page_tables:
+        return None, headers
+    return pd.concat(page_tables, ignore_index=True).assign(page=page), headers
+
+
+def _unique_columns(columns, reserved: tuple = ()) -> list:
+    """
+    Column names with blank headers named by position and repeated or reserved headers numbered, i.e. 'Name', 'Name_2'
+    """
+    names = []
+    for i, col in enumerate(columns):
+        name = str(col).strip() or f"column_{i}"
+        candidate, count = name, 1
+        while candidate in names or candidate in reserved:
+            count += 1
+            candidate = f"{name}_{count}"
+        names.append(candidate)
+    return names
+
+
 if __name__ == "__main__":
     import doctest
 
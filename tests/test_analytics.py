@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+import pandas as pd
+from drug_nme.analytics import approval_counts, clear_cache
+from drug_nme.plot import Plot, FDAPlot
+from drug_nme.schema import apply_schema
+
+
+def _fda_table(n: int = 2000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'Approval Year': rng.integers(1985, 2026, n),
+        'NME/BLA': rng.choice(['NME', 'BLA'], n),
+        'Type': rng.choice(['Small molecule', 'Antibody', 'Protein', None], n),
+    })
+    return apply_schema(data, 'fda')
+
+
+def test_metrics_match_pandas():
+    counts = approval_counts(_fda_table())
+    table = counts.to_frame()
+    types = ['Antibody', 'Protein', 'Small molecule']
+
+    pd.testing.assert_frame_equal(counts.rolling(5).to_frame(), table.rolling(5).mean())
+    pd.testing.assert_frame_equal(counts.cumulative().to_frame(), table.cumsum())
+    pd.testing.assert_frame_equal(counts.change().to_frame(), table.diff())
+    pd.testing.assert_frame_equal(counts.growth().to_frame(), table.pct_change(), check_dtype=False)
+    pd.testing.assert_frame_equal(counts.share().to_frame()[types],
+                                  table[types].div(table[types].sum(axis=1), axis=0))
+
+
+def test_plots_accept_counts():
+    data = _fda_table()
+    pd.testing.assert_frame_equal(FDAPlot(approval_counts(data)).df, FDAPlot(data).df, check_dtype=False)
+
+    gtop = apply_schema(data.rename(columns={'Approval Year': 'Year', 'Type': 'type'}), 'gtop')
+    pd.testing.assert_frame_equal(Plot(approval_counts(gtop)).df, Plot(gtop, sort_col=['Year', 'type']).df,
+                                  check_dtype=False)
+
+
+def test_cache_follows_content():
+    clear_cache()
+    data = _fda_table()
+    assert approval_counts(data) is approval_counts(data.copy())
+
+    changed = data.copy()
+    changed.loc[0, 'NME/BLA'] = 'BLA' if data.loc[0, 'NME/BLA'] == 'NME' else 'NME'
+    assert not np.array_equal(approval_counts(changed).values, approval_counts(data).values)
+
+
+def test_plots_agree_on_gap_years():
+    data = _fda_table()
+    data = data[data['Approval Year'] != 2000].reset_index(drop=True)
+    counts = approval_counts(data)
+    assert 2000 in counts.to_frame().index and 2000 not in counts.to_frame(fill_years=False).index
+
+    pd.testing.assert_frame_equal(FDAPlot(counts).df, FDAPlot(data).df, check_dtype=False)
+    sort_col = ['Approval Year', 'Type']
+    pd.testing.assert_frame_equal(FDAPlot(counts, sort_col=sort_col).df, FDAPlot(data, sort_col=sort_col).df,
+                                  check_dtype=False)
+    with pytest.raises(ValueError, match="sort_col"):
+        FDAPlot(counts, sort_col=['Type', 'NME/BLA'])
@@ -0,0 +1,43 @@
+import os
+import matplotlib
+import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
+from scrape import BatchScaper
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+
+
+def _table_pdf(path: str, n_pages: int, headers: list):
+    """PDF with one bordered table per page"""
+    with PdfPages(path) as pdf:
+        for page in range(n_pages):
+            fig, ax = plt.subplots(figsize=(8.5, 11))
+            ax.axis('off')
+            rows = [[f"drug{page}_{i}", f"ingredient{i}", str(2000 + i)] for i in range(5)]
+            ax.table(cellText=rows, colLabels=headers, loc='center')
+            pdf.savefig(fig)
+            plt.close(fig)
+
+
+def test_batch_scaper(tmp_path):
+    directory = tmp_path / "pdfs"
+    os.makedirs(directory / "sub")
+    _table_pdf(str(directory / "a.pdf"), 2, ['Name', '', 'Name'])
+    _table_pdf(str(directory / "sub" / "b.pdf"), 1, ['Name', '', 'Name'])
+
+    scaper = BatchScaper(str(directory), cache_dir=str(tmp_path / "cache"))
+    output = str(tmp_path / "tables.parquet")
+    data = scaper.ingest(output=output, pages='1', workers=2)
+
+    # blank and repeated headers are renamed, so the table can be saved as parquet
+    assert list(data.columns) == ['Name', 'column_1', 'Name_2', 'page', 'source']
+    assert data['source'].tolist() == ['a.pdf'] * 5 + [os.path.join('sub', 'b.pdf')] * 5
+    pd.testing.assert_frame_equal(pd.read_parquet(output), data)
+
+    # cached pages are reused for a wider page range, only the new page is parsed
+    cached = set(os.listdir(tmp_path / "cache"))
+    data = BatchScaper(str(directory), cache_dir=str(tmp_path / "cache")).ingest(pages='1-end', workers=2)
+    new_entries = [name for name in set(os.listdir(tmp_path / "cache")) - cached if name.endswith('.pkl')]
+    assert len(new_entries) == 1
+    assert data['page'].tolist() == [1] * 5 + [2] * 5 + [1] * 5
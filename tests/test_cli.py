@@ -0,0 +1,32 @@
+import sys
+import json
+import subprocess
+import pandas as pd
+from drug_nme.cli import main
+from drug_nme.standin import StandInServer, make_fixtures
+
+
+def test_cli_fetch_and_plot(tmp_path):
+    fixtures = make_fixtures(str(tmp_path / "fixtures"), n_drugs=50, n_targets=4)
+    with StandInServer(fixtures) as server:
+        urls = server.urls()
+        fda = str(tmp_path / "fda.arrow")
+        status = main(['fetch', 'fda', '-o', fda, '--since', '2015', '--landing', urls['landing'],
+                       '--new-drug-approvals', urls['new_drug_approvals'], '--metrics', str(tmp_path / "m.json")])
+        assert status == 0
+        data = pd.read_feather(fda)
+        assert len(data) and (data['Approval Year'] >= 2015).all()
+        assert {row['stage'] for row in json.load(open(tmp_path / "m.json"))} >= {'download', 'parse'}
+
+        gtop = str(tmp_path / "gtop.csv")
+        assert main(['fetch', 'gtop', '-o', gtop, '--ligand', urls['ligand_url']]) == 0
+        assert not pd.read_csv(gtop).empty
+
+    assert main(['plot', gtop, '-o', str(tmp_path / "gtop.png"), '--kind', 'facet']) == 0
+    assert (tmp_path / "gtop.png").stat().st_size > 0
+
+
+def test_cli_imports_lazily():
+    code = "import sys; from drug_nme.cli import _build_parser; _build_parser(); print('pandas' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False', "The parser should not import pandas"
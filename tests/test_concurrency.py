@@ -0,0 +1,55 @@
+import asyncio
+import httpx
+from drug_nme import concurrency
+from drug_nme.concurrency import AdaptiveLimiter
+
+
+class _Response:
+    def __init__(self, status_code: int, headers: dict = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_additive_increase_multiplicative_decrease():
+    # a large latency factor, so only the responses decide
+    limiter = AdaptiveLimiter(initial=4, max_limit=8, retries=0, latency_factor=1e9)
+    for _ in range(20):
+        limiter.call(lambda: _Response(200))
+    assert limiter.limit == 7, "About one slot should be added per window of successful calls"
+
+    assert limiter.call(lambda: _Response(503)).status_code == 503
+    assert limiter.limit == 3 and limiter.stats()['throttled'] == 1
+
+    for _ in range(100):
+        limiter.call(lambda: _Response(200))
+    assert limiter.limit == 8, "The limit should not pass max_limit"
+
+
+def test_retry_after(monkeypatch):
+    delays = []
+    monkeypatch.setattr(concurrency.time, 'sleep', delays.append)
+    responses = iter([_Response(429, {'Retry-After': '2'}), _Response(503, {'Retry-After': 'soon'}), _Response(200)])
+
+    limiter = AdaptiveLimiter(retries=3, backoff=1.0)
+    assert limiter.call(lambda: next(responses)).status_code == 200
+    assert delays[0] == 2.0, "Retry-After should set the delay"
+    assert 0 <= delays[1] <= 2.0, "An unreadable Retry-After should fall back to jittered backoff"
+    assert limiter.stats()['retries'] == 2
+
+
+def test_async_call_retries_transient_errors(monkeypatch):
+    calls = []
+
+    async def get():
+        calls.append(1)
+        if len(calls) < 3:
+            raise httpx.ConnectError("refused")
+        return _Response(200)
+
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(concurrency.asyncio, 'sleep', no_sleep)
+    limiter = AdaptiveLimiter(retries=3)
+    assert asyncio.run(limiter.acall(get)).status_code == 200
+    assert len(calls) == 3 and limiter.stats()['failures'] == 0
@@ -0,0 +1,22 @@
+import json
+import pandas as pd
+from drug_nme.diff import diff, update_snapshot
+
+
+def test_diff_snapshots(tmp_path):
+    old = pd.DataFrame({'ligandId': [1, 2, 3, 3], 'name': ['a', 'b', 'c', 'c'], 'Year': [2000, 2001, None, 2003]})
+    new = pd.DataFrame({'ligandId': [4, 3, 2, 3], 'name': ['d', 'c', 'B', 'c'], 'Year': [2004, None, 2001, 2003]})
+
+    changes = diff(old, new, source='gtop')
+    assert changes.summary() == {'added': 1, 'removed': 1, 'modified': 1}
+    assert changes.removed['ligandId'].tolist() == [1]
+    assert changes.modified['changed_columns'].tolist() == [['name']]
+    assert set(changes.upserts()['ligandId']) == {2, 4}
+
+    feed = [json.loads(line) for line in changes.to_jsonl().splitlines()]
+    assert [record['change'] for record in feed] == ['added', 'removed', 'modified']
+
+    # a snapshot saved and read back has no changes
+    path = str(tmp_path / 'gtop.parquet')
+    assert len(update_snapshot(new, path, source='gtop')) == 4
+    assert not update_snapshot(new, path, source='gtop')
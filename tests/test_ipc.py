@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from drug_nme.ipc import to_arrow, read_arrow
+from drug_nme.plot import FDAPlot
+from drug_nme.schema import apply_schema
+
+
+def _fda_table(n: int = 1000):
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'Drug Name': rng.choice(['Alpha', 'Beta', 'Gamma'], n),
+        'Active Ingredient': rng.choice(['alphanib', 'betamab', None], n),
+        'Approval Date': pd.to_datetime(rng.integers(0, 10 ** 9, n), unit='s'),
+        'Approval Year': rng.integers(1990, 2025, n),
+        'NME/BLA': rng.choice(['NME', 'BLA'], n),
+    })
+    data = apply_schema(data, 'fda')
+    data.loc[::7, 'Approval Year'] = pd.NA
+    return data
+
+
+def test_round_trip_is_mapped(tmp_path):
+    data = _fda_table()
+    path = to_arrow(data, str(tmp_path / "fda.arrow"))
+
+    loaded = read_arrow(path)
+    pd.testing.assert_frame_equal(loaded, data)
+    pd.testing.assert_frame_equal(pd.read_feather(path), data)
+
+    dates = loaded['Approval Date'].to_numpy()
+    assert isinstance(dates.base, np.ndarray) and not dates.base.flags.owndata, "Dates should be a view of the mapping"
+
+    # copy-on-write: the loaded table can be changed without touching the file
+    loaded.loc[1, 'Approval Year'] = 1900
+    assert read_arrow(path)['Approval Year'].iloc[1] == data['Approval Year'].iloc[1]
+
+
+def test_plot_table_keeps_index(tmp_path):
+    plot = FDAPlot(_fda_table().dropna(subset=['Approval Year']))
+    path = plot.to_arrow(str(tmp_path / "counts.arrow"))
+
+    pd.testing.assert_frame_equal(read_arrow(path), plot.df)
+    assert list(read_arrow(path, columns=['NME']).index) == list(plot.df.index)
@@ -0,0 +1,14 @@
+from drug_nme.matcher import NameMatcher
+
+
+def test_name_matcher_typos():
+    names = ['CLOFARABINE', 'CLOFAZIMINE', 'IBUTILIDE FUMARATE', 'IBUTILIDE', 'IBUPROFEN', 'IMATINIB MESYLATE']
+    matcher = NameMatcher(names, ['Small molecule'] * len(names))
+
+    assert matcher.best('clofarbine')[0] == 'CLOFARABINE'
+    assert matcher.best('ibutilide fumurate')[0] == 'IBUTILIDE FUMARATE'
+    assert matcher.best('pembrolizumab') is None
+
+    matches = matcher.query('clofarbine', k=2)
+    assert [name for name, _, _ in matches] == ['CLOFARABINE', 'CLOFAZIMINE']
+    assert matches[0][2] > matches[1][2]
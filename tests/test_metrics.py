@@ -0,0 +1,15 @@
+from drug_nme.metrics import MemoryProfile, stage
+
+
+def test_nested_stage_keeps_outer_peak():
+    with MemoryProfile() as profile:
+        with stage('clean', 'fda'):
+            block = bytearray(20 * 2 ** 20)
+            del block
+            with stage('parse', 'fda'):
+                small = bytearray(2 ** 20)
+                del small
+
+    peaks = {record['stage']: record['peak_bytes'] for record in profile.records}
+    assert peaks['parse'] < 10 * 2 ** 20
+    assert peaks['clean'] >= 20 * 2 ** 20, "The inner stage should not reset the peak of the outer stage"
@@ -0,0 +1,97 @@
+import pytest
+import threading
+from collections import Counter
+from drug_nme.pipeline import Pipeline
+
+# runs of each stage function
+calls = Counter()
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def _source():
+    calls['a'] += 1
+    return [1, 2, 3]
+
+
+def _double(values):
+    # the output changes on each run
+    calls['b'] += 1
+    return [value * 2 * calls['b'] for value in values]
+
+
+def _total(values):
+    calls['c'] += 1
+    return sum(values)
+
+
+def _other():
+    calls['d'] += 1
+    return 'other'
+
+
+def _counting_pipeline(cache_dir):
+    pipeline = Pipeline(cache_dir=cache_dir)
+    pipeline.add('a', _source).add('b', _double, deps='a').add('c', _total, deps='b').add('d', _other)
+    return pipeline
+
+
+def test_stages_run_when_needed(tmp_path):
+    pipeline = _counting_pipeline(str(tmp_path))
+
+    assert pipeline.run('b') == [2, 4, 6]
+    assert calls == {'a': 1, 'b': 1}, "Only the requested stage and its dependencies should run"
+    assert pipeline.run('c') == 12 and calls == {'a': 1, 'b': 1, 'c': 1}
+
+
+def test_checkpoints_are_reused(tmp_path):
+    assert _counting_pipeline(str(tmp_path)).run('c') == 12
+
+    # a new pipeline on the same directory loads the checkpoints instead of running the stages
+    assert _counting_pipeline(str(tmp_path)).run('c') == 12
+    assert calls == {'a': 1, 'b': 1, 'c': 1}
+
+
+def test_invalidate_reruns_downstream(tmp_path):
+    pipeline = _counting_pipeline(str(tmp_path))
+    pipeline.run('c')
+
+    pipeline.invalidate('b')
+    assert pipeline.run('c') == 24, "The downstream stage should see the new output"
+    assert calls == {'a': 1, 'b': 2, 'c': 2}
+
+
+def test_branches_run_in_parallel(tmp_path):
+    # each branch waits for the other, so running them one after another breaks the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    def branch(label):
+        barrier.wait()
+        return label
+
+    pipeline = Pipeline(cache_dir=str(tmp_path), workers=2)
+    pipeline.add('left', branch, label='left').add('right', branch, label='right')
+    pipeline.add('both', lambda left, right: left + right, deps=['left', 'right'])
+    assert pipeline.run() == 'leftright'
+
+
+def test_captured_variables_are_keyed(tmp_path):
+    def stage_for(factor, offset=0):
+        return lambda: [factor * value + offset for value in range(3)]
+
+    def checkpoints():
+        return sorted(path.suffix for path in tmp_path.glob('scaled-*'))
+
+    assert Pipeline(str(tmp_path)).add('scaled', stage_for(2)).run() == [0, 2, 4]
+    assert Pipeline(str(tmp_path)).add('scaled', stage_for(3)).run() == [0, 3, 6]
+    assert checkpoints() == ['.hash', '.pkl'], "Replaced checkpoints should be removed"
+
+    def shifted(offset=1):
+        return offset
+
+    assert Pipeline(str(tmp_path)).add('default', shifted).run() == 1
+    shifted.__defaults__ = (2,)
+    assert Pipeline(str(tmp_path)).add('default', shifted).run() == 2
@@ -0,0 +1,45 @@
+import os
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+from drug_nme.plot import Plot, FDAPlot
+from drug_nme.schema import apply_schema
+
+matplotlib.use('Agg')
+
+
+def _gtop_table(n: int = 500, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'Year': rng.integers(1990, 2026, n),
+        'type': rng.choice(['Synthetic organic', 'Peptide', 'Antibody'], n),
+        'agency': rng.choice(['FDA', 'EMA'], n),
+    })
+    return apply_schema(data, 'gtop')
+
+
+def test_plot_facet(tmp_path):
+    plot = Plot(_gtop_table(), sort_col=['Year', 'type', 'agency'])
+    savepath = str(tmp_path / 'facet.png')
+    axes = plot.facet(facet='type', groups='agency', palette=['r'], ncols=2, savepath=savepath)
+    assert len(axes) == 3 and os.path.getsize(savepath) > 0
+
+    # palettes shorter than the panels are cycled
+    plot.facet(facet='type', palette=['r', 'b'])
+
+    with pytest.raises(ValueError):
+        plot.facet(data=plot.df.iloc[:0], facet='type')
+
+
+def test_fda_plot_facet(tmp_path):
+    rng = np.random.default_rng(0)
+    data = apply_schema(pd.DataFrame({
+        'Approval Year': rng.integers(1990, 2026, 500),
+        'NME/BLA': rng.choice(['NME', 'BLA'], 500),
+        'Type': rng.choice(['Small molecule', 'Antibody', 'Protein'], 500),
+    }), 'fda')
+    savepath = str(tmp_path / 'fda_facet.png')
+    axes = FDAPlot(data).facet(years=(2000, 2020), palette='viridis', savepath=savepath)
+    assert [ax.get_title() for ax in axes] == list(FDAPlot(data).df.columns)
+    assert os.path.getsize(savepath) > 0
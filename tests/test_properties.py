@@ -0,0 +1,130 @@
+import re
+import numpy as np
+import pandas as pd
+from hypothesis import given, settings, strategies as st
+from drug_nme.fetch import (FDADataFetcher, PharmacologyDataFetcher, _extract_approval_info, _infer_ingredient_type,
+                            _process_ligands)
+from drug_nme.plot import FDAPlot
+from drug_nme.analytics import approval_counts
+from drug_nme.schema import apply_schema
+
+# letters not in any agency name, so generated noise never spells one
+NOISE = st.text(alphabet="bcghijlnopqrstvwxyz ,;", max_size=12)
+AGENCIES = st.sampled_from(['FDA', 'EMA', 'UK'])
+YEARS = st.integers(1900, 2099)
+
+KINASE_STEMS = ['nib', 'tib', 'lib', 'belumosudil', 'sirolimus', 'everolimus', 'midostaurin', 'netarsudil']
+SALTS = [' sulfate', ' chloride', ' hydrochloride', ' sodium', ' potassium', ' mesylate', ' acetate', ' maleate']
+BIOLOGIC_SUFFIXES = ['mab', 'cept', 'cel', 'vec', 'gene', 'ase', 'toxin', 'globulin']
+
+# ingredient names built from drug-like stems, salts and biologic suffixes
+STEMS = st.text(alphabet="abcdefghijklmnopqrstuvwxyz", min_size=1, max_size=8)
+INGREDIENTS = st.builds(lambda stem, end, salt: stem + end + salt, STEMS,
+                        st.sampled_from([''] + KINASE_STEMS + BIOLOGIC_SUFFIXES), st.sampled_from([''] + SALTS))
+TYPES = st.sampled_from(['Small molecule', 'Antibody', 'Protein'])
+
+settings.register_profile('drug_nme', deadline=None, max_examples=60)
+settings.load_profile('drug_nme')
+
+
+def _ligands(names: list, sources: list) -> list:
+    """Guide to Pharmacology ligand records, like the stand-in server's"""
+    return [{'ligandId': i, 'name': name, 'abbreviation': '', 'inn': name, 'type': 'Synthetic organic',
+             'species': None, 'radioactive': False, 'labelled': False, 'approved': True, 'withdrawn': False,
+             'whoEssential': False, 'immuno': False, 'malaria': False, 'antibacterial': False,
+             'approvalSource': source, 'subunitIds': [], 'complexIds': [], 'prodrugIds': [], 'activeDrugIds': []}
+            for i, (name, source) in enumerate(zip(names, sources))]
+
+
+def _in_parts(func, data: pd.DataFrame, cuts: list) -> pd.DataFrame:
+    """Apply a function to consecutive slices of a table and concatenate the results"""
+    bounds = [0] + sorted(cut % (len(data) + 1) for cut in cuts) + [len(data)]
+    parts = [func(data.iloc[start:end].reset_index(drop=True)) for start, end in zip(bounds, bounds[1:])
+             if end > start]
+    return pd.concat(parts, ignore_index=True)
+
+
+@given(prefix=NOISE, agency=AGENCIES, noise=NOISE, year=YEARS, suffix=NOISE)
+def test_extract_approval_info_finds_year(prefix, agency, noise, year, suffix):
+    text = f"{prefix} {agency}{' ' + noise if noise else ''} ({year}){suffix}"
+    assert _extract_approval_info(text, agency) == f"{agency} ({year})"
+
+
+@given(text=st.sampled_from(['', '   ', None, np.nan]), agency=AGENCIES)
+def test_extract_approval_info_empty(text, agency):
+    assert _extract_approval_info(text, agency) is None
+
+
+@given(sources=st.lists(st.one_of(st.just(''), st.builds(lambda agency, year: f"{agency} ({year})", AGENCIES, YEARS),
+                                  st.builds(lambda year: f"FDA ({year}), EMA ({year + 1})", YEARS)), min_size=1,
+                        max_size=40), cuts=st.lists(st.integers(0, 40), max_size=3))
+def test_process_ligands_is_size_independent(sources, cuts):
+    records = pd.DataFrame({'name': [f"drug{i}" for i in range(len(sources))], 'source': sources})
+    process = lambda part: _process_ligands(_ligands(part['name'], part['source']), ['FDA'])
+
+    whole = process(records).reset_index(drop=True)
+    pd.testing.assert_frame_equal(whole.drop(columns='ligandId'), _in_parts(process, records, cuts).drop(
+        columns='ligandId'))
+
+    expected = [_extract_approval_info(source, 'FDA') for source in sources]
+    expected = [int(re.search(r'\d{4}', match).group()) for match in expected if match]
+    assert whole['Year'].tolist() == expected
+
+
+@given(names=st.lists(st.one_of(INGREDIENTS, INGREDIENTS.map(str.upper), INGREDIENTS.map(lambda name: f" {name} ")),
+                      min_size=1, max_size=50), repeat=st.integers(1, 4))
+def test_infer_ingredient_type(names, repeat):
+    # vectorized reference with the same patterns
+    patterns = '|'.join([r'mab(?:\b|-[a-z]{4})', r'cept\b', r'cel\b', r'vec\b', r'gene\b', r'ase(?:\b|-[a-z]{4})',
+                         r'toxin\b', r'globulin\b'])
+    reference = np.where(pd.Series(names).str.lower().str.strip().str.contains(patterns, regex=True), 'BLA', 'NME')
+
+    inferred = pd.Series(names * repeat).apply(_infer_ingredient_type)
+    assert inferred.tolist() == reference.tolist() * repeat
+    assert all(_infer_ingredient_type(f"{name}mab") == 'BLA' for name in names)
+
+
+@given(names=st.lists(st.one_of(INGREDIENTS, st.none()), min_size=1, max_size=50),
+       types=st.lists(TYPES, min_size=50, max_size=50), cuts=st.lists(st.integers(0, 50), max_size=3))
+def test_fda_kinase_label(names, types, cuts):
+    data = pd.DataFrame({'Active Ingredient': pd.Series(names, dtype=object), 'Type': types[:len(names)]})
+    label = lambda part: FDADataFetcher().make_kinase_label(part.copy())
+
+    labeled = label(data)
+    pattern = r"(?:" + "|".join(KINASE_STEMS) + r")(?:$|" + "|".join(SALTS) + r")$"
+    is_kinase = [isinstance(name, str) and re.search(pattern, name) is not None for name in names]
+    assert labeled['Type'].tolist() == ['Kinase' if kinase else old for kinase, old in zip(is_kinase, data['Type'])]
+    pd.testing.assert_frame_equal(labeled, _in_parts(label, data, cuts))
+
+
+@given(names=st.lists(INGREDIENTS, min_size=1, max_size=50), cuts=st.lists(st.integers(0, 50), max_size=3))
+def test_gtop_kinase_label(names, cuts):
+    data = pd.DataFrame({'name': names, 'type': 'Synthetic organic'})
+    label = lambda part: PharmacologyDataFetcher().make_kinase_label(part.copy())
+
+    labeled = label(data)
+    expected = np.where(data['name'].str.endswith(tuple(KINASE_STEMS)), 'Kinase', 'Synthetic organic')
+    assert labeled['type'].tolist() == expected.tolist()
+    pd.testing.assert_frame_equal(labeled, _in_parts(label, data, cuts))
+
+
+@given(rows=st.lists(st.tuples(st.integers(1985, 2025), st.sampled_from(['NME', 'BLA']), TYPES), min_size=1,
+                     max_size=80), cut=st.integers(0, 80))
+def test_fda_plot_aggregation_is_additive(rows, cut):
+    data = apply_schema(pd.DataFrame(rows, columns=['Approval Year', 'NME/BLA', 'Type']), 'fda')
+    cut = cut % (len(data) + 1)
+    head, tail = data.iloc[:cut], data.iloc[cut:]
+
+    whole = FDAPlot(data).df
+    parts = [FDAPlot(part).df for part in (head, tail) if len(part)]
+    combined = parts[0] if len(parts) == 1 else parts[0].add(parts[1], fill_value=0).fillna(0).astype(int)
+    pd.testing.assert_frame_equal(whole.sort_index(axis=1), combined.sort_index(axis=1), check_dtype=False,
+                                  check_index_type=False)
+
+    # each approval is counted once as NME or BLA
+    counts = data['Approval Year'].value_counts().sort_index()
+    assert whole.reindex(columns=['BLA', 'NME'], fill_value=0).sum(axis=1).tolist() == counts.tolist()
+
+    # the bincount aggregation gives the same table, with zeros for years without approvals
+    dense = approval_counts(data, use_cache=False).to_frame()
+    pd.testing.assert_frame_equal(dense.loc[whole.index, whole.columns], whole, check_dtype=False)
@@ -0,0 +1,41 @@
+import pandas as pd
+from drug_nme.resolve import EntityIndex
+
+
+def test_entity_index(tmp_path):
+    path = str(tmp_path / "entities.db")
+    gtop = pd.DataFrame({'name': ['imatinib', 'adalimumab', 'cotrimoxazole'], 'ligandId': [5687, 4789, 10]})
+    fda = pd.DataFrame({'Active Ingredient': ['Imatinib Mesylate', 'adalimumab-atto', 'co-trimoxazole', 'novelnib']})
+
+    with EntityIndex(path) as index:
+        index.add_gtop(gtop)
+        mapping = index.add_fda(fda)
+        assert mapping['method'].tolist() == ['clean', 'clean', 'compact', 'new']
+        assert mapping['entity_id'].iloc[:3].tolist() == index.resolve(gtop['name'])['entity_id'].tolist()
+        assert index.add_fda(fda).empty, "Names already added should be skipped"
+
+        index.add_synonyms({'Gleevec': 'imatinib'})
+        resolved = index.resolve(pd.Series(['GLEEVEC', 'imatinb', 'unrelated']))
+        assert resolved['method'].tolist()[:2] == ['synonym', 'fuzzy']
+        assert pd.isna(resolved['entity_id'].iloc[2])
+
+    with EntityIndex(path) as index:
+        merged = index.merge(fda, gtop, 'Active Ingredient', 'name')
+        assert sorted(merged['ligandId']) == [10, 4789, 5687]
+
+
+def test_merge_keeps_unresolved_rows(tmp_path):
+    gtop = pd.DataFrame({'name': ['imatinib', 'adalimumab', 'zzunknown'], 'ligandId': [5687, 4789, 1]})
+    fda = pd.DataFrame({'Active Ingredient': ['Imatinib Mesylate', 'unheardofmab', 'adalimumab-atto']})
+
+    with EntityIndex(str(tmp_path / "entities.db")) as index:
+        index.add_gtop(gtop.iloc[:2])
+        merged = index.merge(fda, gtop, 'Active Ingredient', 'name', how='left', fuzzy=False)
+        assert merged['Active Ingredient'].tolist() == fda['Active Ingredient'].tolist()
+        assert merged['ligandId'].tolist()[::2] == [5687, 4789] and pd.isna(merged['ligandId'].iloc[1])
+        assert merged['entity_id'].dtype == 'Int64' and merged['entity_id'].isna().tolist() == [False, True, False]
+
+        # unresolved rows of both tables are kept, and not matched with each other
+        outer = index.merge(fda, gtop, 'Active Ingredient', 'name', how='outer', fuzzy=False)
+        assert len(outer) == 4 and outer['entity_id'].isna().sum() == 2
+        assert len(index.merge(fda, gtop, 'Active Ingredient', 'name', fuzzy=False)) == 2
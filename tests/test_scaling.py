@@ -0,0 +1,37 @@
+import os
+import gc
+import time
+import pytest
+from benchmarks.run import BENCHMARKS, scaling
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+# paths that handle one row at a time in Python. They take minutes at 1M rows, so they are only run up to 100k rows
+# unless DRUG_NME_FULL_SCALING=1
+ROW_BY_ROW = ['extract_approval_info', 'infer_ingredient_type', 'gtop_kinase_label']
+
+# growth exponent of the runtime. 1 is linear, 2 quadratic
+MAX_EXPONENT = 1.3
+
+
+def _best_time(func, budget: float = 1.0, repeat: int = 3) -> float:
+    """Best of up to repeat runs, stopping once the runs took budget seconds"""
+    times = []
+    while len(times) < repeat and sum(times) < budget:
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@pytest.mark.parametrize('name', ['extract_approval_info', 'infer_ingredient_type', 'fda_kinase_label',
+                                  'gtop_kinase_label', 'fda_plot_aggregate', 'approval_counts'])
+def test_near_linear_scaling(name):
+    sizes = SIZES
+    if name in ROW_BY_ROW and os.environ.get('DRUG_NME_FULL_SCALING') != '1':
+        sizes = SIZES[:2]
+
+    results = {name: {str(n): {'time': _best_time(BENCHMARKS[name](n))} for n in sizes}}
+    exponent = scaling(results)[name]
+    assert exponent < MAX_EXPONENT, f"{name} runtime grows as n^{exponent:.2f} from {sizes[0]} to {sizes[-1]} rows"
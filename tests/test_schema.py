@@ -0,0 +1,24 @@
+import datetime
+import pandas as pd
+from drug_nme.schema import apply_schema, parse_dates
+
+
+def test_parse_dates_formats():
+    dates = pd.Series(['1/5/2024', ' 01/05/2024', '2024-02-03', 'March 4, 2020', datetime.datetime(2020, 1, 1), None,
+                       'not a date'], dtype=object)
+    parsed = parse_dates(dates)
+
+    assert parsed.dtype == 'datetime64[ns]'
+    assert parsed[:5].tolist() == [pd.Timestamp('2024-01-05'), pd.Timestamp('2024-01-05'), pd.Timestamp('2024-02-03'),
+                                   pd.Timestamp('2020-03-04'), pd.Timestamp('2020-01-01')]
+    assert parsed[5:].isna().all()
+
+
+def test_sources_share_dtypes():
+    fda = apply_schema(pd.DataFrame({'Active Ingredient': ['a', None], 'Approval Year': [2020.0, None]}), 'fda')
+    gtop = apply_schema(pd.DataFrame({'name': ['b', 'c'], 'Year': ['2019', '2021']}), 'gtop')
+    chembl = apply_schema(pd.DataFrame({'Name': ['d'], 'Year': [2018]}), 'chembl')
+
+    assert fda['Approval Year'].dtype == gtop['Year'].dtype == chembl['Year'].dtype == 'Int64'
+    assert fda['Active Ingredient'].dtype == gtop['name'].dtype == chembl['Name'].dtype
+    assert fda['Active Ingredient'].isna().tolist() == [False, True], "Missing names should stay missing"
@@ -0,0 +1,48 @@
+import matplotlib
+import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
+from benchmarks.generators import camelot_tables
+from scrape import Scaper
+from scrape.scrape import _format_tables
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+
+
+def test_format_tables():
+    tables = camelot_tables(120, rows_per_table=50)
+    mismatched = pd.DataFrame([['Drug Name', 'Year'], ['drug', '2001']])
+
+    df, headers = _format_tables(tables + [mismatched], None, False, 3)
+    assert headers == ['Drug Name', 'Active Ingredient', 'Year']
+    assert list(df.columns) == headers + ['page'], "The table with a different width should be skipped"
+    assert len(df) == 120 and (df['page'] == 3).all()
+
+    df, _ = _format_tables(tables, headers, True, 3)
+    assert len(df) == 117
+
+    # blank, repeated and reserved headers are renamed, so the page number does not overwrite a column of the PDF
+    raw = pd.DataFrame([['Name', ' ', 'Name', 'page'], ['a', 'b', 'c', '12']])
+    df, _ = _format_tables([raw], None, False, 1)
+    assert list(df.columns) == ['Name', 'column_1', 'Name_2', 'page_2', 'page']
+    assert df[['page_2', 'page']].values.tolist() == [['12', 1]]
+
+
+def test_iter_pages(tmp_path):
+    path = str(tmp_path / "tables.pdf")
+    with PdfPages(path) as pdf:
+        for page in range(2):
+            fig, ax = plt.subplots(figsize=(8.5, 11))
+            ax.axis('off')
+            rows = [[f"drug{page}_{i}", f"ingredient{i}", str(page * 100 + i)] for i in range(5)]
+            ax.table(cellText=rows, colLabels=['Name', '', 'page'], loc='center')
+            pdf.savefig(fig)
+            plt.close(fig)
+
+    frames = list(Scaper(path).iter_pages(pages='1-end', workers=2))
+    assert [frame['page'].unique().tolist() for frame in frames] == [[1], [2]]
+
+    data = Scaper(path).scrape_pages(pages=[1, 2], workers=2)
+    assert list(data.columns) == ['Name', 'column_1', 'page_2', 'page']
+    assert data['page_2'].tolist() == [str(i) for i in [0, 1, 2, 3, 4, 100, 101, 102, 103, 104]]
+    assert list(Scaper(path).scrape_pages(pages=[], headers=['Name', 'page']).columns) == ['Name', 'page_2']
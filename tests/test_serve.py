@@ -0,0 +1,49 @@
+import urllib.request
+import urllib.error
+from benchmarks.generators import fda_frame, gtop_frame
+from drug_nme.serve import ChartServer
+
+
+def _get(url: str, headers: dict = None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_charts_are_cached():
+    with ChartServer({'fda': fda_frame(2000), 'gtop': gtop_frame(2000)}, workers=1) as server:
+        query = f"{server.url}/chart?source=gtop&kind=bar&years=2010-2020&groups=Peptide,Antibody&format=svg"
+        status, headers, body = _get(query)
+        assert status == 200 and headers['Content-Type'] == 'image/svg+xml' and body.startswith(b'<?xml')
+
+        assert _get(query)[2] == body
+        assert _get(query, {'If-None-Match': headers['ETag']})[0] == 304
+        assert server.stats()['renders'] == 1 and server.stats()['hits'] == 2
+
+        # a new table drops the cached charts of its source
+        server.update('gtop', gtop_frame(2000, seed=1))
+        status, new_headers, _ = _get(query, {'If-None-Match': headers['ETag']})
+        assert status == 200 and new_headers['ETag'] != headers['ETag']
+
+
+def test_invalid_parameters():
+    with ChartServer({'fda': fda_frame(500)}, workers=0) as server:
+        for query in ['source=gtop', 'kind=bar', 'years=20', 'groups=Peptide', 'metric=median', 'format=gif',
+                      'years=1800-1801']:
+            assert _get(f"{server.url}/chart?{query}")[0] == 400
+        assert _get(f"{server.url}/table?years=1800-1801")[0] == 400
+
+        status, _, body = _get(f"{server.url}/table?metric=share&years=2020-2020&format=csv")
+        assert status == 200 and body.startswith(b'Approval Year,BLA,NME')
+
+
+def test_palette_shorter_than_groups():
+    with ChartServer({'fda': fda_frame(500), 'gtop': gtop_frame(500)}, workers=0) as server:
+        for query in ['source=gtop&kind=facet&groups=Peptide,Antibody,Inorganic&palette=red',
+                      'source=gtop&kind=stacked&groups=Peptide,Antibody,Inorganic&palette=red,blue',
+                      'source=fda&kind=facet&palette=red,blue']:
+            status, headers, _ = _get(f"{server.url}/chart?{query}")
+            assert status == 200 and headers['Content-Type'] == 'image/png'
@@ -0,0 +1,46 @@
+import sys
+import types
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from drug_nme import Target
+from drug_nme.session import ClientManager
+from drug_nme.standin import StandInServer, make_fixtures
+
+
+def test_pool_grows_to_workers(tmp_path, caplog):
+    fixtures = make_fixtures(str(tmp_path), n_drugs=10, n_targets=1)
+    manager = ClientManager(pool_size=2)
+    manager.session()
+    Target(manager=manager, max_workers=8)
+    assert manager.pool_size == 8
+
+    with StandInServer(fixtures, latency=0.05) as standin:
+        url = standin.urls()['landing']
+        with caplog.at_level(logging.WARNING, logger='urllib3.connectionpool'):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                for _ in range(3):
+                    assert all(response.status_code == 200 for response in executor.map(manager.get, [url] * 8))
+
+    assert 'Connection pool is full' not in caplog.text
+    stats = manager.stats()
+    assert stats['requests'] == 24 and stats['connections'] <= 8
+    assert stats['reused'] == stats['requests'] - stats['connections']
+
+
+def test_chembl_clients_per_thread(monkeypatch):
+    # stand-in for the ChEMBL client module, which downloads its schema on import
+    module = types.ModuleType('chembl_webresource_client.new_client')
+    module.new_client = types.SimpleNamespace(molecule=object())
+    monkeypatch.setitem(sys.modules, 'chembl_webresource_client.new_client', module)
+
+    manager = ClientManager()
+    main = manager.chembl('molecule')
+    assert manager.chembl('molecule') is main
+
+    clients = []
+    thread = threading.Thread(target=lambda: clients.extend([manager.chembl('molecule'), manager.chembl('molecule')]))
+    thread.start()
+    thread.join()
+    assert clients[0] is clients[1] and clients[0] is not main
+    assert manager.stats()['chembl_clients'] == 2
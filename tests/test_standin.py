@@ -0,0 +1,268 @@
+import pytest
+import pandas as pd
+from drug_nme import FDADataFetcher, PharmacologyDataFetcher, Target, _ChemblDataFetcher
+from drug_nme.standin import StandInServer, make_fixtures
+from drug_nme.session import ClientManager
+
+
+@pytest.fixture(scope="module")
+def fixtures(tmp_path_factory):
+    return make_fixtures(str(tmp_path_factory.mktemp("fixtures")), n_drugs=50, n_targets=4)
+
+
+@pytest.fixture
+def server(fixtures):
+    with StandInServer(fixtures) as standin:
+        yield standin
+
+
+def test_fda_fetcher(server):
+    urls = server.urls()
+    fetcher = FDADataFetcher(manager=ClientManager(), landing=urls['landing'],
+                             new_drug_approvals=urls['new_drug_approvals'], chembl_url=urls['chembl_url'])
+    df = fetcher.get_data()
+
+    assert len(df) == 60, "FDA stand-in should give 50 compilation rows and 10 yearly rows"
+    assert 'Active Ingredient' in df.columns
+
+    typed = fetcher.add_types(df)
+    assert typed['Type'].notna().all()
+    assert set(typed['Type']) <= {'Small molecule', 'Antibody', 'Protein'}, "Names should resolve after cleaning"
+
+
+def test_gtp_fetcher(server):
+    data = PharmacologyDataFetcher(url=server.urls()['ligand_url'], manager=ClientManager()).get_data()
+
+    assert isinstance(data, pd.DataFrame)
+    assert not data.empty
+    assert data['Year'].dtype.kind == 'i'
+
+
+def test_target(server):
+    urls = server.urls()
+    ids = [f"P{i:05d}" for i in range(4)]
+    data = Target(ids, manager=ClientManager(), gtop_url=urls['gtop_url'], uniprot_url=urls['uniprot_url']).get_data()
+
+    assert len(data) == 8
+    assert list(data['protein_target'].unique()) == ['GENE0', 'GENE1', 'GENE2', 'GENE3'], "Missing names use UniProt"
+
+
+def test_chembl_fetcher(server):
+    fetcher = _ChemblDataFetcher(manager=ClientManager(), chembl_url=server.urls()['chembl_url'])
+    data = fetcher.get_approved_drugs()
+
+    # withdrawn drugs (every 7th) and types outside the CDER ones are dropped
+    kept = [i for i in range(50) if i % 7 != 6]
+    assert data['ChEMBL_ID'].tolist() == [f"CHEMBL{i}" for i in kept]
+    assert data['Name'].str.isupper().all() and data['Name'].str.len().gt(0).all()
+    span = data['Year'].max() - 1984
+    assert data['Year'].dtype == 'Int64' and data['Year'].tolist() == [1985 + i % span for i in kept]
+    types = dict(zip(data['Name'], data['Type']))
+    assert {types[name] for name in types if name.endswith('MAB')} == {'Antibody'}
+    assert set(data['Type']) == {'Small molecule', 'Antibody', 'Protein'}
+
+    year = fetcher.get_approved_drugs(1986)
+    assert year['ChEMBL_ID'].tolist() == ['CHEMBL1', 'CHEMBL42'] and (year['Year'] == 1986).all()
+
+
+def test_injected_errors_are_retried(fixtures):
+    with StandInServer(fixtures, error_rate=0.3, seed=1) as standin:
+        urls = standin.urls()
+        data = Target([f"P{i:05d}" for i in range(4)], manager=ClientManager(), gtop_url=urls['gtop_url'],
+                      uniprot_url=urls['uniprot_url']).get_data()
+
+    assert len(data) == 8, "Injected 503 errors should be retried"
+
+
+def test_async_types_match_sync(server, fixtures, monkeypatch):
+    import asyncio
+    from drug_nme import concurrency
+
+    urls = server.urls()
+    fetcher = FDADataFetcher(manager=ClientManager(), landing=urls['landing'],
+                             new_drug_approvals=urls['new_drug_approvals'], chembl_url=urls['chembl_url'])
+    data = fetcher.get_data().head(10)
+    typed = asyncio.run(fetcher.aadd_types(data))
+    assert typed['Type'].tolist() == fetcher.add_types(data)['Type'].tolist()
+
+    # lookups failing after the retries are left empty, not labelled with the error
+    monkeypatch.setitem(concurrency._limiters, 'chembl', concurrency.AdaptiveLimiter('chembl', retries=1, backoff=0))
+    with StandInServer(fixtures, error_rate=1.0) as failing:
+        fetcher.chembl_url = failing.urls()['chembl_url']
+        names = pd.DataFrame({'Active Ingredient': ['imatinib', 'adalimumab']})
+        typed = asyncio.run(fetcher.aadd_types(names))
+    assert typed['Type'].isna().all()
+    assert concurrency._limiters['chembl'].stats()['retries'] == 2
+
+
+def test_stage_metrics(server):
+    from drug_nme.metrics import Metrics
+
+    urls = server.urls()
+    with Metrics() as metrics:
+        PharmacologyDataFetcher(url=urls['ligand_url'], manager=ClientManager()).get_data()
+
+    totals = {(row['stage'], row['source']): row for row in metrics.to_dict()}
+    assert totals['download', 'gtop']['bytes'] > 0
+    assert totals['parse', 'gtop']['rows_in'] >= totals['parse', 'gtop']['rows_out'] > 0
+    assert 'drug_nme_seconds_total{stage="parse",source="gtop"}' in metrics.to_prometheus()
+
+
+def test_profile_memory(server):
+    data, profile = PharmacologyDataFetcher(url=server.urls()['ligand_url'],
+                                            manager=ClientManager()).get_data(profile_memory=True)
+
+    assert not data.empty
+    assert {'json_df', 'concat', 'processed_copy'} <= set(profile['checkpoint'].dropna())
+    assert (profile['peak_mb'] >= profile['traced_mb']).all()
+
+
+def test_offline_name_matcher(server, tmp_path):
+    from drug_nme.matcher import NameMatcher, cache_chembl_names
+
+    urls = server.urls()
+    names = cache_chembl_names(str(tmp_path / "chembl_names.parquet"), manager=ClientManager(),
+                               chembl_url=urls['chembl_url'])
+    matcher = NameMatcher.load(str(tmp_path / "chembl_names.parquet"))
+    assert len(matcher) == len(names) > 0
+
+    # drop a letter from each name, so the ChEMBL lookup finds nothing
+    expected = names.drop_duplicates('chembl_id').head(5)
+    typos = pd.DataFrame({'Active Ingredient': [name[:3] + name[4:] for name in expected['name'].str.lower()]})
+    fetcher = FDADataFetcher(manager=ClientManager(), chembl_url=urls['chembl_url'], matcher=matcher)
+    typed = fetcher.add_types(typos)
+    assert typed['Type'].tolist() == expected['molecule_type'].tolist()
+    assert matcher.query(typos['Active Ingredient'][0], k=1)[0][0] == expected['name'].iloc[0]
+
+
+def test_compilation_cache(server, tmp_path):
+    from drug_nme.metrics import Metrics
+
+    urls = server.urls()
+    fetcher = FDADataFetcher(manager=ClientManager(), landing=urls['landing'],
+                             new_drug_approvals=urls['new_drug_approvals'], cache_dir=str(tmp_path))
+    first = fetcher.get_data()
+    with Metrics() as metrics:
+        second = fetcher.get_data()
+
+    pd.testing.assert_frame_equal(first, second)
+    assert len(list(tmp_path.glob('cder-*.parquet'))) == 1
+    totals = {(row['stage'], row['source']): row for row in metrics.to_dict()}
+    assert totals['parse', 'fda']['cache_hits'] == 1, "The second decode should be read from the cache"
+
+
+def test_refresh_daemon(tmp_path):
+    import datetime
+    from drug_nme.metrics import Metrics
+    from drug_nme.watch import RefreshDaemon
+
+    fixtures = make_fixtures(str(tmp_path / "fixtures"), n_drugs=50, n_targets=1)
+    with StandInServer(fixtures) as standin:
+        urls = standin.urls()
+        manager = ClientManager()
+        daemon = RefreshDaemon(landing=urls['landing'], new_drug_approvals=urls['new_drug_approvals'],
+                               ligand=urls['ligand_url'], manager=manager,
+                               fetcher=FDADataFetcher(manager=manager, chembl_url=urls['chembl_url']))
+        assert set(daemon.poll()) == {'fda', 'gtop'}
+
+        # unchanged sources are answered with 304 and nothing is recomputed
+        with Metrics() as metrics:
+            assert daemon.poll() == {}
+        totals = {(row['stage'], row['source']): row for row in metrics.to_dict()}
+        assert totals['poll', 'fda']['not_modified'] + totals['poll', 'gtop']['not_modified'] == 4
+        assert ('types', 'chembl') not in totals
+
+        # a new approval on the yearly page is typed on its own
+        page_url = f"{urls['new_drug_approvals']}-{datetime.date.today().year}"
+        row = '<tr><td>11</td><td><a href="/drug/x">NEWDRUG</a></td><td>newdrugmab</td><td>1/2/2024</td><td>x</td></tr>'
+        page = daemon._resources[page_url]['body'].decode().replace('</table>', f'{row}</table>')
+        standin.update(page_url.replace(standin.url, ''), page)
+        with Metrics() as metrics:
+            changes = daemon.poll()
+
+        assert list(changes) == ['fda'] and changes['fda'].summary()['added'] == 1
+        assert {row['stage']: row for row in metrics.to_dict()}['types']['rows_in'] == 1
+        assert daemon.data['fda']['Type'].notna().all(), "Earlier types should be reused for the unchanged rows"
+
+
+def _fetch_gtop(url, cache_dir):
+    from drug_nme.cache import DiskCache
+    return len(PharmacologyDataFetcher(url=url, manager=ClientManager(), cache=DiskCache(cache_dir)).get_data())
+
+
+def test_shared_cache_single_flight(fixtures, tmp_path):
+    from concurrent.futures import ProcessPoolExecutor
+
+    with StandInServer(fixtures, latency=0.2) as standin:
+        url = standin.urls()['ligand_url']
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            sizes = list(executor.map(_fetch_gtop, [url] * 4, [str(tmp_path)] * 4))
+
+        assert len(set(sizes)) == 1
+        assert standin.requests == 1, "Only one worker should download the shared file"
+
+
+def test_cached_missing_type(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from drug_nme import cache, fetch
+
+    calls = []
+    monkeypatch.setattr(fetch, '_query_chembl_type_rest', lambda *args: calls.append(args) or None)
+    fetcher = FDADataFetcher(manager=ClientManager(), chembl_url='http://127.0.0.1:1',
+                             cache=cache.DiskCache(str(tmp_path)))
+    assert fetcher._query_chembl('nulltype') is None
+    assert fetcher._query_chembl('nulltype') is None and len(calls) == 1, "A missing type should be cached"
+
+    # the per-path thread locks are dropped once no thread uses them
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(fetcher._query_chembl, [f"name{i}" for i in range(50)]))
+    assert cache._thread_locks == {}
+
+
+def test_async_fda_fetcher(fixtures, tmp_path):
+    import asyncio
+    from drug_nme.cache import DiskCache
+    from drug_nme.aio import aclose_async_client
+
+    async def aget_data(fetcher):
+        try:
+            return await fetcher.aget_data()
+        finally:
+            await aclose_async_client()
+
+    with StandInServer(fixtures, error_rate=0.3, seed=2) as standin:
+        urls = standin.urls()
+        fetcher = FDADataFetcher(manager=ClientManager(), landing=urls['landing'],
+                                 new_drug_approvals=urls['new_drug_approvals'], cache=DiskCache(str(tmp_path)))
+        data = asyncio.run(aget_data(fetcher))
+        pd.testing.assert_frame_equal(data, fetcher.get_data(), obj="Injected 503 errors should be retried")
+
+        # the async path shares the disk cache with the sync one
+        requests = standin.requests
+        pd.testing.assert_frame_equal(asyncio.run(aget_data(fetcher)), data)
+        assert standin.requests == requests
+
+
+def test_async_target(fixtures, tmp_path):
+    import asyncio
+    from drug_nme.cache import DiskCache
+    from drug_nme.aio import aclose_async_client
+
+    async def aget_data(target):
+        try:
+            return await target.aget_data(max_concurrency=2)
+        finally:
+            await aclose_async_client()
+
+    ids = [f"P{i:05d}" for i in range(4)]
+    with StandInServer(fixtures, error_rate=0.3, seed=1) as standin:
+        urls = standin.urls()
+        target = Target(ids, manager=ClientManager(), gtop_url=urls['gtop_url'], uniprot_url=urls['uniprot_url'],
+                        cache=DiskCache(str(tmp_path)))
+        data = asyncio.run(aget_data(target))
+        assert len(data) == 8, "Injected 503 errors should be retried"
+        assert list(data['protein_target'].unique()) == ['GENE0', 'GENE1', 'GENE2', 'GENE3']
+
+        requests = standin.requests
+        pd.testing.assert_frame_equal(target.get_data(), data)
+        assert standin.requests == requests, "The sync path should read the responses cached by the async one"
@@ -0,0 +1,54 @@
+import pytest
+import pandas as pd
+from drug_nme.store import DrugStore
+
+
+def make_fda():
+    return pd.DataFrame({
+        'Drug Name': ['ALPHA', 'BETA', 'GAMMA'],
+        'Active Ingredient': ['alphanib hydrochloride', 'betamab-abcd', 'gammavir'],
+        'Approval Date': ['01/02/2020', '03/04/2020', '05/06/2021'],
+        'Approval Year': [2020, 2020, 2021],
+        'NME/BLA': ['NME', 'BLA', 'NME'],
+        'Type': ['Small molecule', 'Antibody', 'Small molecule'],
+    })
+
+
+def make_gtop():
+    return pd.DataFrame({
+        'ligandId': [1, 2], 'name': ['alphanib', 'deltacept'], 'type': ['Synthetic organic', 'Peptide'],
+        'approved': [True, True], 'withdrawn': [False, False], 'whoEssential': [False, False],
+        'FDA': ['FDA ', 'FDA '], 'Year': [2020, 2019],
+    })
+
+
+def test_store_views_and_lookup(tmp_path):
+    path = str(tmp_path / "drugs.db")
+    with DrugStore(path) as store:
+        store.add_fda(make_fda())
+        store.add_gtop(make_gtop())
+        store.add_gtop(make_gtop())  # replaces, does not duplicate
+
+        counts = store.view('approvals_per_year_by_type', source='fda')
+        assert counts.set_index(['year', 'type'])['count'].to_dict() == {
+            (2020, 'Antibody'): 1, (2020, 'Small molecule'): 1, (2021, 'Small molecule'): 1}
+
+        found = store.lookup('Alphanib Hydrochloride')
+        assert sorted(found['source']) == ['fda', 'gtop'], "Names should match across sources after normalizing"
+
+    with DrugStore(path) as store:
+        assert store.query("SELECT COUNT(*) AS n FROM gtop_approvals")['n'][0] == 2
+        assert store.query("SELECT approval_date FROM fda_approvals WHERE year = ?", (2021,))['approval_date'][0] == \
+            '2021-05-06'
+
+
+def test_view_rejects_unknown_names(tmp_path):
+    with DrugStore(str(tmp_path / "drugs.db")) as store:
+        store.add_fda(make_fda())
+        with pytest.raises(ValueError, match="Unknown column"):
+            store.view('approvals', **{"1 = 1 OR source": 'x'})
+        with pytest.raises(ValueError, match="Unknown view"):
+            store.view('approvals; DROP TABLE fda_approvals')
+
+        assert len(store.view('approvals', source='fda', year=2020)) == 2
+        assert 'fda_approvals' in store.tables()
@@ -0,0 +1,33 @@
+import sqlite3
+import pandas as pd
+from drug_nme.fetch import FDADataFetcher
+from drug_nme.typetable import MoleculeTypeTable
+
+
+def test_type_table_from_dump(tmp_path):
+    dump = str(tmp_path / 'chembl.db')
+    with sqlite3.connect(dump) as conn:
+        conn.execute("CREATE TABLE molecule_dictionary (molregno INTEGER, pref_name TEXT, molecule_type TEXT)")
+        conn.execute("CREATE TABLE molecule_synonyms (molregno INTEGER, synonyms TEXT)")
+        conn.executemany("INSERT INTO molecule_dictionary VALUES (?, ?, ?)",
+                         [(1, 'PEMBROLIZUMAB', 'Antibody'), (2, 'IMATINIB', 'Small molecule'),
+                          (3, 'MK-3475', 'Protein')])
+        conn.executemany("INSERT INTO molecule_synonyms VALUES (?, ?)",
+                         [(1, 'Keytruda'), (1, 'MK-3475'), (2, 'Gleevec')])
+
+    table = MoleculeTypeTable.build(dump, str(tmp_path / 'types'))
+    assert len(table) == 5
+
+    # loading memory-maps the saved arrays
+    table = MoleculeTypeTable(str(tmp_path / 'types'))
+    assert table.get('keytruda') == 'Antibody'
+    assert table.get(' Imatinib ') == 'Small molecule'
+    # a preferred name takes priority over another molecule's synonym
+    assert table.get('MK-3475') == 'Protein'
+    assert table.get('aspirin') is None
+    assert table.lookup(pd.Series(['Gleevec', None, 'aspirin'])).tolist() == ['Small molecule', None, None]
+
+    # names missing from the table are not queried on ChEMBL without web_fallback
+    fetcher = FDADataFetcher(type_table=table)
+    data = fetcher.add_types(pd.DataFrame({'Active Ingredient': ['pembrolizumab', 'imatinib mesylate', 'aspirin']}))
+    assert data['Type'].tolist() == ['Antibody', 'Small molecule', 'Not Found in ChEMBL']